@@ -0,0 +1,16 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+async def wait_with_timeout(awaitable: Awaitable[T], timeout: float) -> T:
+    """带超时等待，超时抛出 asyncio.TimeoutError
+
+    Python 3.12 以前的 asyncio.wait_for 在结果恰好就绪时会吞掉外部的取消，
+    持续收到数据的流式读取几乎总会命中这种情况，导致生成无法被取消；
+    有 asyncio.timeout（3.11 起）时改用它，取消总能传递出去。
+    """
+    if hasattr(asyncio, "timeout"):
+        async with asyncio.timeout(timeout):
+            return await awaitable
+    return await asyncio.wait_for(awaitable, timeout)
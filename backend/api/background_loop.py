@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import queue
+import threading
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+# 迭代结束的标记
+_DONE = object()
+
+class BackgroundEventLoop:
+    """在后台线程中常驻的事件循环，供同步代码（如 Streamlit 脚本）提交协程
+
+    所有协程都在同一个循环上执行，连接池、限流器等绑定事件循环的资源可以跨请求复用。
+    """
+
+    def __init__(self, name: str = "datasprite-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """把协程提交到后台循环，立即返回可等待结果的 Future"""
+        if self.loop.is_closed():
+            raise RuntimeError("后台事件循环已关闭")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台循环上执行协程并阻塞等待结果"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(
+        self,
+        stream: AsyncIterator,
+        idle_callback: Optional[Callable[[], None]] = None,
+        idle_interval: float = 0.2
+    ) -> Iterator:
+        """在后台循环上消费异步迭代器，在调用线程中逐个产出结果
+
+        等待超过 idle_interval 秒没有新结果时在调用线程中执行 idle_callback，
+        调用方提前停止迭代时取消后台的生成。
+        """
+        items: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in stream:
+                    items.put((item, None))
+            except Exception as e:
+                items.put((_DONE, e))
+            else:
+                items.put((_DONE, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    item, error = items.get(timeout=idle_interval)
+                except queue.Empty:
+                    if idle_callback:
+                        idle_callback()
+                    continue
+                if item is _DONE:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self):
+        """停止后台循环并等待线程退出"""
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
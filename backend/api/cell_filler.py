@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from config import FILL_MAX_COLUMNS, FILL_CONTEXT_CHARS
+
+# 补全请求中每行编号使用的字段名，选用不会与表格列名冲突的保留名
+ROW_ID = "__row__"
+
+def missing_mask(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """每个单元格是否缺失：空值或只有空白的文本都视为缺失"""
+    columns = list(columns or df.columns)
+    mask = {}
+    for col in columns:
+        values = df[col]
+        # 分类列只判断类别本身，再按编码映射回每一行
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            blank = values.cat.categories.astype(str).str.strip() == ""
+            codes = values.cat.codes.to_numpy()
+            mask[col] = (codes < 0) | (blank[codes] if len(blank) else False)
+        else:
+            mask[col] = (values.isna() | (values.astype("string").str.strip() == "")).fillna(True).to_numpy()
+    return pd.DataFrame(mask, index=df.index)
+
+def find_missing_cells(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    max_columns: int = FILL_MAX_COLUMNS
+) -> Dict[Tuple[str, ...], List[int]]:
+    """按缺失的列分组：缺失相同列的行合并为一组，一组最多 max_columns 列，返回 {列: 行位置}"""
+    mask = missing_mask(df, columns)
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    if mask.empty:
+        return groups
+    rows = mask.to_numpy()
+    has_missing = rows.any(axis=1)
+    for position in has_missing.nonzero()[0]:
+        missing = [col for col, flag in zip(mask.columns, rows[position]) if flag]
+        for start in range(0, len(missing), max_columns):
+            groups.setdefault(tuple(missing[start:start + max_columns]), []).append(int(position))
+    return groups
+
+def count_missing_cells(df: pd.DataFrame, columns: Optional[List[str]] = None) -> Dict[str, int]:
+    """每列缺失的单元格数，不含没有缺失的列"""
+    counts = missing_mask(df, columns).sum()
+    return {col: int(count) for col, count in counts.items() if count}
+
+def context_row(
+    df: pd.DataFrame,
+    position: int,
+    target_columns: List[str],
+    max_chars: int = FILL_CONTEXT_CHARS
+) -> Dict[str, str]:
+    """补全请求中的一行：编号加上该行已有的非空取值，总长度不超过 max_chars"""
+    row = {ROW_ID: position}
+    used_chars = 0
+    for col, value in df.iloc[position].items():
+        # 与编号同名的列不能覆盖行编号
+        if col == ROW_ID or col in target_columns or value is None or pd.isna(value):
+            continue
+        value = str(value).strip()
+        if not value:
+            continue
+        if used_chars + len(value) > max_chars:
+            break
+        row[col] = value
+        used_chars += len(value)
+    return row
+
+def apply_fills(df: pd.DataFrame, fills: List[Dict[str, str]]) -> pd.DataFrame:
+    """把补全的取值按行编号写回数据，返回新的表"""
+    if not fills:
+        return df
+    result = df.reset_index(drop=True)
+    columns = {col for fill in fills for col in fill if col != ROW_ID}
+    # 分类列先转为普通文本，补全的值不受已有类别限制
+    result = result.astype({col: object for col in columns if col in result.columns})
+    for col in columns:
+        if col not in result.columns:
+            result[col] = pd.Series(None, index=result.index, dtype=object)
+    for fill in fills:
+        position = fill.get(ROW_ID)
+        if not isinstance(position, int) or not 0 <= position < len(result):
+            raise ValueError(f"补全结果的行编号无效: {position!r}")
+        for col, value in fill.items():
+            if col != ROW_ID:
+                result.iat[position, result.columns.get_loc(col)] = value
+    return result
@@ -0,0 +1,17 @@
+import re
+import unicodedata
+
+# 列名末尾括号里的单位或备注，如 “价格(元)”、“身高【cm】”
+_TRAILING_NOTE = re.compile(r'\s*[(\[【][^()\[\]【】]*[)\]】]\s*$')
+
+def column_stem(column: str) -> str:
+    """去掉列名末尾的单位或备注，统一全半角和大小写"""
+    text = unicodedata.normalize("NFKC", str(column))
+    return _TRAILING_NOTE.sub("", text).strip().lower()
+
+def match_column(column: str, keyword: str) -> bool:
+    """列名等于关键字或以关键字结尾时匹配
+
+    只按结尾匹配，“用户评价”“性价比”不会被当作价格列，“身高体重说明”也不会被当作身高列。
+    """
+    return column_stem(column).endswith(column_stem(keyword))
@@ -0,0 +1,176 @@
+import hashlib
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import COMBINATORIAL_MIN_POOL_SIZE, COMBINATORIAL_MAX_POOL_SIZE
+from .column_rules import match_column
+
+# 派生列：列名以关键字结尾时识别，由本地规则计算，不向模型索取取值池
+DERIVED_COLUMN_RULES = [
+    ("价格", "price"),
+    ("单价", "price"),
+    ("售价", "price"),
+    ("原价", "price"),
+    ("现价", "price"),
+    ("库存", "stock"),
+    ("库存量", "stock"),
+    ("编码", "code"),
+    ("货号", "code"),
+    ("SKU", "code"),
+    ("SKU编号", "code"),
+]
+
+# 没有定价规则时随机价格的范围（元）
+DEFAULT_PRICE_RANGE = (50, 500)
+# 随机库存的范围
+DEFAULT_STOCK_RANGE = (0, 500)
+# 组合数远大于行数时最多抽样的批次数
+MAX_SAMPLE_ROUNDS = 20
+
+def derived_kind(column: str) -> Optional[str]:
+    """返回列对应的派生规则，不是派生列时返回 None"""
+    for keyword, kind in DERIVED_COLUMN_RULES:
+        if match_column(column, keyword):
+            return kind
+    return None
+
+def split_columns(columns: List[str]) -> Tuple[List[str], List[str]]:
+    """把列分为需要取值池的属性列和本地计算的派生列"""
+    pool_columns = [col for col in columns if derived_kind(col) is None]
+    derived_columns = [col for col in columns if derived_kind(col) is not None]
+    return pool_columns, derived_columns
+
+def suggest_pool_size(num_rows: int, num_pool_columns: int) -> int:
+    """每列取值池的建议大小：组合总数留出余量，足以覆盖排除规则和抽样"""
+    if num_pool_columns == 0:
+        return COMBINATORIAL_MIN_POOL_SIZE
+    size = math.ceil((num_rows * 2) ** (1 / num_pool_columns))
+    return max(COMBINATORIAL_MIN_POOL_SIZE, min(COMBINATORIAL_MAX_POOL_SIZE, size))
+
+def parse_pool_spec(spec: Dict, pool_columns: List[str]) -> Dict:
+    """校验并清理模型返回的取值池定义"""
+    if not isinstance(spec, dict) or not isinstance(spec.get("pools"), dict):
+        raise ValueError("取值池格式不正确：缺少 pools 字段")
+
+    pools = {}
+    for col in pool_columns:
+        values = spec["pools"].get(col)
+        if not isinstance(values, list):
+            raise ValueError(f"取值池缺少列：{col}")
+        # 去掉空值和重复值，保持原有顺序
+        values = list(dict.fromkeys(str(value).strip() for value in values if str(value).strip()))
+        if not values:
+            raise ValueError(f"列 '{col}' 的取值池为空")
+        pools[col] = values
+
+    exclusions = []
+    for rule in spec.get("exclusions") or []:
+        if isinstance(rule, dict):
+            rule = {col: str(value).strip() for col, value in rule.items() if col in pools}
+            if rule:
+                exclusions.append(rule)
+
+    pricing = spec.get("pricing") if isinstance(spec.get("pricing"), dict) else {}
+    adjustments = {}
+    for col, values in (pricing.get("adjustments") or {}).items():
+        if col in pools and isinstance(values, dict):
+            adjustments[col] = {}
+            for value, amount in values.items():
+                try:
+                    adjustments[col][str(value).strip()] = float(amount)
+                except (TypeError, ValueError):
+                    continue
+    try:
+        base_price = float(pricing["base"]) if "base" in pricing else None
+    except (TypeError, ValueError):
+        base_price = None
+
+    return {
+        "pools": pools,
+        "exclusions": exclusions,
+        "pricing": {"base": base_price, "adjustments": adjustments}
+    }
+
+class CombinatorialExpander:
+    """在本地展开属性取值池的笛卡尔积：过滤排除组合、抽样并计算价格、库存等派生列
+
+    组合按混合进制编号，抽样时只解码被选中的编号，不会生成完整的笛卡尔积。
+    """
+
+    def __init__(
+        self,
+        columns: List[str],
+        spec: Dict,
+        seed: Optional[int] = None
+    ):
+        self.columns = columns
+        self.pool_columns, self.derived_columns = split_columns(columns)
+        self.pools = spec["pools"]
+        self.exclusions = spec["exclusions"]
+        self.pricing = spec["pricing"]
+        self.random = random.Random(seed)
+        self.total_combinations = math.prod(len(self.pools[col]) for col in self.pool_columns)
+
+    def _decode(self, index: int) -> Dict[str, str]:
+        """把组合编号解码为各属性列的取值"""
+        row = {}
+        for col in reversed(self.pool_columns):
+            pool = self.pools[col]
+            index, position = divmod(index, len(pool))
+            row[col] = pool[position]
+        return row
+
+    def _is_excluded(self, row: Dict[str, str]) -> bool:
+        return any(
+            all(row.get(col) == value for col, value in rule.items())
+            for rule in self.exclusions
+        )
+
+    def _candidate_indices(self, num_rows: int) -> Iterator[int]:
+        """按随机顺序产出组合编号；组合数不多时直接打乱全部编号"""
+        if self.total_combinations <= num_rows * 4:
+            indices = list(range(self.total_combinations))
+            self.random.shuffle(indices)
+            yield from indices
+            return
+        # 组合数远大于需要的行数时分批抽样，排除规则过滤掉的部分由后续批次补足
+        seen = set()
+        for _ in range(MAX_SAMPLE_ROUNDS):
+            for index in self.random.sample(range(self.total_combinations), num_rows):
+                if index not in seen:
+                    seen.add(index)
+                    yield index
+
+    def _derive(self, row: Dict[str, str], row_number: int) -> Dict[str, str]:
+        """按规则计算派生列"""
+        for col in self.derived_columns:
+            kind = derived_kind(col)
+            if kind == "price":
+                base = self.pricing["base"]
+                if base is None:
+                    base = self.random.randint(*DEFAULT_PRICE_RANGE)
+                price = base + sum(
+                    self.pricing["adjustments"].get(pool_col, {}).get(row[pool_col], 0)
+                    for pool_col in self.pool_columns
+                )
+                row[col] = f"{max(price, 0):g}元"
+            elif kind == "stock":
+                row[col] = str(self.random.randint(*DEFAULT_STOCK_RANGE))
+            elif kind == "code":
+                digest = hashlib.md5(
+                    "|".join(row[pool_col] for pool_col in self.pool_columns).encode("utf-8")
+                ).hexdigest()[:6].upper()
+                row[col] = f"SKU-{row_number:05d}-{digest}"
+        return {col: row[col] for col in self.columns}
+
+    def expand(self, num_rows: int, start: int = 0) -> Iterator[Dict[str, str]]:
+        """产出最多 num_rows 个不重复且未被排除的组合，编码列从第 start + 1 行开始编号"""
+        produced = 0
+        for index in self._candidate_indices(num_rows):
+            row = self._decode(index)
+            if self._is_excluded(row):
+                continue
+            produced += 1
+            yield self._derive(row, start + produced)
+            if produced >= num_rows:
+                return
@@ -0,0 +1,104 @@
+import unicodedata
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .validation import ColumnSpec, infer_column_specs
+from .combinatorial import split_columns
+
+# 拼接各列取值时使用的分隔符，不会出现在正常文本中
+KEY_SEPARATOR = "\x1f"
+
+def normalize_value(value) -> str:
+    """去重前统一文本：全角转半角、合并连续空白、去掉首尾空白并转小写"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", str(value)).split()).lower()
+
+def _normalize_column(values: pd.Series, spec: Optional[ColumnSpec] = None) -> np.ndarray:
+    """只对去重后的取值做规范化，再按编码映射回每一行；给出列类型时先按类型统一格式"""
+    codes, uniques = pd.factorize(values)
+    if spec is not None:
+        uniques = [spec.normalize(value) for value in uniques]
+    normalized = np.array([normalize_value(value) for value in uniques] + [""], dtype=object)
+    codes[codes < 0] = len(uniques)
+    return normalized[codes]
+
+def hash_keys(keys: List[str]) -> np.ndarray:
+    """计算行键的64位哈希，结果与进程无关"""
+    return pd.util.hash_array(np.array(keys, dtype=object))
+
+def hash_rows(df: pd.DataFrame, specs: Optional[List[ColumnSpec]] = None) -> np.ndarray:
+    """计算每行规范化后的64位哈希；给出列类型时 “1299” 与 “1,299元” 视为相同"""
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    specs = specs or [None] * len(df.columns)
+    columns = [_normalize_column(df[col], spec) for col, spec in zip(df.columns, specs)]
+    return hash_keys([KEY_SEPARATOR.join(values) for values in zip(*columns)])
+
+def default_key_columns(columns: List[str]) -> List[str]:
+    """默认的去重依据列：价格、库存、编码等按规则或随机生成的列不参与，全是这类列时使用全部列"""
+    pool_columns, _ = split_columns(list(columns))
+    return pool_columns or list(columns)
+
+class RowHashIndex:
+    """已有数据的行哈希索引，用于拒绝与已有数据重复的生成结果
+
+    只保存规范化后各行的64位哈希，不保留原始数据；建立索引时整表一次性计算，
+    之后每接受一行就增量加入，判断是否重复是常数时间，不需要逐行扫描已有数据。
+    设置 key_columns 时只按这些列判断重复，例如只按“商品名称”；未设置时使用 default_key_columns。
+    价格、库存等列先按列名推断的类型统一格式再计算哈希，与 DataValidator 规范化后的数据一致，
+    模型返回的 “1299” 和已有数据中的 “1299元” 会被判为重复。
+    """
+
+    def __init__(self, columns: List[str], key_columns: Optional[List[str]] = None):
+        key_columns = list(key_columns or default_key_columns(columns))
+        unknown = [col for col in key_columns if col not in columns]
+        if unknown:
+            raise ValueError(f"去重依据列不存在：{unknown}")
+        self.columns = list(columns)
+        self.key_columns = key_columns
+        self._specs = infer_column_specs(key_columns)
+        self._hashes = set()
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pd.DataFrame,
+        key_columns: Optional[List[str]] = None
+    ) -> "RowHashIndex":
+        """为已有数据建立索引"""
+        df = df.rename(columns=str)
+        index = cls(list(df.columns), key_columns)
+        index.add_dataframe(df)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _hash_row(self, row: Dict[str, str]) -> int:
+        key = KEY_SEPARATOR.join(
+            normalize_value(spec.normalize(row.get(spec.name))) for spec in self._specs
+        )
+        return int(hash_keys([key])[0])
+
+    def add_dataframe(self, df: pd.DataFrame) -> int:
+        """批量加入数据，返回其中新增的不重复行数"""
+        before = len(self._hashes)
+        self._hashes.update(hash_rows(df[self.key_columns], self._specs).tolist())
+        return len(self._hashes) - before
+
+    def contains(self, row: Dict[str, str]) -> bool:
+        """行是否与已有数据重复"""
+        return self._hash_row(row) in self._hashes
+
+    def add(self, row: Dict[str, str]) -> bool:
+        """加入一行；与已有数据重复时不加入并返回 False"""
+        row_hash = self._hash_row(row)
+        if row_hash in self._hashes:
+            return False
+        self._hashes.add(row_hash)
+        return True
+
+    def describe_row(self, row: Dict[str, str]) -> str:
+        """行的去重依据列取值，用于提示"""
+        return "，".join(f"{col}: {row.get(col, '')}" for col in self.key_columns)
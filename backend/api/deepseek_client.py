@@ -1,17 +1,101 @@
 import aiohttp
+import hashlib
 import json
-from typing import List, Dict
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Dict, Optional, AsyncIterator, Iterator
 import warnings
-from config import SUPPORTED_MODELS, DEFAULT_MODEL
+from config import (
+    SUPPORTED_MODELS,
+    DEFAULT_MODEL,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_OUTPUT_FORMAT,
+    DEFAULT_MAX_TOKENS,
+    ROW_TOKENS_SAFETY_RATIO,
+    RESPONSE_OVERHEAD_TOKENS,
+    MAX_RETRIES,
+    COALESCE_REQUESTS,
+    MAX_TOPUP_ROUNDS,
+    TOPUP_SAMPLE_ROWS,
+    TOPUP_FINGERPRINT_CHARS,
+    CONNECT_TIMEOUT,
+    FIRST_BYTE_TIMEOUT,
+    STREAM_IDLE_TIMEOUT,
+    BACKOFF_BASE_DELAY,
+    BACKOFF_MAX_DELAY
+)
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import backoff  # 需要添加到 requirements.txt
+import backoff
+from .http_session import SessionManager, get_shared_session_manager
+from .response_cache import ResponseCache, get_shared_cache
+from .singleflight import get_shared_singleflight
+from .aio_utils import wait_with_timeout
+from .rate_limiter import get_shared_rate_limiter, get_shared_governor
+from .model_metrics import get_shared_model_metrics
+from .stream_parser import JSONRowParser, TabularRowParser
+from .token_utils import estimate_tokens, estimate_messages_tokens
+from .combinatorial import derived_kind, split_columns, parse_pool_spec
+from .row_estimator import get_shared_row_estimator
+from .cell_filler import ROW_ID
+
+class RetryableAPIError(Exception):
+    """可重试的API错误（限流或服务端错误）"""
+    def __init__(self, message: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头，支持秒数和HTTP日期两种格式，等待时间不超过 BACKOFF_MAX_DELAY"""
+    if not value:
+        return None
+    try:
+        return min(max(0.0, float(value)), BACKOFF_MAX_DELAY)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return min(max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds()), BACKOFF_MAX_DELAY)
+
+# 模型输出数据的格式：表格格式只输出一次表头，不在每行重复列名，输出token更少
+OUTPUT_FORMATS = {
+    "json": "JSON对象数组",
+    "tsv": "制表符分隔表格"
+}
 
 class DeepSeekClient:
-    def __init__(self, api_key: str, use_mock: bool = True, model: str = DEFAULT_MODEL):
+    def __init__(
+        self,
+        api_key: str,
+        use_mock: bool = True,
+        model: str = DEFAULT_MODEL,
+        session_manager: Optional[SessionManager] = None,
+        cache: Optional[ResponseCache] = None
+    ):
         self.api_key = api_key
         self.use_mock = use_mock
         self.model = model
+        self.temperature = DEFAULT_TEMPERATURE
+        self.output_format = DEFAULT_OUTPUT_FORMAT
+        self.max_tokens = DEFAULT_MAX_TOKENS
+        # 按历史记录估算每行的输出token数，决定单次请求生成多少行
+        self.row_estimator = get_shared_row_estimator()
+        # 未指定缓存时使用进程级共享缓存（配置关闭缓存时为 None）
+        self.cache = cache if cache is not None else get_shared_cache()
+        self.singleflight = get_shared_singleflight() if COALESCE_REQUESTS else None
+        # 同一进程内的所有客户端共享限流配额和并发名额
+        self.rate_limiter = get_shared_rate_limiter()
+        self.governor = get_shared_governor()
+        # 各模型的延迟和错误率供模型路由使用
+        self.metrics = get_shared_model_metrics()
+        # 未指定会话管理器时使用进程级共享连接池，多个客户端之间复用连接；
+        # 调用方传入的会话管理器由调用方关闭，共享连接池由 close_shared_session 统一关闭
+        self.session_manager = session_manager or get_shared_session_manager()
         model_config = SUPPORTED_MODELS.get(model, SUPPORTED_MODELS[DEFAULT_MODEL])
         self.api_url = model_config["url"]
         self.model_id = model_config["id"]
@@ -19,6 +103,31 @@ class DeepSeekClient:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
+        self.usage_stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "topup_requests": 0,
+            "topup_prompt_tokens": 0,
+            "topup_completion_tokens": 0
+        }
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def aclose(self):
+        """客户端不独占连接池：传入的会话管理器由调用方关闭，共享连接池由进程统一关闭"""
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取带连接池的会话"""
+        return await self.session_manager.get_session()
+    
+    def get_connection_stats(self) -> Dict[str, float]:
+        """获取连接复用统计"""
+        return self.session_manager.get_stats()
     
     def update_api_key(self, api_key: str):
         """更新API密钥"""
@@ -28,6 +137,12 @@ class DeepSeekClient:
             "Authorization": f"Bearer {api_key}"
         }
     
+    def update_output_format(self, output_format: str):
+        """更新模型输出数据的格式"""
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        self.output_format = output_format
+    
     def update_model(self, model: str):
         """更新模型"""
         if model not in SUPPORTED_MODELS:
@@ -37,44 +152,117 @@ class DeepSeekClient:
         self.api_url = model_config["url"]
         self.model_id = model_config["id"]
     
-    @backoff.on_exception(
-        backoff.expo,
-        (aiohttp.ClientError, asyncio.TimeoutError),
-        max_tries=3,
-        max_time=30
-    )
-    async def _make_api_request(self, session, payload):
-        """发送API请求，支持自动重试"""
-        async with session.post(
-            self.api_url,
-            headers=self.headers,
-            json=payload,
-            ssl=True,
-            timeout=aiohttp.ClientTimeout(total=30)
-        ) as response:
-            response_text = await response.text()
-            
+    def _backoff_delays(self) -> Iterator[float]:
+        """生成带全抖动的指数退避等待时间"""
+        wait_gen = backoff.expo(factor=BACKOFF_BASE_DELAY, max_value=BACKOFF_MAX_DELAY)
+        next(wait_gen)  # 跳过生成器的初始化
+        for delay in wait_gen:
+            yield backoff.full_jitter(delay)
+    
+    async def _stream_chat(self, payload: Dict, usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """发送一次流式请求并逐块产出内容，请求前先经过进程级限流和并发控制，结束后记录模型延迟
+
+        如果传入 usage 字典，接口返回的token用量会写入其中。
+        """
+        usage = usage if usage is not None else {}
+        prompt_tokens = estimate_messages_tokens(payload["messages"])
+        # 按输入token加上 max_tokens 预订配额，结束后按实际用量归还
+        estimated_tokens = prompt_tokens + payload.get("max_tokens", 0)
+        await self.rate_limiter.acquire(self.api_url, self.model_id, estimated_tokens)
+        loop = asyncio.get_running_loop()
+        completion_tokens = 0
+        start_time = first_chunk_time = None
+        failed = False
+        try:
+            async with self.governor.slot():
+                # 从实际发出请求开始计时，不含排队等待的时间
+                start_time = loop.time()
+                async for content in self._post_stream(payload, usage):
+                    if first_chunk_time is None:
+                        first_chunk_time = loop.time()
+                    completion_tokens += estimate_tokens(content)
+                    yield content
+        except Exception:
+            failed = True
+            self.metrics.record_failure(self.model)
+            raise
+        finally:
+            actual_tokens = usage.get("total_tokens") or prompt_tokens + completion_tokens
+            self.rate_limiter.reconcile(self.api_url, self.model_id, estimated_tokens, actual_tokens)
+            if not failed and first_chunk_time is not None:
+                duration = loop.time() - first_chunk_time
+                self.metrics.record_success(
+                    self.model,
+                    first_chunk_time - start_time,
+                    completion_tokens / duration if duration > 0 else None
+                )
+    
+    async def _post_stream(self, payload: Dict, usage: Dict) -> AsyncIterator[str]:
+        """发送流式请求并逐块产出内容，带连接、首字节和块间空闲超时"""
+        session = await self._get_session()
+        response = await wait_with_timeout(
+            session.post(
+                self.api_url,
+                headers=self.headers,
+                json=payload,
+                ssl=True,
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    connect=CONNECT_TIMEOUT,
+                    sock_connect=CONNECT_TIMEOUT
+                )
+            ),
+            timeout=FIRST_BYTE_TIMEOUT
+        )
+        completed = False
+        try:
             if response.status != 200:
-                if response.status in [502, 503, 504]:
-                    raise aiohttp.ClientError(f"服务器暂时不可用 (状态码: {response.status})")
+                response_text = await wait_with_timeout(response.text(), timeout=STREAM_IDLE_TIMEOUT)
+                if response.status == 429 or response.status >= 500:
+                    raise RetryableAPIError(
+                        f"服务器暂时不可用 (状态码: {response.status})",
+                        status=response.status,
+                        retry_after=_parse_retry_after(response.headers.get("Retry-After"))
+                    )
                 raise Exception(f"API调用失败 (状态码: {response.status}): {response_text}")
             
-            return response_text
+            # 首个数据块沿用首字节超时，之后每块之间使用空闲超时
+            read_timeout = FIRST_BYTE_TIMEOUT
+            while True:
+                line = await wait_with_timeout(response.content.readline(), timeout=read_timeout)
+                if not line:
+                    break
+                read_timeout = STREAM_IDLE_TIMEOUT
+                
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data: '):
+                    continue
+                try:
+                    data = json.loads(line[6:])
+                except json.JSONDecodeError:
+                    continue
+                if data.get('usage'):
+                    usage.update(data['usage'])
+                if not data.get('choices'):
+                    continue
+                if data['choices'][0].get('finish_reason'):
+                    usage['finish_reason'] = data['choices'][0]['finish_reason']
+                content = data['choices'][0].get('delta', {}).get('content')
+                if content:
+                    yield content
+            completed = True
+        finally:
+            if completed:
+                response.release()
+            else:
+                # 超时或中途放弃的连接不再放回连接池
+                response.close()
     
-    async def generate_sku_content(
-        self, 
-        columns: List[str], 
-        prompt: str, 
-        num_rows: int,
-        progress_callback=None
-    ) -> List[Dict[str, str]]:
-        """一次性生成所有SKU数据"""
-        if self.use_mock:
-            if progress_callback:
-                progress_callback("🔄 使用模拟数据模式")
-            return self._generate_mock_data(columns, num_rows, progress_callback)
-        
-        system_prompt = (
+    def _build_system_prompt(self, columns: List[str], num_rows: int) -> str:
+        """构建生成SKU数据的系统提示词"""
+        if self.output_format == "tsv":
+            return self._build_tabular_system_prompt(columns, num_rows)
+        return (
             f"你是一个严格的SKU数据生成助手。请按照以下格式生成数据：\n"
             "[\n"
             "  {\n"
@@ -95,134 +283,678 @@ class DeepSeekClient:
             "8. 必须是标准的JSON格式，不要包含任何注释\n"
             "\n请开始生成，记住要一行一行地数..."
         )
-
+    
+    def _build_tabular_system_prompt(self, columns: List[str], num_rows: int) -> str:
+        """构建以制表符分隔表格输出数据的系统提示词"""
+        header = "\t".join(columns)
+        return (
+            f"你是一个严格的SKU数据生成助手。请以制表符(Tab)分隔的表格输出数据：\n"
+            f"第一行是表头，必须完全是：{header}\n"
+            f"之后每行一条数据，各列的值按表头顺序用一个制表符分隔，直到第{num_rows}行\n\n"
+            f"⚠️ 极其重要的要求：\n"
+            f"1. 必须严格生成 {num_rows} 行数据（不含表头），不能多也不能少\n"
+            f"2. 请在生成过程中仔细计数：1,2,3...直到{num_rows}\n"
+            f"3. 每行必须恰好有 {len(columns)} 个值，依次对应：{columns}\n"
+            "4. 值中如果包含制表符、换行或双引号，用双引号包裹整个值，值内的双引号写成两个双引号\n"
+            "5. 生成的内容要符合实际情况\n"
+            "6. 数据要多样化，避免重复\n"
+            "7. 每个值都要有实际意义\n"
+            "8. 只输出表格本身，不要输出代码块标记、序号、注释或任何说明文字\n"
+            "\n请开始生成，记住要一行一行地数..."
+        )
+    
+    async def generate_sku_content(
+        self, 
+        columns: List[str], 
+        prompt: str, 
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> List[Dict[str, str]]:
+        """一次性生成所有SKU数据"""
+        return [
+            row async for row in self.stream_sku_content(
+                columns, prompt, num_rows, progress_callback, use_cache=use_cache
+            )
+        ]
+    
+    async def stream_sku_content(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, str]]:
+        """流式生成SKU数据，每解析出一行立即产出；命中缓存时直接回放缓存的行"""
+        if self.use_mock:
+            if progress_callback:
+                progress_callback("🔄 使用模拟数据模式")
+            for row in self._generate_mock_data(columns, num_rows, progress_callback):
+                yield row
+            return
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": self.model_id,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,  # 降低温度，让输出更可控
-                    "max_tokens": 4000,
-                    "top_p": 0.9,
-                    "stream": True
-                }
+            request_key = ResponseCache.make_key(
+                self.model_id, columns, prompt, num_rows, self.temperature
+            )
+            cache_key = request_key if use_cache and self.cache is not None else None
+            if cache_key is not None:
+                cached_rows = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached_rows is not None:
+                    if progress_callback:
+                        progress_callback(f"⚡ 命中缓存，直接返回 {len(cached_rows)} 条数据")
+                    for row in cached_rows:
+                        yield row
+                    return
+            
+            if progress_callback:
+                progress_callback("🚀 正在初始化生成任务...")
+            
+            start_time = asyncio.get_event_loop().time()
+            if use_cache and self.singleflight is not None:
+                # 相同请求正在进行时直接共享其结果，不再重复调用上游；
+                # 共享的上游不使用任何一方的回调，进度和用量作为事件分发给每个请求者
+                def on_coalesced():
+                    if progress_callback:
+                        progress_callback("🤝 已有相同的生成任务正在进行，直接共享其结果...")
                 
-                if progress_callback:
-                    progress_callback("🚀 正在初始化生成任务...")
+                def on_event(event):
+                    kind, payload = event
+                    if kind == "usage":
+                        self._record_usage(*payload)
+                    elif progress_callback:
+                        progress_callback(payload)
                 
-                start_time = asyncio.get_event_loop().time()
-                current_item = 0
+                rows = self.singleflight.stream(
+                    f"{self.api_url}|{self._api_key_digest()}|{request_key}",
+                    lambda publish: self._generate_rows(
+                        columns,
+                        prompt,
+                        num_rows,
+                        lambda message: publish(("progress", message)),
+                        cache_key,
+                        usage_callback=lambda *usage: publish(("usage", usage), replay=True)
+                    ),
+                    on_coalesced=on_coalesced,
+                    on_event=on_event
+                )
+            else:
+                rows = self._generate_rows(columns, prompt, num_rows, progress_callback, cache_key)
+            
+            current_item = 0
+            async for row in rows:
+                current_item += 1
+                yield row
                 
-                async with session.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    ssl=True
-                ) as response:
-                    if response.status != 200:
-                        raise Exception(f"API调用失败 (状态码: {response.status})")
-                    
-                    # 读取流式响应
-                    full_content = ""
-                    async for line in response.content:
-                        if line:
-                            line = line.decode('utf-8').strip()
-                            if line.startswith('data: '):
-                                try:
-                                    data = json.loads(line[6:])
-                                    if 'choices' in data and data['choices']:
-                                        delta = data['choices'][0].get('delta', {})
-                                        content = delta.get('content')
-                                        if content:
-                                            full_content += content
-                                            
-                                            # 更新进度信息
-                                            if progress_callback:
-                                                if '[' in content:
-                                                    progress_callback("📊 开始生成数据结构...")
-                                                elif ']' in content:
-                                                    progress_callback(f"✨ 已完成全部 {num_rows} 条数据生成！")
-                                                elif '{' in content:
-                                                    current_item += 1
-                                                    elapsed_time = asyncio.get_event_loop().time() - start_time
-                                                    if current_item > 1:  # 至少有一条数据才能计算速度
-                                                        avg_time_per_item = elapsed_time / current_item
-                                                        remaining_items = num_rows - current_item
-                                                        estimated_remaining = avg_time_per_item * remaining_items
-                                                        progress_callback(
-                                                            f"⏳ 正在生成第 {current_item}/{num_rows} 条数据...\n"
-                                                            f"预计还需 {estimated_remaining:.1f} 秒"
-                                                        )
-                                                    else:
-                                                        progress_callback(f"⏳ 正在生成第 {current_item}/{num_rows} 条数据...")
-                                                elif '}' in content:
-                                                    progress_callback(f"✅ 完成第 {current_item}/{num_rows} 条数据")
-                                except json.JSONDecodeError:
-                                    continue
-                    
-                    if progress_callback:
-                        progress_callback("🔍 正在验证数据格式...")
-                    
-                    # 尝试从完整内容中提取JSON数据
-                    try:
-                        # 查找第一个 [ 和最后一个 ] 之间的内容
-                        start = full_content.find('[')
-                        end = full_content.rfind(']') + 1
-                        if start >= 0 and end > start:
-                            json_str = full_content[start:end]
-                            result = json.loads(json_str)
-                            
-                            if len(result) != num_rows:
-                                if progress_callback:
-                                    progress_callback(f"⚠️ 数据数量不正确（期望{num_rows}行，实际{len(result)}行），尝试修复...")
-                                
-                                # 如果生成的数据太少，补充生成
-                                if len(result) < num_rows:
-                                    remaining_rows = num_rows - len(result)
-                                    additional_prompt = (
-                                        f"请继续生成{remaining_rows}行数据，"
-                                        f"保持相同的格式和质量要求。"
-                                        f"已有数据：{json.dumps(result, ensure_ascii=False)}"
-                                    )
-                                    
-                                    # 递归调用生成剩余数据
-                                    additional_data = await self.generate_sku_content(
-                                        columns,
-                                        additional_prompt,
-                                        remaining_rows,
-                                        progress_callback
-                                    )
-                                    
-                                    result.extend(additional_data)
-                                
-                                # 如果生成的数据太多，截取需要的部分
-                                elif len(result) > num_rows:
-                                    result = result[:num_rows]
-                                    if progress_callback:
-                                        progress_callback("⚠️ 数据过多，已截取所需数量")
-                            
-                            if progress_callback:
-                                total_time = asyncio.get_event_loop().time() - start_time
-                                progress_callback(
-                                    f"🎉 生成完成！\n"
-                                    f"总用时：{total_time:.1f} 秒\n"
-                                    f"平均速度：{num_rows/total_time:.1f} 条/秒"
-                                )
-                            
-                            return result
-                        else:
-                            raise ValueError("未找到有效的JSON数组")
-                    except json.JSONDecodeError as e:
-                        raise Exception(f"解析JSON失败: {str(e)}\n内容: {full_content}")
+                if progress_callback:
+                    progress_callback(f"✅ 完成第 {current_item}/{num_rows} 条数据")
+                    if current_item < num_rows:
+                        elapsed_time = asyncio.get_event_loop().time() - start_time
+                        avg_time_per_item = elapsed_time / current_item
+                        estimated_remaining = avg_time_per_item * (num_rows - current_item)
+                        progress_callback(
+                            f"⏳ 正在生成第 {current_item + 1}/{num_rows} 条数据...\n"
+                            f"预计还需 {estimated_remaining:.1f} 秒"
+                        )
+            
+            if progress_callback:
+                total_time = asyncio.get_event_loop().time() - start_time
+                progress_callback(
+                    f"🎉 生成完成！\n"
+                    f"总用时：{total_time:.1f} 秒\n"
+                    f"平均速度：{current_item/total_time:.1f} 条/秒"
+                )
                 
         except Exception as e:
             if progress_callback:
                 progress_callback("❌ 生成失败，请查看错误详情")
             raise Exception(f"生成SKU数据失败: {str(e)}")
     
+    def _build_pool_prompt(
+        self,
+        pool_columns: List[str],
+        derived_columns: List[str],
+        pool_size: int
+    ) -> str:
+        """构建生成属性取值池的系统提示词"""
+        system_prompt = (
+            "你是一个SKU属性规划助手。请为每个属性列出可选的取值，程序会在本地组合出所有SKU。\n"
+            "请严格按照以下JSON格式输出，不要包含任何注释或其他文字：\n"
+            "{\n"
+            '  "pools": {"属性名": ["取值1", "取值2"]},\n'
+            '  "exclusions": [{"属性名": "取值", "另一个属性名": "取值"}],\n'
+            '  "pricing": {"base": 基础价格数字, "adjustments": {"属性名": {"取值": 加价数字}}}\n'
+            "}\n\n"
+            f"要求：\n"
+            f"1. pools 必须且仅包含这些属性：{pool_columns}\n"
+            f"2. 每个属性提供约 {pool_size} 个不同的、符合实际的取值\n"
+            "3. exclusions 列出现实中不存在或不合理的取值组合，没有则为空数组\n"
+        )
+        if any(derived_kind(col) == "price" for col in derived_columns):
+            system_prompt += "4. pricing 给出基础价格（元）和各取值相对基础价格的加价（可为负数）\n"
+        else:
+            system_prompt += "4. 不需要 pricing 字段\n"
+        return system_prompt
+    
+    async def generate_value_pools(
+        self,
+        columns: List[str],
+        prompt: str,
+        pool_size: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> Dict:
+        """一次请求生成各属性列的取值池、排除组合和定价规则，供本地组合扩展使用"""
+        pool_columns, derived_columns = split_columns(columns)
+        if self.use_mock:
+            if progress_callback:
+                progress_callback("🔄 使用模拟数据模式")
+            return parse_pool_spec(self._generate_mock_pools(pool_columns, pool_size), pool_columns)
+        
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = ResponseCache.make_key(
+                self.model_id, columns, f"取值池:{prompt}", pool_size, self.temperature
+            )
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached:
+                if progress_callback:
+                    progress_callback("⚡ 命中缓存，直接使用上次的取值池")
+                return cached[0]
+        
+        messages = [
+            {"role": "system", "content": self._build_pool_prompt(pool_columns, derived_columns, pool_size)},
+            {"role": "user", "content": prompt}
+        ]
+        payload = {
+            "model": self.model_id,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": 0.9,
+            "stream": True
+        }
+        
+        delays = self._backoff_delays()
+        attempt = 0
+        while True:
+            usage = {}
+            pieces = []
+            try:
+                async for content in self._stream_chat(payload, usage):
+                    pieces.append(content)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableAPIError) as e:
+                attempt += 1
+                if attempt > MAX_RETRIES:
+                    raise
+                delay = next(delays)
+                if isinstance(e, RetryableAPIError) and e.retry_after is not None:
+                    delay = e.retry_after
+                if progress_callback:
+                    reason = "响应超时" if isinstance(e, asyncio.TimeoutError) else str(e)
+                    progress_callback(
+                        f"⚠️ 请求中断（{reason}），{delay:.1f} 秒后重试（第 {attempt}/{MAX_RETRIES} 次）"
+                    )
+                await asyncio.sleep(delay)
+        
+        content = "".join(pieces)
+        self._record_usage(
+            False,
+            usage.get("prompt_tokens") or estimate_messages_tokens(messages),
+            usage.get("completion_tokens") or estimate_tokens(content)
+        )
+        start = content.find("{")
+        end = content.rfind("}")
+        if start == -1 or end <= start:
+            raise ValueError(f"未找到有效的取值池JSON\n内容: {content[-200:]}")
+        try:
+            spec = json.loads(content[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"取值池JSON解析失败: {str(e)}")
+        spec = parse_pool_spec(spec, pool_columns)
+        
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, [spec])
+        return spec
+    
+    def _generate_mock_pools(self, pool_columns: List[str], pool_size: int) -> Dict:
+        """生成模拟的取值池"""
+        warnings.warn("使用模拟数据模式，返回测试数据。")
+        return {
+            "pools": {col: [f"{col}_{i + 1}" for i in range(pool_size)] for col in pool_columns},
+            "exclusions": [],
+            "pricing": {"base": 1000, "adjustments": {}}
+        }
+    
+    def _build_fill_prompt(self, target_columns: List[str], num_rows: int) -> str:
+        """构建补全缺失值的系统提示词"""
+        output_columns = [ROW_ID] + target_columns
+        system_prompt = (
+            "你是一个严格的SKU数据补全助手。用户会给出若干行已有数据，每行一个JSON对象，"
+            f"其中 {ROW_ID} 是行编号，其余是该行已有的取值。\n"
+            f"请为每一行补全这些缺失的列：{target_columns}\n\n"
+            f"⚠️ 极其重要的要求：\n"
+            f"1. 必须输出全部 {num_rows} 行，{ROW_ID} 与输入完全一致，不能遗漏也不能新增\n"
+            f"2. 每行只输出 {ROW_ID} 和缺失列的值，不要重复已有的列\n"
+            "3. 补全的值要与该行已有的取值相符，符合实际情况\n"
+            "4. 每个值都要有实际意义，不能为空\n"
+        )
+        if self.output_format == "tsv":
+            return system_prompt + (
+                "5. 以制表符(Tab)分隔的表格输出，第一行是表头，必须完全是："
+                f"{chr(9).join(output_columns)}\n"
+                "6. 只输出表格本身，不要输出代码块标记、注释或任何说明文字"
+            )
+        return system_prompt + (
+            f"5. 输出JSON数组，每个元素形如 {{\"{ROW_ID}\": 编号, \"列名\": \"值\"}}\n"
+            "6. 必须是标准的JSON格式，不要包含任何注释或其他文字"
+        )
+    
+    async def stream_cell_values(
+        self,
+        target_columns: List[str],
+        prompt: str,
+        context_rows: List[Dict],
+        progress_callback=None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """为给定的行只生成缺失列的取值，每解析出一行立即产出 {id: 行编号, 列: 值}
+
+        context_rows 每行包含编号和该行已有的取值；遇到超时、429或5xx时退避重试，
+        重试时只请求还没有返回的行。没有返回或取值为空的行不产出，由调用方决定是否补充。
+        """
+        pending = {row[ROW_ID]: row for row in context_rows}
+        if self.use_mock:
+            mock_rows = self._generate_mock_data(target_columns, len(context_rows))
+            for row_id, values in zip(pending, mock_rows):
+                yield {ROW_ID: row_id, **values}
+            return
+        
+        delays = self._backoff_delays()
+        attempt = 0
+        while pending:
+            try:
+                async for row in self._stream_cell_values_once(
+                    target_columns, prompt, list(pending.values())
+                ):
+                    if pending.pop(row[ROW_ID], None) is not None:
+                        yield row
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableAPIError) as e:
+                attempt += 1
+                if attempt > MAX_RETRIES:
+                    raise
+                delay = next(delays)
+                if isinstance(e, RetryableAPIError) and e.retry_after is not None:
+                    delay = e.retry_after
+                if progress_callback:
+                    reason = "响应超时" if isinstance(e, asyncio.TimeoutError) else str(e)
+                    progress_callback(
+                        f"⚠️ 补全请求中断（{reason}），{delay:.1f} 秒后重试"
+                        f"（第 {attempt}/{MAX_RETRIES} 次），还有 {len(pending)} 行未返回"
+                    )
+                await asyncio.sleep(delay)
+    
+    async def _stream_cell_values_once(
+        self,
+        target_columns: List[str],
+        prompt: str,
+        context_rows: List[Dict]
+    ) -> AsyncIterator[Dict[str, str]]:
+        """发送一次补全请求，增量解析并产出编号有效、缺失列都有值的行"""
+        output_columns = [ROW_ID] + target_columns
+        rows_text = "\n".join(
+            json.dumps(row, ensure_ascii=False, separators=(",", ":")) for row in context_rows
+        )
+        messages = [
+            {"role": "system", "content": self._build_fill_prompt(target_columns, len(context_rows))},
+            {"role": "user", "content": f"{prompt}\n\n待补全的数据：\n{rows_text}"}
+        ]
+        payload = {
+            "model": self.model_id,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": 0.9,
+            "stream": True
+        }
+        
+        if self.output_format == "tsv":
+            parser = TabularRowParser(output_columns)
+        else:
+            parser = JSONRowParser()
+        expected_ids = {str(row[ROW_ID]): row[ROW_ID] for row in context_rows}
+        produced = 0
+        usage = {}
+        completion_tokens = 0
+        
+        def accept(rows: List[Dict]) -> List[Dict]:
+            nonlocal produced
+            accepted = []
+            for row in rows:
+                row_id = expected_ids.pop(str(row.get(ROW_ID, "")).strip(), None)
+                if row_id is None:
+                    continue
+                values = {col: str(row.get(col) or "").strip() for col in target_columns}
+                if all(values.values()):
+                    accepted.append({ROW_ID: row_id, **values})
+            produced += len(accepted)
+            return accepted
+        
+        chunks = self._stream_chat(payload, usage)
+        try:
+            async for content in chunks:
+                completion_tokens += estimate_tokens(content)
+                for row in accept(parser.feed(content)):
+                    yield row
+                if not expected_ids:
+                    return
+            for row in accept(parser.flush()):
+                yield row
+        finally:
+            await chunks.aclose()
+            if usage or completion_tokens:
+                self._record_usage(
+                    False,
+                    usage.get("prompt_tokens") or estimate_messages_tokens(messages),
+                    usage.get("completion_tokens") or completion_tokens
+                )
+            if produced:
+                # 按编号和缺失列记录每行的输出token数，供之后决定每次请求的行数
+                self.row_estimator.observe(
+                    self.model_id,
+                    output_columns,
+                    self.output_format,
+                    (usage.get("completion_tokens") or completion_tokens) / produced
+                )
+    
+    def _api_key_digest(self) -> str:
+        """API密钥的摘要，用于区分不同账号的请求而不暴露密钥"""
+        return hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16]
+    
+    async def _generate_rows(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        cache_key: Optional[str] = None,
+        usage_callback: Optional[Callable[[bool, int, int], None]] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """调用上游生成数据，单次请求的行数按 max_tokens 预算拆分，行数不足时补充生成，完整结果写入缓存
+
+        usage_callback 接收每次请求的 (是否补充生成, 输入token, 输出token)，未设置时计入本客户端的用量统计。
+        """
+        record_usage = usage_callback or self._record_usage
+        topup_usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        
+        def on_usage(is_topup: bool, prompt_tokens: int, completion_tokens: int):
+            if is_topup:
+                topup_usage["requests"] += 1
+                topup_usage["prompt_tokens"] += prompt_tokens
+                topup_usage["completion_tokens"] += completion_tokens
+            record_usage(is_topup, prompt_tokens, completion_tokens)
+        
+        result = []
+        batch_size = self.rows_per_request(columns)
+        if progress_callback and batch_size < num_rows:
+            progress_callback(
+                f"📐 预计每行约 {self.row_estimator.estimate(self.model_id, columns, self.output_format):.0f} "
+                f"个输出token，拆分为每次最多 {batch_size} 行的多次请求"
+            )
+        
+        topup_round = 0
+        while len(result) < num_rows:
+            # 每批都按最新的每行token数重新估算
+            batch_size = self.rows_per_request(columns)
+            requested_rows = min(num_rows - len(result), batch_size)
+            rows = self._stream_rows(
+                columns,
+                prompt,
+                requested_rows,
+                progress_callback,
+                existing_rows=list(result),
+                is_topup=topup_round > 0,
+                usage_callback=on_usage
+            )
+            received = 0
+            try:
+                async for row in rows:
+                    result.append(row)
+                    received += 1
+                    yield row
+            except ValueError:
+                # 补充生成没有解析出任何行时保留已有数据，不让整次生成失败
+                if not result:
+                    raise
+                break
+            
+            if received < requested_rows and len(result) < num_rows:
+                topup_round += 1
+                if topup_round > MAX_TOPUP_ROUNDS:
+                    break
+                if progress_callback:
+                    progress_callback(
+                        f"⚠️ 数据数量不正确（期望{num_rows}行，实际{len(result)}行），"
+                        f"第 {topup_round}/{MAX_TOPUP_ROUNDS} 次补充生成..."
+                    )
+        
+        # 只缓存完整的结果
+        if cache_key is not None and len(result) == num_rows:
+            await asyncio.to_thread(self.cache.put, cache_key, result)
+        
+        if progress_callback:
+            if len(result) < num_rows:
+                progress_callback(f"⚠️ 多次补充后仍只生成了 {len(result)}/{num_rows} 条数据")
+            if topup_usage["requests"]:
+                progress_callback(
+                    f"🔧 累计补充生成 {topup_usage['requests']} 次，"
+                    f"消耗约 {topup_usage['prompt_tokens']} 输入token / "
+                    f"{topup_usage['completion_tokens']} 输出token"
+                )
+    
+    def rows_per_request(self, columns: List[str]) -> int:
+        """按每行的预估输出token数计算单次请求能在 max_tokens 内完整生成的行数"""
+        tokens_per_row = self.row_estimator.estimate(self.model_id, columns, self.output_format)
+        budget = self.max_tokens * ROW_TOKENS_SAFETY_RATIO - RESPONSE_OVERHEAD_TOKENS
+        return max(1, int(budget // tokens_per_row))
+    
+    def _build_topup_prompt(
+        self,
+        prompt: str,
+        columns: List[str],
+        rows: List[Dict[str, str]],
+        remaining_rows: int
+    ) -> str:
+        """构建补充生成的提示词：只附带少量示例和已用取值的紧凑指纹，而不是全部已有数据"""
+        # 取值最分散的列最能区分各行，用它的已用取值作为指纹
+        distinct_values = {
+            col: list(dict.fromkeys(str(row.get(col, "")).strip() for row in rows))
+            for col in columns
+        }
+        key_column = max(columns, key=lambda col: len(distinct_values[col]))
+        
+        used_values = []
+        used_chars = 0
+        for value in reversed(distinct_values[key_column]):
+            if not value:
+                continue
+            if used_chars + len(value) > TOPUP_FINGERPRINT_CHARS:
+                break
+            used_values.append(value)
+            used_chars += len(value) + 1
+        omitted = len(distinct_values[key_column]) - len(used_values)
+        
+        sample = rows[-TOPUP_SAMPLE_ROWS:]
+        topup_prompt = (
+            f"{prompt}\n\n"
+            f"请继续生成{remaining_rows}行新数据，保持相同的格式和质量要求。\n"
+            f"已有数据示例：{json.dumps(sample, ensure_ascii=False)}\n"
+            f"以下「{key_column}」已经使用过，新数据不要重复：{'、'.join(used_values)}"
+        )
+        if omitted > 0:
+            topup_prompt += f" 等（另有{omitted}个未列出）"
+        return topup_prompt
+    
+    def _record_usage(self, is_topup: bool, prompt_tokens: int, completion_tokens: int):
+        """累计token消耗，补充生成单独统计"""
+        self.usage_stats["requests"] += 1
+        self.usage_stats["prompt_tokens"] += prompt_tokens
+        self.usage_stats["completion_tokens"] += completion_tokens
+        if is_topup:
+            self.usage_stats["topup_requests"] += 1
+            self.usage_stats["topup_prompt_tokens"] += prompt_tokens
+            self.usage_stats["topup_completion_tokens"] += completion_tokens
+    
+    def get_usage_stats(self) -> Dict[str, int]:
+        """获取token消耗统计"""
+        return dict(self.usage_stats)
+    
+    async def _stream_rows(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        existing_rows: Optional[List[Dict[str, str]]] = None,
+        is_topup: bool = False,
+        usage_callback: Optional[Callable[[bool, int, int], None]] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """流式生成最多 num_rows 行数据；遇到超时、429或5xx时退避重试，并保留已解析的行
+
+        existing_rows 是之前批次已生成的行，会以紧凑指纹的形式附加到提示词中避免重复。
+        """
+        existing_rows = existing_rows or []
+        rows = []
+        delays = self._backoff_delays()
+        attempt = 0
+        while True:
+            known_rows = existing_rows + rows
+            request_prompt = prompt
+            if known_rows:
+                request_prompt = self._build_topup_prompt(
+                    prompt, columns, known_rows, num_rows - len(rows)
+                )
+            try:
+                async for row in self._stream_rows_once(
+                    columns,
+                    request_prompt,
+                    num_rows - len(rows),
+                    progress_callback,
+                    is_topup=is_topup or bool(rows),
+                    usage_callback=usage_callback
+                ):
+                    rows.append(row)
+                    yield row
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableAPIError) as e:
+                attempt += 1
+                if attempt > MAX_RETRIES:
+                    raise
+                
+                delay = next(delays)
+                if isinstance(e, RetryableAPIError) and e.retry_after is not None:
+                    delay = e.retry_after
+                if progress_callback:
+                    reason = "响应超时" if isinstance(e, asyncio.TimeoutError) else str(e)
+                    progress_callback(
+                        f"⚠️ 请求中断（{reason}），{delay:.1f} 秒后重试"
+                        f"（第 {attempt}/{MAX_RETRIES} 次），已保留 {len(rows)} 条数据"
+                    )
+                await asyncio.sleep(delay)
+    
+    async def _stream_rows_once(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        is_topup: bool = False,
+        usage_callback: Optional[Callable[[bool, int, int], None]] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """发送一次流式请求，增量解析并产出最多 num_rows 行数据"""
+        messages = [
+            {"role": "system", "content": self._build_system_prompt(columns, num_rows)},
+            {"role": "user", "content": prompt}
+        ]
+        payload = {
+            "model": self.model_id,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": 0.9,
+            "stream": True
+        }
+        
+        if self.output_format == "tsv":
+            parser = TabularRowParser(columns)
+        else:
+            parser = JSONRowParser()
+        # 仅保留末尾片段用于报错，不再累积完整内容
+        content_tail = deque(maxlen=50)
+        produced = 0
+        usage = {}
+        completion_tokens = 0
+        start_time = asyncio.get_running_loop().time()
+        
+        def accept(rows: List[Dict]) -> List[Dict]:
+            """只保留需要的行数，并记录首行耗时"""
+            nonlocal produced
+            accepted = rows[:num_rows - produced]
+            if accepted and produced == 0:
+                self.metrics.record_first_row(
+                    self.model, asyncio.get_running_loop().time() - start_time
+                )
+            produced += len(accepted)
+            return accepted
+        
+        chunks = self._stream_chat(payload, usage)
+        try:
+            async for content in chunks:
+                content_tail.append(content)
+                completion_tokens += estimate_tokens(content)
+                started = parser.started
+                rows = parser.feed(content)
+                if progress_callback and parser.started and not started:
+                    progress_callback("📊 开始生成数据结构...")
+                
+                for row in accept(rows):
+                    yield row
+                
+                if produced >= num_rows and parser.in_object:
+                    # 模型开始生成多余的行，提前断开以节省输出token
+                    return
+            
+            # 表格格式的最后一行可能没有换行结尾
+            for row in accept(parser.flush()):
+                yield row
+        finally:
+            await chunks.aclose()
+            # 优先使用接口返回的用量，缺失时按字符数估算；未收到任何内容的失败请求不计入
+            if usage or completion_tokens:
+                (usage_callback or self._record_usage)(
+                    is_topup,
+                    usage.get("prompt_tokens") or estimate_messages_tokens(messages),
+                    usage.get("completion_tokens") or completion_tokens
+                )
+            if produced:
+                # 记录本次每行实际消耗的输出token数，供之后的请求决定行数
+                self.row_estimator.observe(
+                    self.model_id,
+                    columns,
+                    self.output_format,
+                    (usage.get("completion_tokens") or completion_tokens) / produced
+                )
+        
+        if usage.get("finish_reason") == "length" and produced < num_rows and progress_callback:
+            progress_callback(f"✂️ 输出达到 max_tokens 上限被截断，本次只生成了 {produced}/{num_rows} 条数据")
+        
+        if produced == 0:
+            if self.output_format == "tsv":
+                raise ValueError(f"未解析到有效的表格数据行\n内容: {''.join(content_tail)}")
+            raise ValueError(f"未找到有效的JSON数组\n内容: {''.join(content_tail)}")
+    
     def _generate_mock_data(self, columns: List[str], num_rows: int, progress_callback=None) -> List[Dict[str, str]]:
         """生成模拟数据"""
         warnings.warn("使用模拟数据模式，返回测试数据。")
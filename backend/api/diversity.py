@@ -0,0 +1,145 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import (
+    DIVERSITY_THRESHOLD,
+    DIVERSITY_SHINGLE_SIZE,
+    DIVERSITY_NUM_PERM,
+    DIVERSITY_BANDS
+)
+from .dedup import normalize_value
+from .combinatorial import derived_kind
+
+# 梅森素数，MinHash 的哈希函数在模 p 意义下计算
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def text_columns(columns: List[str]) -> List[str]:
+    """参与相似度比较的列：价格、库存、编码等数值或规则列不参与，全是这类列时使用全部列"""
+    selected = [col for col in columns if derived_kind(col) is None]
+    return selected or list(columns)
+
+def shingles(text: str, size: int = DIVERSITY_SHINGLE_SIZE) -> np.ndarray:
+    """文本的字符 n-gram 集合，每个 n-gram 哈希为32位整数"""
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+        dtype=np.uint64,
+        count=len(grams)
+    )
+
+class NearDuplicateDetector:
+    """基于字符 n-gram MinHash 和 LSH 分桶的近似重复检测
+
+    每行的签名按 bands 段分桶，只与至少有一段完全相同的行比较签名，
+    相似度估计值达到阈值即视为近似重复，整体耗时随行数近似线性增长。
+    """
+
+    def __init__(
+        self,
+        threshold: float = DIVERSITY_THRESHOLD,
+        num_perm: int = DIVERSITY_NUM_PERM,
+        bands: int = DIVERSITY_BANDS,
+        shingle_size: int = DIVERSITY_SHINGLE_SIZE,
+        columns: Optional[List[str]] = None,
+        reject: bool = False,
+        seed: int = 1
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError("相似度阈值必须在0到1之间")
+        if num_perm % bands != 0:
+            raise ValueError("签名长度必须是分段数的整数倍")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        # 未指定时按第一行的列名选择参与比较的列
+        self.columns = columns
+        # 开启后近似重复的行会被拒绝并请求重新生成，否则只统计
+        self.reject = reject
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._signatures: List[np.ndarray] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self.checked = 0
+        self.near_duplicates = 0
+        self.similarity_total = 0.0
+
+    def _row_text(self, row: Dict[str, str]) -> str:
+        if self.columns is None:
+            self.columns = text_columns(list(row))
+        return " ".join(normalize_value(row.get(col)) for col in self.columns)
+
+    def signature(self, row: Dict[str, str]) -> np.ndarray:
+        """计算一行的 MinHash 签名"""
+        hashes = shingles(self._row_text(row), self.shingle_size)
+        # (a*x + b) mod p，x 不超过32位、a 不超过32位，乘积不会溢出64位
+        values = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return (values & _MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[i * self.rows_per_band:(i + 1) * self.rows_per_band].tobytes()
+            for i in range(self.bands)
+        ]
+
+    def check(self, row: Dict[str, str]) -> Tuple[Optional[int], float, np.ndarray]:
+        """查找最相似的已有行，返回 (行号, 估计相似度, 签名)；没有候选时行号为 None"""
+        signature = self.signature(row)
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        best_id, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate, similarity
+        return best_id, best_similarity, signature
+
+    def _insert(self, signature: np.ndarray) -> int:
+        row_id = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(row_id)
+        return row_id
+
+    def add(self, row: Dict[str, str]) -> bool:
+        """检测并记录一行，返回是否接受；开启 reject 时近似重复的行不加入索引"""
+        _, similarity, signature = self.check(row)
+        self.checked += 1
+        self.similarity_total += similarity
+        is_duplicate = similarity >= self.threshold
+        if is_duplicate:
+            self.near_duplicates += 1
+            if self.reject:
+                return False
+        self._insert(signature)
+        return True
+
+    def diversity_score(self) -> float:
+        """多样性得分：不是近似重复的行所占比例"""
+        if not self.checked:
+            return 1.0
+        return 1 - self.near_duplicates / self.checked
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取检测统计"""
+        return {
+            "rows": self.checked,
+            "near_duplicates": self.near_duplicates,
+            "diversity_score": self.diversity_score(),
+            "mean_max_similarity": self.similarity_total / self.checked if self.checked else 0.0
+        }
+
+    def summary(self) -> str:
+        """检测结果摘要"""
+        stats = self.get_stats()
+        return (
+            f"🌈 多样性得分 {stats['diversity_score']:.0%}："
+            f"{stats['rows']} 条中有 {stats['near_duplicates']} 条与其他行相似度超过 {self.threshold:.0%}"
+        )
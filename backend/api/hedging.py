@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from config import HEDGE_BUDGET_RATIO
+
+class HedgeBudget:
+    """对冲请求预算：对冲次数不超过可对冲请求数的一定比例，避免上游开销翻倍"""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO):
+        self.ratio = ratio
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+
+    def record_request(self):
+        """记录一次可对冲的请求"""
+        with self._lock:
+            self._requests += 1
+
+    def try_acquire(self) -> bool:
+        """预算允许时占用一次对冲名额"""
+        with self._lock:
+            if self._hedges + 1 > self.ratio * self._requests:
+                return False
+            self._hedges += 1
+            return True
+
+    def record_hedge_win(self):
+        """记录一次对冲请求先返回数据"""
+        with self._lock:
+            self._hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取对冲统计"""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "hedge_ratio": self._hedges / self._requests if self._requests else 0.0
+            }
+
+async def _close(stream: AsyncIterator[Any], pending: Optional[asyncio.Future]):
+    """取消尚未完成的读取并关闭流，连接随之释放"""
+    if pending is not None and not pending.done():
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+    await stream.aclose()
+
+async def hedged_stream(
+    primary: AsyncIterator[Any],
+    hedge_factory: Callable[[], AsyncIterator[Any]],
+    delay: float,
+    budget: HedgeBudget,
+    on_hedge: Optional[Callable[[], None]] = None,
+    on_hedge_win: Optional[Callable[[], None]] = None
+) -> AsyncIterator[Any]:
+    """对冲读取：主请求在 delay 秒内没有产出第一项时，预算允许则再发起一个对冲请求
+
+    哪个请求先产出第一项就只使用哪个请求的结果，另一个立即取消；
+    先产出的请求如果失败，则继续等待另一个请求。
+    """
+    budget.record_request()
+    streams = {"primary": primary}
+    reads = {"primary": asyncio.ensure_future(primary.__anext__())}
+    try:
+        done, _ = await asyncio.wait(reads.values(), timeout=delay)
+        if not done and budget.try_acquire():
+            if on_hedge:
+                on_hedge()
+            streams["hedge"] = hedge_factory()
+            reads["hedge"] = asyncio.ensure_future(streams["hedge"].__anext__())
+
+        winner = None
+        first_error = None
+        while reads and winner is None:
+            done, _ = await asyncio.wait(reads.values(), return_when=asyncio.FIRST_COMPLETED)
+            for name in [name for name, read in reads.items() if read in done]:
+                read = reads.pop(name)
+                if read.exception() is None:
+                    winner = name
+                    first_item = read.result()
+                    break
+                # 没有产出任何数据就结束或失败的请求直接放弃
+                error = read.exception()
+                if not isinstance(error, StopAsyncIteration) and first_error is None:
+                    first_error = error
+                await _close(streams.pop(name), None)
+
+        if winner is None:
+            if first_error is not None:
+                raise first_error
+            return
+
+        # 关闭落后的请求
+        for name, read in list(reads.items()):
+            await _close(streams.pop(name), reads.pop(name))
+        if winner == "hedge":
+            budget.record_hedge_win()
+            if on_hedge_win:
+                on_hedge_win()
+
+        yield first_item
+        async for item in streams[winner]:
+            yield item
+    finally:
+        for name, stream in streams.items():
+            await _close(stream, reads.get(name))
+
+# 进程级共享的对冲预算
+_shared_budget: Optional[HedgeBudget] = None
+_shared_lock = threading.Lock()
+
+def get_shared_hedge_budget() -> HedgeBudget:
+    """获取进程级共享的对冲预算"""
+    global _shared_budget
+    with _shared_lock:
+        if _shared_budget is None:
+            _shared_budget = HedgeBudget()
+        return _shared_budget
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from typing import Dict, Optional
+import aiohttp
+from config import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL
+)
+
+class SessionManager:
+    """HTTP会话管理器：为每个事件循环维护一个带连接池的 ClientSession"""
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        # aiohttp 的会话绑定在创建它的事件循环上，因此按事件循环分别保存
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "sessions_created": 0,
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0
+        }
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        """创建用于统计连接复用情况的 TraceConfig"""
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        return trace_config
+
+    async def _on_request_start(self, session, trace_config_ctx, params):
+        self._increment("requests")
+
+    async def _on_connection_create_end(self, session, trace_config_ctx, params):
+        self._increment("connections_created")
+
+    async def _on_connection_reuseconn(self, session, trace_config_ctx, params):
+        self._increment("connections_reused")
+
+    def _increment(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _prune_closed_loops(self):
+        """清理已关闭事件循环上遗留的会话"""
+        for loop in [loop for loop in self._sessions if loop.is_closed()]:
+            del self._sessions[loop]
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环上的共享会话，不存在时创建"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._prune_closed_loops()
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.dns_cache_ttl
+                )
+                session = aiohttp.ClientSession(
+                    connector=connector,
+                    trace_configs=[self._create_trace_config()]
+                )
+                self._sessions[loop] = session
+                self._stats["sessions_created"] += 1
+        return session
+
+    async def close(self):
+        """关闭当前事件循环上的会话"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取连接复用统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_ratio"] = stats["connections_reused"] / total if total else 0.0
+        return stats
+
+# 进程级共享的会话管理器，所有 DeepSeekClient 默认使用它
+_shared_session_manager: Optional[SessionManager] = None
+_shared_lock = threading.Lock()
+
+def get_shared_session_manager() -> SessionManager:
+    """获取进程级共享的会话管理器"""
+    global _shared_session_manager
+    with _shared_lock:
+        if _shared_session_manager is None:
+            _shared_session_manager = SessionManager()
+        return _shared_session_manager
+
+async def close_shared_session():
+    """关闭当前事件循环上的共享会话，用于进程退出前的清理"""
+    await get_shared_session_manager().close()
@@ -0,0 +1,92 @@
+import math
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from config import MODEL_METRICS_WINDOW
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class ModelMetrics:
+    """按模型记录最近若干次上游请求的首字节延迟(TTFT)、输出速度和成败，进程内所有客户端共享"""
+
+    def __init__(self, window: int = MODEL_METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        # 每个样本为 (是否成功, 首字节延迟秒数, 每秒输出token数)
+        self._samples: Dict[str, deque] = {}
+        # 从发起生成到解析出第一行数据的秒数
+        self._first_rows: Dict[str, deque] = {}
+
+    def _append(self, model: str, sample):
+        with self._lock:
+            if model not in self._samples:
+                self._samples[model] = deque(maxlen=self.window)
+            self._samples[model].append(sample)
+
+    def record_success(self, model: str, ttft: float, tokens_per_second: Optional[float]):
+        """记录一次成功的请求"""
+        self._append(model, (True, ttft, tokens_per_second))
+
+    def record_failure(self, model: str):
+        """记录一次失败或过慢而被放弃的请求"""
+        self._append(model, (False, None, None))
+
+    def record_first_row(self, model: str, seconds: float):
+        """记录一次生成从发起到解析出第一行数据的耗时"""
+        with self._lock:
+            if model not in self._first_rows:
+                self._first_rows[model] = deque(maxlen=self.window)
+            self._first_rows[model].append(seconds)
+
+    def first_row_percentile(self, model: str, percentile: float) -> Optional[float]:
+        """最近的首行耗时百分位数，没有样本时返回 None"""
+        with self._lock:
+            samples = list(self._first_rows.get(model, ()))
+        return _percentile(samples, percentile)
+
+    def ttft_percentile(self, model: str, percentile: float) -> Optional[float]:
+        """最近成功请求的首字节延迟百分位数，没有样本时返回 None"""
+        with self._lock:
+            samples = list(self._samples.get(model, ()))
+        return _percentile([ttft for ok, ttft, _ in samples if ok], percentile)
+
+    def get_model_stats(self, model: str) -> Dict[str, Optional[float]]:
+        """获取单个模型的统计"""
+        with self._lock:
+            samples = list(self._samples.get(model, ()))
+            first_rows = list(self._first_rows.get(model, ()))
+        ttfts = [ttft for ok, ttft, _ in samples if ok]
+        speeds = [speed for ok, _, speed in samples if ok and speed]
+        failures = sum(1 for ok, _, _ in samples if not ok)
+        return {
+            "samples": len(samples),
+            "error_rate": failures / len(samples) if samples else 0.0,
+            "ttft_p50": _percentile(ttfts, 50),
+            "ttft_p95": _percentile(ttfts, 95),
+            "first_row_p95": _percentile(first_rows, 95),
+            "tokens_per_second": sum(speeds) / len(speeds) if speeds else None
+        }
+
+    def get_stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """获取所有有样本的模型的统计"""
+        with self._lock:
+            models = list(dict.fromkeys(list(self._samples) + list(self._first_rows)))
+        return {model: self.get_model_stats(model) for model in models}
+
+# 进程级共享的模型指标
+_shared_metrics: Optional[ModelMetrics] = None
+_shared_lock = threading.Lock()
+
+def get_shared_model_metrics() -> ModelMetrics:
+    """获取进程级共享的模型指标"""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = ModelMetrics()
+        return _shared_metrics
@@ -0,0 +1,74 @@
+from typing import List, Optional
+from config import (
+    SUPPORTED_MODELS,
+    ROUTER_MAX_ERROR_RATE,
+    ROUTER_MAX_TTFT,
+    ROUTER_MIN_SAMPLES,
+    ROUTER_FIRST_ROW_TIMEOUT
+)
+from .model_metrics import ModelMetrics, get_shared_model_metrics
+
+# 路由策略
+ROUTING_POLICIES = {
+    "fallback": "按顺序回退",
+    "fastest": "最快优先"
+}
+
+class ModelRouter:
+    """根据各模型最近的延迟和错误率决定尝试顺序
+
+    fallback 策略按配置顺序尝试，fastest 策略按最近的 p95 首字节延迟从快到慢尝试。
+    两种策略都会把错误率过高或明显变慢的模型排到最后，只在其他模型都失败时兜底使用。
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        policy: str = "fallback",
+        metrics: Optional[ModelMetrics] = None,
+        max_error_rate: float = ROUTER_MAX_ERROR_RATE,
+        max_ttft: float = ROUTER_MAX_TTFT,
+        min_samples: int = ROUTER_MIN_SAMPLES,
+        first_row_timeout: float = ROUTER_FIRST_ROW_TIMEOUT
+    ):
+        models = list(dict.fromkeys(models))
+        if not models:
+            raise ValueError("路由模型列表不能为空")
+        unsupported = [model for model in models if model not in SUPPORTED_MODELS]
+        if unsupported:
+            raise ValueError(f"不支持的模型: {unsupported}")
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"不支持的路由策略: {policy}")
+
+        self.models = models
+        self.policy = policy
+        self.metrics = metrics or get_shared_model_metrics()
+        self.max_error_rate = max_error_rate
+        self.max_ttft = max_ttft
+        self.min_samples = min_samples
+        self.first_row_timeout = first_row_timeout
+
+    def is_healthy(self, model: str) -> bool:
+        """样本不足时视为健康；否则要求错误率和 p95 首字节延迟都在阈值内"""
+        stats = self.metrics.get_model_stats(model)
+        if stats["samples"] < self.min_samples:
+            return True
+        if stats["error_rate"] > self.max_error_rate:
+            return False
+        return stats["ttft_p95"] is None or stats["ttft_p95"] <= self.max_ttft
+
+    def candidates(self) -> List[str]:
+        """按策略返回本次生成依次尝试的模型"""
+        healthy = [model for model in self.models if self.is_healthy(model)]
+        degraded = [model for model in self.models if model not in healthy]
+
+        if self.policy == "fastest":
+            # 有延迟数据的模型按 p95 从快到慢排列，还没有数据的模型保持配置顺序排在其后
+            latency = {model: self.metrics.ttft_percentile(model, 95) for model in healthy}
+            measured = sorted(
+                (model for model in healthy if latency[model] is not None),
+                key=lambda model: latency[model]
+            )
+            healthy = measured + [model for model in healthy if latency[model] is None]
+
+        return healthy + degraded
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from config import RATE_LIMITS, MAX_CONCURRENT_REQUESTS
+
+class TokenBucket:
+    """令牌桶：容量为每分钟配额，按秒匀速补充
+
+    预订时允许余额为负，返回需要等待的秒数，调用方按预订顺序依次放行，无需轮询。
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """预订 amount 个令牌，返回需要等待的秒数"""
+        self._refill(now)
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float, now: float):
+        """归还多预订的令牌"""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """按接口地址和模型区分的请求数(RPM)与token数(TPM)限流器，进程内所有客户端共享"""
+
+    def __init__(self, limits: Dict[str, Dict[str, float]] = RATE_LIMITS):
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], Tuple[TokenBucket, TokenBucket]] = {}
+        self._stats = {"requests": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def _get_buckets(self, api_url: str, model_id: str) -> Tuple[TokenBucket, TokenBucket]:
+        key = (api_url, model_id)
+        if key not in self._buckets:
+            limit = self.limits.get(model_id, self.limits["default"])
+            self._buckets[key] = (TokenBucket(limit["rpm"]), TokenBucket(limit["tpm"]))
+        return self._buckets[key]
+
+    async def acquire(self, api_url: str, model_id: str, estimated_tokens: int) -> float:
+        """按预估token数预订配额，必要时等待，返回等待的秒数"""
+        with self._lock:
+            rpm_bucket, tpm_bucket = self._get_buckets(api_url, model_id)
+            now = time.monotonic()
+            # 单次请求的预估超过整分钟配额时按配额上限预订，避免永远等待
+            tokens = min(estimated_tokens, tpm_bucket.capacity)
+            wait = max(rpm_bucket.reserve(1, now), tpm_bucket.reserve(tokens, now))
+            self._stats["requests"] += 1
+            if wait > 0:
+                self._stats["throttled"] += 1
+                self._stats["wait_seconds"] += wait
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def reconcile(self, api_url: str, model_id: str, estimated_tokens: int, actual_tokens: int):
+        """请求结束后按实际用量归还多预订的token"""
+        with self._lock:
+            _, tpm_bucket = self._get_buckets(api_url, model_id)
+            reserved = min(estimated_tokens, tpm_bucket.capacity)
+            if reserved > actual_tokens:
+                tpm_bucket.refund(reserved - actual_tokens, time.monotonic())
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取限流统计"""
+        with self._lock:
+            return dict(self._stats)
+
+class ConcurrencyGovernor:
+    """进程级并发上限，可在不同线程的事件循环之间共享，按到达顺序放行"""
+
+    def __init__(self, limit: int = MAX_CONCURRENT_REQUESTS):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: deque = deque()
+        self._max_active = 0
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self._max_active = max(self._max_active, self._active)
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            # 放行后、恢复执行前被取消时名额已经转交过来，需要归还；
+            # 放行前被取消的名额由 _grant 转交给下一个等待者
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    # 名额直接转交给下一个等待者，活跃数不变
+                    loop.call_soon_threadsafe(self._grant, future)
+                except RuntimeError:
+                    # 等待者的事件循环已关闭
+                    continue
+                return
+            self._active -= 1
+
+    def _grant(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个并发名额"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取并发统计"""
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "waiting": len(self._waiters),
+                "max_active": self._max_active
+            }
+
+# 进程级共享的限流器和并发控制器
+_shared_rate_limiter: Optional[RateLimiter] = None
+_shared_governor: Optional[ConcurrencyGovernor] = None
+_shared_lock = threading.Lock()
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """获取进程级共享的限流器"""
+    global _shared_rate_limiter
+    with _shared_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter()
+        return _shared_rate_limiter
+
+def get_shared_governor() -> ConcurrencyGovernor:
+    """获取进程级共享的并发控制器"""
+    global _shared_governor
+    with _shared_lock:
+        if _shared_governor is None:
+            _shared_governor = ConcurrencyGovernor()
+        return _shared_governor
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Iterator
+from config import (
+    CACHE_ENABLED,
+    CACHE_PATH,
+    CACHE_TTL,
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_BYTES
+)
+
+class ResponseCache:
+    """基于SQLite的生成结果缓存
+
+    以请求内容的哈希作为键，过期条目按TTL清理，超出条数或容量上限时按最近访问时间淘汰。
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_PATH,
+        ttl: float = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，退出时提交事务并关闭"""
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(
+        model_id: str,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        temperature: float
+    ) -> str:
+        """根据请求内容计算缓存键"""
+        content = json.dumps(
+            [model_id, list(columns), prompt, num_rows, temperature],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """读取缓存，未命中或已过期时返回 None"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._stats["misses"] += 1
+                self._stats["evictions"] += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._stats["hits"] += 1
+        return json.loads(value)
+
+    def put(self, key: str, rows: List[Dict[str, str]]):
+        """写入缓存并按需淘汰旧条目"""
+        value = json.dumps(rows, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+            self._stats["stores"] += 1
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """清理过期条目，并按最近访问时间淘汰超出上限的条目"""
+        evicted = conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+
+        count, total_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count > self.max_entries or total_size > self.max_bytes:
+            excess_size = total_size - self.max_bytes
+            excess_count = count - self.max_entries
+            victims = []
+            for key, size in conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+            ):
+                if excess_count <= 0 and excess_size <= 0:
+                    break
+                victims.append((key,))
+                excess_count -= 1
+                excess_size -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            evicted += len(victims)
+
+        self._stats["evictions"] += evicted
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            with self._connect() as conn:
+                stats["entries"], stats["bytes"] = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+# 进程级共享的结果缓存
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+def get_shared_cache() -> Optional[ResponseCache]:
+    """获取进程级共享的结果缓存，未启用缓存时返回 None"""
+    global _shared_cache
+    if not CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
@@ -0,0 +1,151 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import (
+    ROW_TOKENS_PATH,
+    ROW_TOKENS_SMOOTHING,
+    ROW_TOKENS_MAX_ENTRIES,
+    ROW_TOKENS_FLUSH_INTERVAL
+)
+from .token_utils import estimate_tokens
+
+# 没有历史数据时每个值的预估token数
+DEFAULT_VALUE_TOKENS = 8
+
+def prior_tokens_per_row(columns: List[str], output_format: str = "json") -> float:
+    """没有历史数据时按列数和列名长度估算每行的输出token数"""
+    value_tokens = DEFAULT_VALUE_TOKENS * len(columns)
+    if output_format == "tsv":
+        # 每个值一个分隔符，行尾一个换行
+        return value_tokens + len(columns) + 1
+    # JSON 每行都要重复列名，外加引号、冒号、逗号和括号
+    return value_tokens + sum(estimate_tokens(col) + 3 for col in columns) + 4
+
+class RowTokenEstimator:
+    """按模型、输出格式和列结构记录每行数据实际消耗的输出token数，持久化到本地文件
+
+    新的观测值按指数平滑合并，用于估算单次请求能在 max_tokens 内完整生成多少行。
+    观测只更新内存，由后台定时器合并写入文件，不阻塞调用方所在的事件循环。
+    """
+
+    def __init__(
+        self,
+        path: Path = ROW_TOKENS_PATH,
+        smoothing: float = ROW_TOKENS_SMOOTHING,
+        max_entries: int = ROW_TOKENS_MAX_ENTRIES,
+        flush_interval: float = ROW_TOKENS_FLUSH_INTERVAL
+    ):
+        self.path = Path(path)
+        self.smoothing = smoothing
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # 保证同一时间只有一个线程在写文件
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._entries: Dict[str, Dict] = self._load()
+
+    @staticmethod
+    def make_key(model_id: str, columns: List[str], output_format: str) -> str:
+        """根据模型、输出格式和列名计算记录的键"""
+        content = json.dumps([model_id, output_format, list(columns)], ensure_ascii=False)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, content: str):
+        """先写临时文件再替换，避免并发读到写了一半的文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """把尚未持久化的观测写入文件"""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                content = json.dumps(self._entries)
+                self._dirty = False
+            try:
+                self._save(content)
+            except OSError:
+                # 持久化失败不影响生成，本进程内的估算仍然有效
+                pass
+
+    def estimate(self, model_id: str, columns: List[str], output_format: str = "json") -> float:
+        """每行的预估输出token数"""
+        key = self.make_key(model_id, columns, output_format)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return prior_tokens_per_row(columns, output_format)
+        return entry["tokens_per_row"]
+
+    def get_samples(self, model_id: str, columns: List[str], output_format: str = "json") -> int:
+        """已记录的观测次数"""
+        key = self.make_key(model_id, columns, output_format)
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry["samples"] if entry else 0
+
+    def observe(
+        self,
+        model_id: str,
+        columns: List[str],
+        output_format: str,
+        tokens_per_row: float
+    ):
+        """合并一次请求观测到的每行token数"""
+        key = self.make_key(model_id, columns, output_format)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"tokens_per_row": tokens_per_row, "samples": 0}
+            else:
+                entry["tokens_per_row"] += self.smoothing * (tokens_per_row - entry["tokens_per_row"])
+            entry["samples"] += 1
+            entry["updated_at"] = time.time()
+            self._entries[key] = entry
+            # 超出上限时丢弃最久没有更新的记录
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k].get("updated_at", 0))
+                for stale_key in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[stale_key]
+            self._dirty = True
+            # 一段时间内的多次观测合并为一次写入
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+# 进程级共享的估算器
+_shared_estimator: Optional[RowTokenEstimator] = None
+_shared_lock = threading.Lock()
+
+def get_shared_row_estimator() -> RowTokenEstimator:
+    """获取进程级共享的每行token数估算器"""
+    global _shared_estimator
+    with _shared_lock:
+        if _shared_estimator is None:
+            _shared_estimator = RowTokenEstimator()
+            # 进程退出前写入最后一批观测
+            atexit.register(_shared_estimator.flush)
+        return _shared_estimator
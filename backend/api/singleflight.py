@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from .aio_utils import wait_with_timeout
+
+# 标记上游流已正常结束
+_DONE = object()
+
+class _Event:
+    """上游流附带的事件（进度、用量等），由每个订阅者在自己的事件循环中处理"""
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+
+class _Flight:
+    """一次进行中的上游请求：缓存已产出的行，并分发给所有订阅者"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.task: Optional[asyncio.Task] = None
+        self.rows: List[Any] = []
+        # 需要回放给后加入订阅者的事件
+        self.events: List[_Event] = []
+        self.done = False
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+class SingleFlight:
+    """进程级请求合并：相同键的并发请求只发起一次上游调用，结果流式分发给所有等待者
+
+    上游流在第一个请求者的事件循环上以独立任务运行，其他请求者可以位于不同线程的事件循环中
+    （例如不同的 Streamlit 会话），后加入的请求者会先收到已产出的行。
+    上游通过 factory 收到的 publish 发布进度、用量等事件，事件分发给每个订阅者各自的 on_event，
+    上游本身不调用任何请求者的回调。所有订阅者都离开后上游任务会被取消。
+    """
+
+    def __init__(self, poll_interval: float = 1.0):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"upstream_calls": 0, "coalesced": 0}
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[Callable[..., None]], AsyncIterator[Any]],
+        on_coalesced: Optional[Callable[[], None]] = None,
+        on_event: Optional[Callable[[Any], None]] = None
+    ) -> AsyncIterator[Any]:
+        """订阅键对应的上游流，不存在时调用 factory(publish) 创建；加入已有的上游流时调用 on_coalesced
+
+        上游发布的事件在本订阅者的事件循环中交给 on_event 处理。
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            flight = self._flights.get(key)
+            coalesced = flight is not None
+            if flight is None:
+                flight = _Flight(loop)
+                rows = factory(functools.partial(self._publish, flight))
+                flight.task = loop.create_task(self._run(key, flight, rows))
+                self._flights[key] = flight
+                self._stats["upstream_calls"] += 1
+            else:
+                self._stats["coalesced"] += 1
+                for row in flight.rows:
+                    queue.put_nowait(row)
+                for event in flight.events:
+                    queue.put_nowait(event)
+            subscriber = (loop, queue)
+            flight.subscribers.append(subscriber)
+
+        if coalesced and on_coalesced:
+            on_coalesced()
+
+        try:
+            while True:
+                try:
+                    item = await wait_with_timeout(queue.get(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    # 发起请求的事件循环已关闭时，上游任务不会再有进展
+                    if flight.loop.is_closed():
+                        raise Exception("共享的生成任务已中断，请重试")
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, _Event):
+                    if on_event:
+                        on_event(item.payload)
+                    continue
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self._unsubscribe(key, flight, subscriber)
+
+    def _unsubscribe(self, key: str, flight: _Flight, subscriber):
+        """移除订阅者；没有订阅者时取消上游任务"""
+        with self._lock:
+            if subscriber in flight.subscribers:
+                flight.subscribers.remove(subscriber)
+            abandoned = not flight.subscribers and not flight.done
+            if abandoned and self._flights.get(key) is flight:
+                del self._flights[key]
+        if abandoned and not flight.loop.is_closed():
+            flight.loop.call_soon_threadsafe(flight.task.cancel)
+
+    def _publish(self, flight: _Flight, payload: Any, replay: bool = False):
+        """把上游的事件分发给当前所有订阅者；replay 为真时同时保留给后加入的订阅者"""
+        event = _Event(payload)
+        with self._lock:
+            if replay:
+                flight.events.append(event)
+            subscribers = list(flight.subscribers)
+        self._dispatch(subscribers, event)
+
+    async def _run(self, key: str, flight: _Flight, rows: AsyncIterator[Any]):
+        """在发起者的事件循环上运行上游流并分发结果"""
+        try:
+            async for row in rows:
+                with self._lock:
+                    flight.rows.append(row)
+                    subscribers = list(flight.subscribers)
+                self._dispatch(subscribers, row)
+        except asyncio.CancelledError:
+            self._finish(key, flight, Exception("共享的生成任务已取消"))
+            raise
+        except Exception as e:
+            self._finish(key, flight, e)
+        else:
+            self._finish(key, flight, _DONE)
+
+    def _finish(self, key: str, flight: _Flight, item):
+        """标记上游流结束并通知所有订阅者"""
+        with self._lock:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            subscribers = list(flight.subscribers)
+        self._dispatch(subscribers, item)
+
+    @staticmethod
+    def _dispatch(subscribers, item):
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取请求合并统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
+
+# 进程级共享的请求合并器
+_shared_singleflight: Optional[SingleFlight] = None
+_shared_lock = threading.Lock()
+
+def get_shared_singleflight() -> SingleFlight:
+    """获取进程级共享的请求合并器"""
+    global _shared_singleflight
+    with _shared_lock:
+        if _shared_singleflight is None:
+            _shared_singleflight = SingleFlight()
+        return _shared_singleflight
@@ -1,11 +1,88 @@
+import asyncio
+import hashlib
+import json
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator, Tuple
 from .deepseek_client import DeepSeekClient
-from config import DEEPSEEK_API_KEY, DEFAULT_MODEL
+from .model_router import ModelRouter
+from .hedging import hedged_stream, get_shared_hedge_budget
+from .combinatorial import CombinatorialExpander, split_columns, suggest_pool_size, derived_kind
+from .validation import DataValidator, ValidationReport
+from .dedup import RowHashIndex
+from .aio_utils import wait_with_timeout
+from .diversity import NearDuplicateDetector, text_columns
+from .cell_filler import ROW_ID, find_missing_cells, context_row, apply_fills
+from config import (
+    DEEPSEEK_API_KEY,
+    DEFAULT_MODEL,
+    MIN_ROWS,
+    MAX_ROWS,
+    SHARD_SIZE,
+    MAX_CONCURRENT_SHARDS,
+    MAX_SHARD_TOPUP_ROUNDS,
+    HEDGE_MAX_ROWS,
+    HEDGE_PERCENTILE,
+    HEDGE_DEFAULT_DELAY,
+    COMBINATORIAL_MAX_ROWS,
+    COMBINATORIAL_OVERFETCH,
+    COMBINATORIAL_DEDUP_ROUNDS,
+    DEDUP_MAX_REPLACEMENT_ROUNDS,
+    DEDUP_SAMPLE_ROWS,
+    MAX_TOPUP_ROUNDS,
+    FILL_BATCH_ROWS,
+    FILL_MAX_COLUMNS,
+    COLUMNWISE_KEY_COLUMNS
+)
+
+# 分片时轮换使用的多样性提示，让不同分片侧重不同的细分方向
+SHARD_DIVERSITY_HINTS = [
+    "入门款、价格亲民的商品",
+    "中端主流、销量最好的商品",
+    "高端旗舰、用料考究的商品",
+    "小众特色、设计独特的商品",
+    "面向特定人群（学生、商务、老人、儿童等）的商品",
+    "节日限定、联名或季节性的商品",
+    "不同产地、品牌风格差异明显的商品",
+    "功能组合与规格搭配与众不同的商品"
+]
+
+# 生成模式
+GENERATION_MODES = {
+    "rows": "逐行生成",
+    "combinatorial": "属性组合扩展",
+    "columnwise": "按列分组生成"
+}
 
 class SKUGenerator:
-    def __init__(self, model: str = DEFAULT_MODEL):
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        shard_size: int = SHARD_SIZE,
+        max_concurrency: int = MAX_CONCURRENT_SHARDS,
+        router: Optional[ModelRouter] = None,
+        hedge: bool = False
+    ):
         self.deepseek_client = DeepSeekClient(DEEPSEEK_API_KEY, model=model)
+        self.shard_size = shard_size
+        self.max_concurrency = max_concurrency
+        # 设置路由后，生成失败或过慢时自动切换到下一个模型
+        self.router = router
+        self._routed_clients: Dict[str, DeepSeekClient] = {}
+        # 开启后，小批量生成迟迟没有返回第一行时发起对冲请求
+        self.hedge = hedge
+        self.hedge_budget = get_shared_hedge_budget()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def aclose(self):
+        """释放底层客户端资源"""
+        await self.deepseek_client.aclose()
+        for client in self._routed_clients.values():
+            await client.aclose()
     
     def validate_columns(self, columns: List[str]) -> List[str]:
         """验证并清理列名"""
@@ -33,67 +110,738 @@ class SKUGenerator:
         """创建SKU模板"""
         return pd.DataFrame(columns=columns)
     
+    def _prepare_request(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        max_rows: int = MAX_ROWS
+    ):
+        """验证生成请求的参数，返回清理后的列名和提示词"""
+        # 验证输入
+        columns = self.validate_columns(columns)
+        prompt = self.validate_prompt(prompt)
+        
+        if not MIN_ROWS <= num_rows <= max_rows:
+            raise ValueError(f"生成行数必须在{MIN_ROWS}到{max_rows}之间")
+        
+        if progress_callback:
+            progress_callback("🔍 验证输入参数...")
+        
+        # 检查API密钥
+        if not self.deepseek_client.use_mock:
+            if not self.deepseek_client.api_key:
+                raise Exception("未配置API密钥")
+        
+        return columns, prompt
+    
     async def generate_sku_data(
         self, 
         columns: List[str], 
         prompt: str, 
         num_rows: int,
-        progress_callback=None
+        progress_callback=None,
+        use_cache: bool = True,
+        mode: str = "rows",
+        exclude: Optional[RowHashIndex] = None,
+        diversity: Optional[NearDuplicateDetector] = None
     ) -> List[Dict[str, str]]:
         """生成SKU数据"""
+        return [
+            row async for row in self.stream_sku_data(
+                columns, prompt, num_rows, progress_callback,
+                use_cache=use_cache, mode=mode, exclude=exclude, diversity=diversity
+            )
+        ]
+    
+    async def stream_sku_data(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True,
+        mode: str = "rows",
+        exclude: Optional[RowHashIndex] = None,
+        diversity: Optional[NearDuplicateDetector] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """流式生成SKU数据，每生成一行立即产出；行数超过分片大小时自动并发分片生成
+
+        mode 为 combinatorial 时只向模型请求各属性的取值池，在本地组合出所有行；
+        为 columnwise 时先生成关键列，再按列分组并发生成其余各列，适合列数较多的模板。
+        设置 exclude 时拒绝与索引中已有数据重复的行以及本次生成中互相重复的行，并请求替换；
+        不修改 exclude，调用方应在校验并保存数据后再把保存的行加入索引。
+        设置 diversity 时统计近似重复的行，检测器开启 reject 时同样拒绝并请求替换；
+        组合扩展模式的各行本就是不同的属性组合，不做近似重复检测。
+        """
         try:
-            # 验证输入
-            columns = self.validate_columns(columns)
-            prompt = self.validate_prompt(prompt)
+            if mode not in GENERATION_MODES:
+                raise ValueError(f"不支持的生成模式: {mode}")
+            max_rows = COMBINATORIAL_MAX_ROWS if mode == "combinatorial" else MAX_ROWS
+            columns, prompt = self._prepare_request(
+                columns, prompt, num_rows, progress_callback, max_rows=max_rows
+            )
+            
+            if exclude is not None:
+                missing = [col for col in exclude.key_columns if col not in columns]
+                if missing:
+                    raise ValueError(f"去重依据列不在生成的属性中：{missing}")
             
-            if not 1 <= num_rows <= 50:
-                raise ValueError("生成行数必须在1到50之间")
+            if mode == "combinatorial":
+                rows = self._stream_combinatorial(
+                    columns, prompt, num_rows, progress_callback, use_cache=use_cache, exclude=exclude
+                )
+            elif exclude is not None or diversity is not None:
+                rows = self._stream_filtered(
+                    columns, prompt, num_rows, exclude, diversity, progress_callback,
+                    use_cache=use_cache, mode=mode
+                )
+            else:
+                rows = self._stream_rows(
+                    columns, prompt, num_rows, progress_callback, use_cache=use_cache, mode=mode
+                )
             
+            async for row in rows:
+                yield row
+            
+        except Exception as e:
             if progress_callback:
-                progress_callback("🔍 验证输入参数...")
+                progress_callback(f"❌ 错误: {str(e)}")
+            raise
+    
+    def _stream_rows(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True,
+        mode: str = "rows"
+    ) -> AsyncIterator[Dict[str, str]]:
+        """逐行生成：行数超过分片大小时并发分片，否则单次生成；mode 为 columnwise 时按列分组生成"""
+        if mode == "columnwise" and len(columns) > COLUMNWISE_KEY_COLUMNS:
+            return self._stream_columnwise(
+                columns, prompt, num_rows, progress_callback, use_cache=use_cache
+            )
+        # 模拟数据在本地生成，不需要分片
+        if num_rows > self.shard_size and not self.deepseek_client.use_mock:
+            return self._stream_sharded(
+                columns, prompt, num_rows, progress_callback, use_cache=use_cache
+            )
+        return self._stream_content(
+            columns,
+            prompt,
+            num_rows,
+            progress_callback=progress_callback,
+            use_cache=use_cache
+        )
+    
+    def _build_replacement_prompt(
+        self,
+        prompt: str,
+        rejected: List[Dict[str, str]],
+        columns: List[str],
+        round_index: int
+    ) -> str:
+        """请求替换被拒绝的行时附带示例，提示词随轮次变化，不会命中同一条缓存"""
+        samples = "\n".join(
+            "- " + "，".join(f"{col}: {row.get(col, '')}" for col in columns)
+            for row in rejected[-DEDUP_SAMPLE_ROWS:]
+        )
+        return (
+            f"{prompt}\n\n"
+            f"（第{round_index}轮补充：以下数据与已有数据重复或过于相似，"
+            f"请生成与已有数据明显不同的新数据，不要复用它们的{'、'.join(columns)}：\n"
+            f"{samples}）"
+        )
+    
+    async def _stream_filtered(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        exclude: Optional[RowHashIndex] = None,
+        diversity: Optional[NearDuplicateDetector] = None,
+        progress_callback=None,
+        use_cache: bool = True,
+        mode: str = "rows"
+    ) -> AsyncIterator[Dict[str, str]]:
+        """逐行生成并拒绝与已有数据重复或近似重复的行，缺口按轮次请求替换"""
+        produced = 0
+        duplicates = 0
+        rejected: List[Dict[str, str]] = []
+        prompt_columns = exclude.key_columns if exclude is not None else text_columns(columns)
+        # 本次接受的行单独记录，校验前不写入调用方的索引
+        accepted = RowHashIndex(columns, exclude.key_columns) if exclude is not None else None
+        for round_index in range(DEDUP_MAX_REPLACEMENT_ROUNDS + 1):
+            remaining = num_rows - produced
+            if remaining <= 0:
+                break
+            round_prompt = prompt
+            if round_index > 0:
+                round_prompt = self._build_replacement_prompt(prompt, rejected, prompt_columns, round_index)
+                if progress_callback:
+                    progress_callback(
+                        f"♻️ 已拒绝 {len(rejected)} 条重复或过于相似的数据，"
+                        f"第 {round_index} 轮请求替换 {remaining} 条..."
+                    )
             
-            # 检查API密钥
-            if not self.deepseek_client.use_mock:
-                if not self.deepseek_client.api_key:
-                    raise Exception("未配置API密钥")
+            round_rejected = 0
+            rows = self._stream_rows(
+                columns, round_prompt, remaining, progress_callback, use_cache=use_cache, mode=mode
+            )
+            try:
+                async for row in rows:
+                    if exclude is not None and (exclude.contains(row) or accepted.contains(row)):
+                        duplicates += 1
+                    elif diversity is None or diversity.add(row):
+                        if accepted is not None:
+                            accepted.add(row)
+                        produced += 1
+                        yield row
+                        if produced >= num_rows:
+                            break
+                        continue
+                    rejected.append(row)
+                    round_rejected += 1
+            finally:
+                await rows.aclose()
             
-            # 调用API生成数据
-            result = await self.deepseek_client.generate_sku_content(
-                columns,
-                prompt,
-                num_rows,
-                progress_callback=progress_callback  # 确保正确传递回调
+            # 缺口不是重复造成的，再请求也无济于事
+            if round_rejected == 0:
+                break
+        
+        if progress_callback:
+            if duplicates:
+                progress_callback(f"🧹 共拒绝 {duplicates} 条与已有数据重复的数据")
+            if diversity is not None:
+                progress_callback(diversity.summary())
+            if produced < num_rows:
+                progress_callback(f"⚠️ 去重后只生成了 {produced}/{num_rows} 条新数据")
+    
+    async def _stream_columnwise(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, str]]:
+        """按列分组生成：先逐行生成模板前几列作为关键列，再把其余各列分组并发补全，按行编号在本地合并
+
+        每个请求只输出少数几列，宽模板也不容易因输出过长被截断；各列都补全的行才会产出。
+        """
+        key_columns = columns[:COLUMNWISE_KEY_COLUMNS]
+        dependent_columns = columns[COLUMNWISE_KEY_COLUMNS:]
+        if progress_callback:
+            progress_callback(f"🔑 第一步：生成关键列 {key_columns}...")
+        key_rows = [
+            row async for row in self._stream_rows(
+                key_columns, prompt, num_rows, progress_callback, use_cache=use_cache
+            )
+        ]
+        if not key_rows:
+            return
+        
+        if progress_callback:
+            progress_callback(
+                f"🧩 第二步：按每组最多 {FILL_MAX_COLUMNS} 列并发生成其余 {len(dependent_columns)} 列..."
             )
+        df = pd.DataFrame(key_rows, columns=columns)
+        values: Dict[int, Dict[str, str]] = {}
+        produced = 0
+        async for fill in self.stream_cell_fills(
+            df, prompt, dependent_columns, progress_callback, max_columns=FILL_MAX_COLUMNS
+        ):
+            row_values = values.setdefault(fill[ROW_ID], {})
+            row_values.update((col, value) for col, value in fill.items() if col != ROW_ID)
+            if len(row_values) == len(dependent_columns):
+                row = key_rows[fill[ROW_ID]]
+                produced += 1
+                yield {col: row_values.get(col, row.get(col)) for col in columns}
+        
+        if produced < len(key_rows) and progress_callback:
+            progress_callback(f"⚠️ 有 {len(key_rows) - produced} 行的部分列没有生成，已丢弃")
+    
+    def _get_client(self, model: str) -> DeepSeekClient:
+        """获取指定模型的客户端，API密钥和模式与主客户端保持一致"""
+        if model == self.deepseek_client.model:
+            return self.deepseek_client
+        if model not in self._routed_clients:
+            self._routed_clients[model] = DeepSeekClient(
+                self.deepseek_client.api_key,
+                model=model,
+                cache=self.deepseek_client.cache
+            )
+        client = self._routed_clients[model]
+        if client.api_key != self.deepseek_client.api_key:
+            client.update_api_key(self.deepseek_client.api_key)
+        client.use_mock = self.deepseek_client.use_mock
+        client.temperature = self.deepseek_client.temperature
+        client.output_format = self.deepseek_client.output_format
+        return client
+    
+    async def _stream_content(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, str]]:
+        """单次生成：未设置路由时直接调用当前模型，否则按路由顺序依次尝试"""
+        if self.router is None or self.deepseek_client.use_mock:
+            async for row in self._open_stream(
+                self.deepseek_client.model, None, columns, prompt, num_rows, progress_callback, use_cache
+            ):
+                yield row
+            return
+        
+        candidates = self.router.candidates()
+        seen = set()
+        produced = 0
+        last_error = None
+        for attempt, model in enumerate(candidates):
+            if attempt > 0 and progress_callback:
+                progress_callback(f"🔀 切换到模型 {model}，继续生成剩余 {num_rows - produced} 条数据...")
             
-            return result
+            # 对冲请求优先发给下一个候选模型
+            hedge_model = candidates[attempt + 1] if attempt + 1 < len(candidates) else None
+            rows = self._open_stream(
+                model, hedge_model, columns, prompt, num_rows - produced, progress_callback, use_cache
+            )
+            received = False
+            try:
+                while True:
+                    try:
+                        if not received:
+                            # 迟迟没有返回第一行的模型视为过慢，放弃并切换
+                            row = await wait_with_timeout(
+                                rows.__anext__(), timeout=self.router.first_row_timeout
+                            )
+                        else:
+                            row = await rows.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    received = True
+                    # 切换模型后可能重复生成已有的行
+                    key = self._row_key(row, columns)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    produced += 1
+                    yield row
+                return
+            except asyncio.TimeoutError:
+                self.router.metrics.record_failure(model)
+                last_error = Exception(
+                    f"模型 {model} 在 {self.router.first_row_timeout} 秒内没有返回数据"
+                )
+            except Exception as e:
+                last_error = e
+            finally:
+                await rows.aclose()
             
-        except Exception as e:
             if progress_callback:
-                progress_callback(f"❌ 错误: {str(e)}")
-            raise
+                progress_callback(f"⚠️ 模型 {model} 生成失败：{str(last_error)}")
+        
+        if produced == 0:
+            raise last_error
+        if progress_callback:
+            progress_callback(f"⚠️ 所有模型均已尝试，只生成了 {produced}/{num_rows} 条数据")
+    
+    def _open_stream(
+        self,
+        model: str,
+        hedge_model: Optional[str],
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, str]]:
+        """调用指定模型生成；开启对冲时小批量生成超过首行耗时百分位数仍无数据，则向 hedge_model 发起对冲请求"""
+        client = self._get_client(model)
+        rows = client.stream_sku_content(
+            columns, prompt, num_rows, progress_callback=progress_callback, use_cache=use_cache
+        )
+        if not self.hedge or client.use_mock or num_rows > HEDGE_MAX_ROWS:
+            return rows
+        
+        hedge_model = hedge_model or model
+        delay = client.metrics.first_row_percentile(model, HEDGE_PERCENTILE)
+        if delay is None:
+            delay = HEDGE_DEFAULT_DELAY
+        
+        def on_hedge():
+            if progress_callback:
+                progress_callback(f"🏁 {delay:.1f} 秒内没有返回数据，向模型 {hedge_model} 发起对冲请求...")
+        
+        def on_hedge_win():
+            if progress_callback:
+                progress_callback("⚡ 对冲请求先返回数据，已取消较慢的请求")
+        
+        # 对冲请求不参与缓存和请求合并，否则会与原请求合并为同一次上游调用
+        return hedged_stream(
+            rows,
+            lambda: self._get_client(hedge_model).stream_sku_content(
+                columns, prompt, num_rows, progress_callback=progress_callback, use_cache=False
+            ),
+            delay,
+            self.hedge_budget,
+            on_hedge=on_hedge,
+            on_hedge_win=on_hedge_win
+        )
+    
+    async def _stream_combinatorial(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True,
+        exclude: Optional[RowHashIndex] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """组合扩展：一次请求取得各属性的取值池，在本地展开、过滤并抽样组合"""
+        pool_columns, _ = split_columns(columns)
+        if not pool_columns:
+            raise ValueError("组合扩展模式至少需要一个价格、库存、编码以外的属性列")
+        if exclude is not None:
+            # 派生列的取值每次展开都不同，按它们去重永远不会命中
+            derived = [col for col in exclude.key_columns if derived_kind(col) is not None]
+            if derived:
+                raise ValueError(f"组合扩展模式按属性组合去重，去重依据列不能包含价格、库存、编码等派生列：{derived}")
+        
+        start_time = asyncio.get_event_loop().time()
+        pool_size = suggest_pool_size(num_rows, len(pool_columns))
+        if progress_callback:
+            progress_callback(f"🧩 正在生成各属性的取值池（每列约 {pool_size} 个取值）...")
+        spec = await self.deepseek_client.generate_value_pools(
+            columns, prompt, pool_size, progress_callback, use_cache=use_cache
+        )
+        
+        # 使用缓存时固定随机种子，相同请求得到相同的组合
+        seed = None
+        if use_cache:
+            digest = hashlib.sha256(
+                json.dumps([columns, prompt, num_rows], ensure_ascii=False).encode("utf-8")
+            ).hexdigest()
+            seed = int(digest[:16], 16)
+        expander = CombinatorialExpander(columns, spec, seed=seed)
+        if progress_callback:
+            progress_callback(
+                f"🔢 共 {expander.total_combinations} 种组合"
+                f"（排除规则 {len(expander.exclusions)} 条），正在本地展开..."
+            )
+        
+        produced = 0
+        rejected = 0
+        # 需要跳过与已有数据重复的组合时按缺口的倍数展开候选，重复较多时分轮补充，
+        # 展开的候选数与已有数据的规模无关
+        overfetch = 1 if exclude is None else COMBINATORIAL_OVERFETCH
+        accepted = RowHashIndex(columns, exclude.key_columns) if exclude is not None else None
+        for _ in range(COMBINATORIAL_DEDUP_ROUNDS + 1):
+            limit = min((num_rows - produced) * overfetch, expander.total_combinations)
+            round_produced = 0
+            for row in expander.expand(limit, start=produced):
+                if exclude is not None and (exclude.contains(row) or not accepted.add(row)):
+                    rejected += 1
+                    continue
+                produced += 1
+                round_produced += 1
+                yield row
+                if produced % 500 == 0:
+                    # 大批量展开时让出事件循环
+                    await asyncio.sleep(0)
+                if progress_callback and (produced % 100 == 0 or produced == num_rows):
+                    progress_callback(f"✅ 完成第 {produced}/{num_rows} 条数据")
+                if produced >= num_rows:
+                    break
+            # 不去重时一轮就能产出全部组合；本轮没有新组合说明取值池已经用尽
+            if produced >= num_rows or exclude is None or round_produced == 0:
+                break
+        
+        if progress_callback:
+            if rejected:
+                progress_callback(f"🧹 跳过了 {rejected} 个与已有数据重复的组合")
+            if produced < num_rows:
+                progress_callback(f"⚠️ 取值池只能组成 {produced} 种有效组合，少于要求的 {num_rows} 条")
+            # 本地展开可能快到计时为0
+            total_time = max(asyncio.get_event_loop().time() - start_time, 0.001)
+            progress_callback(
+                f"🎉 生成完成！\n"
+                f"总用时：{total_time:.1f} 秒\n"
+                f"平均速度：{produced/total_time:.1f} 条/秒"
+            )
+    
+    def _build_shard_prompt(self, prompt: str, shard_index: int, num_shards: int, seed: int) -> str:
+        """为分片追加多样性提示，避免各分片生成相同的数据"""
+        hint = SHARD_DIVERSITY_HINTS[seed % len(SHARD_DIVERSITY_HINTS)]
+        return (
+            f"{prompt}\n\n"
+            f"（这是第{shard_index + 1}/{num_shards}批数据，批次编号{seed}。"
+            f"本批请侧重{hint}，并与其他批次的数据保持明显差异。）"
+        )
+    
+    @staticmethod
+    def _row_key(row: Dict[str, str], columns: List[str]) -> Tuple[str, ...]:
+        """生成用于去重的行键"""
+        return tuple(str(row.get(col, "")).strip() for col in columns)
+    
+    async def _stream_sharded(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        progress_callback=None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, str]]:
+        """将大批量请求拆分为多个并发分片，合并去重并补齐缺口"""
+        seen = set()
+        produced = 0
+        start_time = asyncio.get_event_loop().time()
+        
+        for round_index in range(MAX_SHARD_TOPUP_ROUNDS + 1):
+            remaining = num_rows - produced
+            if remaining <= 0:
+                break
+            
+            shard_sizes = [
+                min(self.shard_size, remaining - offset)
+                for offset in range(0, remaining, self.shard_size)
+            ]
+            if progress_callback:
+                if round_index == 0:
+                    progress_callback(
+                        f"🚀 拆分为 {len(shard_sizes)} 个分片并发生成，"
+                        f"最多同时进行 {self.max_concurrency} 个..."
+                    )
+                else:
+                    progress_callback(f"⚠️ 去重后还差 {remaining} 条数据，第 {round_index} 轮补充生成...")
+            
+            queue: asyncio.Queue = asyncio.Queue()
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            async def run_shard(index: int, size: int):
+                try:
+                    async with semaphore:
+                        # 批次编号由轮次和分片序号确定，相同的大批量请求可以逐个分片命中缓存
+                        seed = round_index * 1000 + index
+                        shard_prompt = self._build_shard_prompt(prompt, index, len(shard_sizes), seed)
+                        async for row in self._stream_content(
+                            columns, shard_prompt, size, use_cache=use_cache
+                        ):
+                            await queue.put(row)
+                except Exception as e:
+                    await queue.put(e)
+                    return
+                await queue.put(None)
+            
+            tasks = [
+                asyncio.create_task(run_shard(index, size))
+                for index, size in enumerate(shard_sizes)
+            ]
+            pending = len(tasks)
+            round_produced = 0
+            last_error = None
+            try:
+                while pending and produced < num_rows:
+                    item = await queue.get()
+                    if item is None:
+                        pending -= 1
+                        continue
+                    if isinstance(item, Exception):
+                        pending -= 1
+                        last_error = item
+                        if progress_callback:
+                            progress_callback(f"⚠️ 有分片生成失败，稍后补充：{str(item)}")
+                        continue
+                    
+                    key = self._row_key(item, columns)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    produced += 1
+                    round_produced += 1
+                    yield item
+                    
+                    if progress_callback:
+                        progress_callback(f"✅ 完成第 {produced}/{num_rows} 条数据")
+                        if produced < num_rows:
+                            progress_callback(f"⏳ 正在生成第 {produced + 1}/{num_rows} 条数据...")
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            
+            if round_produced == 0 and last_error is not None:
+                raise last_error
+        
+        if progress_callback:
+            total_time = asyncio.get_event_loop().time() - start_time
+            if produced < num_rows:
+                progress_callback(f"⚠️ 多轮补充后仍只生成了 {produced}/{num_rows} 条不重复的数据")
+            progress_callback(
+                f"🎉 生成完成！\n"
+                f"总用时：{total_time:.1f} 秒\n"
+                f"平均速度：{produced/total_time:.1f} 条/秒"
+            )
+    
+    async def stream_cell_fills(
+        self,
+        df: pd.DataFrame,
+        prompt: str = "",
+        columns: Optional[List[str]] = None,
+        progress_callback=None,
+        max_columns: int = FILL_MAX_COLUMNS
+    ) -> AsyncIterator[Dict[str, str]]:
+        """只为缺失的单元格生成取值，逐行产出 {id: 行位置, 列: 值}
+
+        缺失相同列的行合并为一组，每组按输出token预算拆分为多行一次的请求并发执行；
+        请求中每行只附带编号和已有取值，模型只返回缺失列的值。
+        """
+        df = df.reset_index(drop=True)
+        if ROW_ID in df.columns:
+            raise ValueError(f"列名 {ROW_ID} 是补全时使用的保留字段，请重命名该列")
+        groups = find_missing_cells(df, columns, max_columns)
+        if not groups:
+            if progress_callback:
+                progress_callback("✅ 没有需要补全的单元格")
+            return
+        
+        client = self.deepseek_client
+        if not client.use_mock and not client.api_key:
+            raise Exception("未配置API密钥")
+        prompt = prompt.strip() or "请根据每行已有的数据补全缺失的值"
+        
+        batches = []
+        for target_columns, positions in groups.items():
+            target_columns = list(target_columns)
+            batch_size = min(FILL_BATCH_ROWS, client.rows_per_request([ROW_ID] + target_columns))
+            for start in range(0, len(positions), batch_size):
+                batches.append((target_columns, positions[start:start + batch_size]))
+        total_rows = sum(len(positions) for _, positions in batches)
+        total_cells = sum(len(cols) * len(positions) for cols, positions in batches)
+        start_time = asyncio.get_event_loop().time()
+        if progress_callback:
+            progress_callback(
+                f"🧩 共 {total_cells} 个缺失单元格，按缺失的列分为 {len(groups)} 组、"
+                f"{len(batches)} 个请求并发补全，最多同时进行 {self.max_concurrency} 个..."
+            )
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def run_batch(target_columns: List[str], positions: List[int]):
+            validator = DataValidator.for_columns(target_columns)
+            remaining = positions
+            try:
+                async with semaphore:
+                    # 没有返回或取值无效的行再次请求，最多补充 MAX_TOPUP_ROUNDS 次
+                    for _ in range(MAX_TOPUP_ROUNDS + 1):
+                        context = [context_row(df, position, target_columns) for position in remaining]
+                        rows = [
+                            row async for row in client.stream_cell_values(
+                                target_columns, prompt, context, progress_callback
+                            )
+                        ]
+                        filled = set()
+                        if rows:
+                            report = validator.validate(
+                                pd.DataFrame(rows, columns=target_columns), on_error="keep"
+                            )
+                            invalid = set(report.invalid_rows)
+                            for index, values in enumerate(report.data.to_dict("records")):
+                                if index in invalid:
+                                    continue
+                                filled.add(rows[index][ROW_ID])
+                                await queue.put({ROW_ID: rows[index][ROW_ID], **values})
+                        remaining = [position for position in remaining if position not in filled]
+                        if not remaining:
+                            break
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+        
+        tasks = [
+            asyncio.create_task(run_batch(target_columns, positions))
+            for target_columns, positions in batches
+        ]
+        pending = len(tasks)
+        filled_rows = 0
+        filled_cells = 0
+        last_error = None
+        try:
+            while pending:
+                item = await queue.get()
+                if item is None:
+                    pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    pending -= 1
+                    last_error = item
+                    if progress_callback:
+                        progress_callback(f"⚠️ 有补全请求失败：{str(item)}")
+                    continue
+                
+                filled_rows += 1
+                filled_cells += len(item) - 1
+                yield item
+                if progress_callback:
+                    progress_callback(f"✅ 已补全 {filled_rows}/{total_rows} 行")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if filled_rows == 0 and last_error is not None:
+            raise last_error
+        if progress_callback:
+            if filled_rows < total_rows:
+                progress_callback(f"⚠️ 多次补充后仍有 {total_rows - filled_rows} 行没有补全")
+            total_time = asyncio.get_event_loop().time() - start_time
+            progress_callback(
+                f"🎉 补全完成！\n"
+                f"共补全 {filled_cells}/{total_cells} 个单元格，用时 {total_time:.1f} 秒"
+            )
+    
+    async def fill_missing_cells(
+        self,
+        df: pd.DataFrame,
+        prompt: str = "",
+        columns: Optional[List[str]] = None,
+        progress_callback=None
+    ) -> pd.DataFrame:
+        """补全缺失的单元格，返回补全后的新表"""
+        fills = [
+            row async for row in self.stream_cell_fills(df, prompt, columns, progress_callback)
+        ]
+        return apply_fills(df, fills)
     
     def validate_generated_data(
         self, 
         data: List[Dict[str, str]], 
         expected_columns: List[str]
-    ) -> None:
-        """验证生成的数据是否符合要求"""
+    ) -> ValidationReport:
+        """验证生成的数据是否符合要求，汇总所有问题后一次性抛出"""
         if not isinstance(data, list):
             raise ValueError("生成的数据必须是列表")
-        
-        for row in data:
-            if not isinstance(row, dict):
-                raise ValueError("生成的每行数据必须是字典")
-            
-            # 检查列名是否完整
-            missing_cols = set(expected_columns) - set(row.keys())
-            if missing_cols:
-                raise ValueError(f"生成的数据缺少以下列：{missing_cols}")
-            
-            # 检查值是否为空
-            empty_cols = [col for col, val in row.items() if not str(val).strip()]
-            if empty_cols:
-                raise ValueError(f"以下列的值不能为空：{empty_cols}")
+        if not all(isinstance(row, dict) for row in data):
+            raise ValueError("生成的每行数据必须是字典")
+        validator = DataValidator.for_columns(expected_columns)
+        return validator.validate(pd.DataFrame(data, columns=expected_columns), on_error="raise")
+
+    def normalize_generated_data(
+        self,
+        data: List[Dict[str, str]],
+        columns: List[str],
+        on_error: str = "drop"
+    ) -> ValidationReport:
+        """按列名推断的类型规范化生成的数据，默认删除无法修复的行"""
+        validator = DataValidator.for_columns(columns)
+        return validator.validate(pd.DataFrame(data, columns=columns), on_error=on_error)
     
     def update_api_key(self, api_key: str):
         """更新API密钥"""
@@ -102,9 +850,13 @@ class SKUGenerator:
     def update_model(self, model: str):
         """更新模型"""
         self.deepseek_client.update_model(model)
+    
+    def update_output_format(self, output_format: str):
+        """更新模型输出数据的格式"""
+        self.deepseek_client.update_output_format(output_format)
 
-    def validate_existing_data(self, df: pd.DataFrame) -> None:
-        """验证已有数据的格式"""
+    def validate_existing_data(self, df: pd.DataFrame) -> ValidationReport:
+        """验证已有数据的格式，返回规范化结果和所有问题，不删除任何行"""
         if not isinstance(df, pd.DataFrame):
             raise ValueError("输入必须是pandas DataFrame")
         
@@ -112,11 +864,8 @@ class SKUGenerator:
             raise ValueError("数据不能为空")
         
         # 检查必要的列
-        required_cols = set(df.columns)
-        if not required_cols:
+        if len(df.columns) == 0:
             raise ValueError("数据必须包含至少一列")
         
-        # 检查数据类型
-        for col in df.columns:
-            if not df[col].dtype in ['object', 'string']:
-                raise ValueError(f"列 '{col}' 必须是文本类型")
\ No newline at end of file
+        validator = DataValidator.for_columns([str(col) for col in df.columns])
+        return validator.validate(df.rename(columns=str), on_error="keep")
@@ -0,0 +1,208 @@
+import csv
+import json
+import re
+from typing import List, Dict, Optional
+
+# 数组外只关心 '['，对象外只关心 '{'，对象内需要跟踪括号、字符串与转义
+_SPECIAL_CHARS = re.compile(r'[\[{}"\\]')
+# 表格格式只需要跟踪引号和换行
+_TABULAR_SPECIAL_CHARS = re.compile(r'["\n]')
+
+class JSONRowParser:
+    """增量JSON行解析器
+
+    跨数据块跟踪括号深度、字符串与转义状态，在第一个 '[' 之后每当一个顶层对象闭合
+    就立即解析为一行。只缓存当前未闭合对象的片段，不保留已解析的内容。
+    """
+
+    def __init__(self):
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._pieces: List[str] = []
+        self.rows_parsed = 0
+        self.invalid_objects = 0
+
+    @property
+    def started(self) -> bool:
+        """是否已经遇到数据数组的开头"""
+        return self._in_array
+
+    @property
+    def in_object(self) -> bool:
+        """当前是否处于未闭合的对象中"""
+        return self._depth > 0
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """输入一个数据块，返回本块中闭合的所有行"""
+        rows = []
+        if not chunk:
+            return rows
+
+        pos = 0
+        start = 0 if self._depth else None
+        if self._escape:
+            # 上一块以反斜杠结尾，本块第一个字符是被转义的字符
+            self._escape = False
+            pos = 1
+
+        for match in _SPECIAL_CHARS.finditer(chunk, pos):
+            i = match.start()
+            if i < pos:
+                continue
+            ch = match.group()
+
+            if not self._in_array:
+                # 忽略数组之前的说明文字
+                self._in_array = ch == '['
+                continue
+
+            if self._depth == 0:
+                if ch == '{':
+                    self._depth = 1
+                    start = i
+                continue
+
+            if self._in_string:
+                if ch == '\\':
+                    if i + 1 < len(chunk):
+                        pos = i + 2
+                    else:
+                        self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pieces.append(chunk[start:i + 1])
+                    start = None
+                    row = self._parse_object()
+                    if row is not None:
+                        rows.append(row)
+
+        if self._depth and start is not None:
+            self._pieces.append(chunk[start:])
+        return rows
+
+    def flush(self) -> List[Dict]:
+        """流结束时调用；JSON对象只在闭合时产出，没有需要补充解析的内容"""
+        return []
+
+    def _parse_object(self):
+        """解析已闭合的对象片段"""
+        text = "".join(self._pieces)
+        self._pieces = []
+        self._in_string = False
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            self.invalid_objects += 1
+            return None
+        if not isinstance(obj, dict):
+            self.invalid_objects += 1
+            return None
+        self.rows_parsed += 1
+        return obj
+
+
+class TabularRowParser:
+    """增量表格行解析器
+
+    模型先输出一行表头，再逐行输出以制表符分隔的数据。字段中包含制表符、换行或引号时
+    用双引号包裹，内部的引号写成两个；只有字段开头的引号才开始引用，字段中间的引号
+    （如 55" 表示英寸）按普通字符处理。跨数据块跟踪引号状态，每当一条记录结束就立即
+    解析为一行；字段数与列数不一致或无法解析的行计为无效行并跳过。
+    """
+
+    def __init__(self, columns: List[str], delimiter: str = "\t"):
+        self.columns = columns
+        self.delimiter = delimiter
+        self._header: Optional[List[str]] = None
+        self._in_quotes = False
+        # 刚结束一段引用：紧跟的引号是转义的两个引号中的第二个
+        self._quote_closed = False
+        # 上一个字符，用来判断引号是否位于字段开头
+        self._prev_char = "\n"
+        self._pieces: List[str] = []
+        self.rows_parsed = 0
+        self.invalid_rows = 0
+
+    @property
+    def started(self) -> bool:
+        """是否已经识别出表头"""
+        return self._header is not None
+
+    @property
+    def in_object(self) -> bool:
+        """当前是否处于未结束的数据行中"""
+        return self.started and any(piece.strip() for piece in self._pieces)
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """输入一个数据块，返回本块中结束的所有行"""
+        rows = []
+        start = 0
+        for match in _TABULAR_SPECIAL_CHARS.finditer(chunk):
+            if match.group() == '"':
+                prev = chunk[match.start() - 1] if match.start() else self._prev_char
+                if self._in_quotes:
+                    self._in_quotes = False
+                    self._quote_closed = True
+                elif prev in (self.delimiter, "\n") or (prev == '"' and self._quote_closed):
+                    # 字段开头的引号开始引用；转义的两个引号先结束再重新进入引用
+                    self._in_quotes = True
+                    self._quote_closed = False
+                else:
+                    self._quote_closed = False
+            elif not self._in_quotes:
+                self._pieces.append(chunk[start:match.start()])
+                start = match.end()
+                row = self._parse_record()
+                if row is not None:
+                    rows.append(row)
+        self._pieces.append(chunk[start:])
+        if chunk:
+            self._prev_char = chunk[-1]
+        return rows
+
+    def flush(self) -> List[Dict]:
+        """流结束时解析最后一条没有换行结尾的记录"""
+        row = self._parse_record()
+        return [row] if row is not None else []
+
+    def _parse_record(self) -> Optional[Dict]:
+        """解析一条完整的记录，表头和说明文字返回 None"""
+        text = "".join(self._pieces).rstrip("\r")
+        self._pieces = []
+        self._in_quotes = False
+        self._quote_closed = False
+        self._prev_char = "\n"
+        if not text.strip() or text.lstrip().startswith("```"):
+            return None
+        try:
+            fields = [field.strip() for field in next(csv.reader([text], delimiter=self.delimiter))]
+        except csv.Error:
+            self.invalid_rows += 1
+            return None
+
+        if self._header is None:
+            if set(fields) == set(self.columns):
+                self._header = fields
+                return None
+            if len(fields) != len(self.columns):
+                # 表头之前的说明文字
+                return None
+            # 模型省略了表头，按请求的列顺序解析
+            self._header = list(self.columns)
+
+        if len(fields) != len(self._header):
+            self.invalid_rows += 1
+            return None
+        self.rows_parsed += 1
+        return dict(zip(self._header, fields))
@@ -0,0 +1,17 @@
+import math
+import re
+from typing import List, Dict
+
+# 中日韩字符大约一个字符对应一个token，其余字符大约四个字符对应一个token
+_CJK_CHARS = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_CHARS.findall(text))
+    return math.ceil(cjk + (len(text) - cjk) / 4)
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """粗略估算对话消息的输入token数（含每条消息的格式开销）"""
+    return sum(estimate_tokens(message.get("content", "")) + 4 for message in messages)
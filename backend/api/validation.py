@@ -0,0 +1,290 @@
+import re
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .column_rules import match_column
+
+# 列类型
+COLUMN_TYPES = {
+    "text": "文本",
+    "price": "价格",
+    "integer": "整数",
+    "measure": "带单位的数值",
+    "enum": "枚举"
+}
+
+# 各单位可以换算的写法及换算系数
+UNIT_CONVERSIONS = {
+    "元": {"": 1, "元": 1, "块": 1, "rmb": 1, "cny": 1, "¥": 1, "￥": 1},
+    "cm": {"": 1, "cm": 1, "厘米": 1, "公分": 1, "mm": 0.1, "毫米": 0.1, "m": 100, "米": 100},
+    "kg": {"": 1, "kg": 1, "公斤": 1, "千克": 1, "g": 0.001, "克": 0.001, "斤": 0.5},
+    "岁": {"": 1, "岁": 1, "周岁": 1},
+}
+
+# 列名以关键字结尾时推断列类型：(关键字, 类型, 单位, 可选值)
+COLUMN_TYPE_RULES = [
+    ("价格", "price", "元", None),
+    ("单价", "price", "元", None),
+    ("售价", "price", "元", None),
+    ("原价", "price", "元", None),
+    ("现价", "price", "元", None),
+    ("库存", "integer", None, None),
+    ("库存量", "integer", None, None),
+    ("数量", "integer", None, None),
+    ("身高", "measure", "cm", None),
+    ("体重", "measure", "kg", None),
+    ("重量", "measure", "kg", None),
+    ("净重", "measure", "kg", None),
+    ("毛重", "measure", "kg", None),
+    ("年龄", "measure", "岁", None),
+    ("性别", "enum", None, ["男", "女"]),
+]
+
+# 整个取值只由数值和紧随其后的单位组成，“3-6岁”这类区间不会被截取成单个数值
+_NUMBER_WITH_UNIT = r'^(?P<number>-?\d+(?:\.\d+)?)\s*(?P<unit>[a-zA-Z一-鿿]*)$'
+_NUMBER_WITH_UNIT_RE = re.compile(_NUMBER_WITH_UNIT)
+# 提取数值前去掉的千分位、空白和货币符号
+_NUMBER_NOISE = r'[,，\s¥￥]'
+
+class ColumnSpec:
+    """一列的类型声明"""
+
+    def __init__(
+        self,
+        name: str,
+        column_type: str = "text",
+        unit: Optional[str] = None,
+        choices: Optional[List[str]] = None,
+        required: bool = True,
+        inferred: bool = False
+    ):
+        if column_type not in COLUMN_TYPES:
+            raise ValueError(f"不支持的列类型: {column_type}")
+        if column_type == "measure" and unit not in UNIT_CONVERSIONS:
+            raise ValueError(f"列 '{name}' 的单位不支持: {unit}")
+        if column_type == "enum" and not choices:
+            raise ValueError(f"枚举列 '{name}' 必须提供可选值")
+        self.name = name
+        self.column_type = column_type
+        self.unit = "元" if column_type == "price" else unit
+        self.choices = choices
+        self.required = required
+        # 按列名推断的类型只是猜测，取值不符时保留原值，不算作错误
+        self.inferred = inferred
+
+    def normalize(self, value) -> str:
+        """单个取值规范化后的文本，与 DataValidator 的结果一致；无法规范化时返回去掉首尾空白的原值"""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return ""
+        text = str(value).strip()
+        if self.column_type in ("text", "enum") or not text:
+            return text
+        match = _NUMBER_WITH_UNIT_RE.match(re.sub(_NUMBER_NOISE, "", text))
+        if match is None:
+            return text
+        number = float(match["number"])
+        if self.column_type == "integer":
+            if number < 0 or number != round(number):
+                return text
+            return str(int(number))
+        factor = UNIT_CONVERSIONS[self.unit].get(match["unit"].lower())
+        if factor is None or number < 0:
+            return text
+        return _format_scalar(number * factor) + self.unit
+
+def infer_column_specs(columns: List[str]) -> List[ColumnSpec]:
+    """按列名推断列类型，无法识别的列按文本处理"""
+    specs = []
+    for col in columns:
+        for keyword, column_type, unit, choices in COLUMN_TYPE_RULES:
+            if match_column(col, keyword):
+                specs.append(ColumnSpec(col, column_type, unit=unit, choices=choices, inferred=True))
+                break
+        else:
+            specs.append(ColumnSpec(col))
+    return specs
+
+def _format_number(values: pd.Series) -> pd.Series:
+    """整数去掉小数点，其余保留两位小数"""
+    rounded = values.round(2)
+    is_integer = rounded == rounded.round(0)
+    text = rounded.astype(str).str.replace(r'\.?0+$', '', regex=True)
+    text[is_integer] = rounded[is_integer].astype("Int64").astype(str)
+    return text
+
+def _format_scalar(value: float) -> str:
+    """单个数值的文本，规则与 _format_number 相同"""
+    # 与 pandas 的 round 一致，使用 numpy 的舍入
+    rounded = float(np.round(value, 2))
+    if rounded == round(rounded):
+        return str(int(rounded))
+    return f"{rounded:.2f}".rstrip("0")
+
+class ValidationReport:
+    """校验结果：规范化后的数据、带类型的数据和全部问题"""
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        typed: pd.DataFrame,
+        violations: pd.DataFrame,
+        invalid_rows: pd.Index,
+        dropped_rows: int,
+        repaired_cells: int,
+        mismatched_cells: Optional[Dict[str, int]] = None
+    ):
+        self.data = data
+        self.typed = typed
+        self.violations = violations
+        self.invalid_rows = invalid_rows
+        self.dropped_rows = dropped_rows
+        self.repaired_cells = repaired_cells
+        # 各列与推断类型不符、按原值保留的单元格数
+        self.mismatched_cells = mismatched_cells or {}
+
+    @property
+    def is_valid(self) -> bool:
+        return self.violations.empty
+
+    def summary(self, max_items: int = 5) -> str:
+        """问题摘要：按列和原因汇总，并列出前几条示例"""
+        mismatches = "".join(
+            f"\n- {column}：{count} 个值与推断的类型不符，已保留原值"
+            for column, count in self.mismatched_cells.items()
+        )
+        if self.is_valid:
+            return f"✅ 数据校验通过，规范化了 {self.repaired_cells} 个值{mismatches}"
+        counts = self.violations.groupby(["column", "reason"], sort=False).size()
+        lines = [
+            f"⚠️ 发现 {len(self.violations)} 个问题，涉及 {len(self.invalid_rows)} 行"
+            f"（已删除 {self.dropped_rows} 行，规范化了 {self.repaired_cells} 个值）："
+        ]
+        lines += [f"- {column}：{reason} {count} 处" for (column, reason), count in counts.items()]
+        for item in self.violations.head(max_items).itertuples(index=False):
+            lines.append(f"  例：第 {item.row + 1} 行「{item.column}」= {item.value!r}")
+        return "\n".join(lines) + mismatches
+
+class DataValidator:
+    """按列声明的类型批量校验并规范化数据
+
+    每列使用 pandas 的向量化字符串运算一次处理完，汇总所有问题后统一返回，
+    不会在第一处错误就中断。价格、整数和带单位的数值会换算成统一格式，
+    同时输出一份数值类型的数据供排序和统计使用。
+    """
+
+    def __init__(self, specs: List[ColumnSpec]):
+        self.specs = specs
+
+    @classmethod
+    def for_columns(cls, columns: List[str]) -> "DataValidator":
+        """按列名推断类型创建校验器"""
+        return cls(infer_column_specs(columns))
+
+    def validate(self, df: pd.DataFrame, on_error: str = "drop") -> ValidationReport:
+        """校验并规范化数据
+
+        on_error 为 drop 时删除有问题的行，keep 时保留原值，raise 时汇总所有问题后抛出 ValueError。
+        """
+        if on_error not in ("drop", "keep", "raise"):
+            raise ValueError(f"不支持的错误处理方式: {on_error}")
+
+        df = df.reset_index(drop=True)
+        data = {}
+        typed = {}
+        problems = []
+        repaired_cells = 0
+        mismatched_cells = {}
+        for spec in self.specs:
+            if spec.name in df.columns:
+                original = df[spec.name].astype("string").str.strip()
+            else:
+                original = pd.Series(pd.NA, index=df.index, dtype="string")
+            # 字符串运算只作用于去重后的取值，再按编码映射回每一行
+            codes, uniques = pd.factorize(original)
+            uniques = pd.concat(
+                [pd.Series(uniques, dtype="string"), pd.Series([pd.NA], dtype="string")],
+                ignore_index=True
+            )
+            codes[codes < 0] = len(uniques) - 1
+            normalized, values, reasons = (
+                result.take(codes).set_axis(df.index)
+                for result in self._validate_column(spec, uniques)
+            )
+
+            # 推断类型不符的值只计数，不删除整行；空值仍然算作问题
+            mismatched = reasons.notna() & (reasons != "值为空") & spec.inferred
+            if mismatched.any():
+                mismatched_cells[spec.name] = int(mismatched.sum())
+                reasons = reasons.where(~mismatched)
+            invalid = reasons.notna()
+            if invalid.any():
+                problems.append(pd.DataFrame({
+                    "row": df.index[invalid],
+                    "column": spec.name,
+                    "value": original[invalid].astype(object).where(original[invalid].notna(), None),
+                    "reason": reasons[invalid]
+                }))
+            unrepaired = invalid | mismatched
+            changed = (normalized != original).fillna(False) & ~unrepaired
+            repaired_cells += int(changed.sum())
+            # 无法修复的值保留原样
+            data[spec.name] = normalized.where(~unrepaired, original)
+            typed[spec.name] = values
+
+        data = pd.DataFrame(data, index=df.index)
+        typed = pd.DataFrame(typed, index=df.index)
+        if problems:
+            violations = pd.concat(problems, ignore_index=True).sort_values("row", kind="stable")
+        else:
+            violations = pd.DataFrame(columns=["row", "column", "value", "reason"])
+        invalid_rows = pd.Index(violations["row"].unique())
+
+        report = ValidationReport(
+            data, typed, violations, invalid_rows, 0, repaired_cells, mismatched_cells
+        )
+        if on_error == "raise" and not report.is_valid:
+            raise ValueError(report.summary())
+        if on_error == "drop" and len(invalid_rows):
+            report.data = data.drop(index=invalid_rows).reset_index(drop=True)
+            report.typed = typed.drop(index=invalid_rows).reset_index(drop=True)
+            report.dropped_rows = len(invalid_rows)
+        return report
+
+    def _validate_column(self, spec: ColumnSpec, values: pd.Series):
+        """返回 (规范化后的文本, 类型化的值, 每个值的问题原因)"""
+        reasons = pd.Series(None, index=values.index, dtype=object)
+        missing = values.isna() | (values == "")
+        if spec.required:
+            reasons[missing] = "值为空"
+
+        if spec.column_type == "text":
+            return values, values, reasons
+
+        if spec.column_type == "enum":
+            valid = values.isin(spec.choices)
+            reasons[~valid & ~missing] = f"不在可选值 {spec.choices} 中"
+            return values, values.astype(pd.CategoricalDtype(spec.choices)), reasons
+
+        # 去掉千分位和货币符号后提取数值和单位
+        cleaned = values.str.replace(_NUMBER_NOISE, '', regex=True)
+        parts = cleaned.str.extract(_NUMBER_WITH_UNIT)
+        numbers = pd.to_numeric(parts["number"], errors="coerce")
+        units = parts["unit"].str.lower()
+        unparsed = numbers.isna() & ~missing
+        reasons[unparsed] = "不是有效的数值"
+
+        if spec.column_type == "integer":
+            is_integer = numbers == numbers.round(0)
+            reasons[~unparsed & ~missing & ~is_integer.fillna(False)] = "不是整数"
+            reasons[(numbers < 0).fillna(False)] = "不能为负数"
+            integers = numbers.where(is_integer).astype("Int64")
+            text = integers.astype("string")
+            return text, integers, reasons
+
+        factors = units.map(UNIT_CONVERSIONS[spec.unit])
+        unknown_unit = factors.isna() & numbers.notna()
+        reasons[unknown_unit] = f"单位无法换算为{spec.unit}"
+        numbers = numbers * factors
+        reasons[(numbers < 0).fillna(False)] = "不能为负数"
+        text = (_format_number(numbers.fillna(0)) + spec.unit).astype("string").where(numbers.notna())
+        return text, numbers, reasons
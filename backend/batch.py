@@ -0,0 +1,281 @@
+"""批量生成入口：读取JSONL任务文件，在同一个事件循环上并发执行生成任务
+
+用法：
+    python -m backend.batch jobs.jsonl --concurrency 8 --out results/ --format csv
+
+任务文件每行一个JSON对象，例如：
+    {"id": "watch", "columns": ["商品名称", "颜色", "价格"], "prompt": "智能手表", "rows": 100, "model": "DeepSeek-V3"}
+其中 id 和 model 可省略；mode 可选 rows（默认，逐行生成）、combinatorial（属性组合扩展）或 columnwise（按列分组生成）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import pandas as pd
+
+from backend.api.sku_generator import SKUGenerator, GENERATION_MODES
+from backend.api.deepseek_client import OUTPUT_FORMATS as MODEL_OUTPUT_FORMATS
+from backend.api.http_session import close_shared_session, get_shared_session_manager
+from backend.api.diversity import NearDuplicateDetector
+from config import DEFAULT_MODEL, DEFAULT_OUTPUT_FORMAT, SUPPORTED_MODELS
+
+OUTPUT_FORMATS = ["csv", "jsonl", "parquet"]
+
+def load_jobs(path: Path) -> List[Dict]:
+    """读取并校验任务文件"""
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"第{line_no}行不是有效的JSON: {str(e)}")
+
+            missing = [key for key in ("columns", "prompt", "rows") if key not in job]
+            if missing:
+                raise ValueError(f"第{line_no}行缺少字段：{missing}")
+            model = job.get("model", DEFAULT_MODEL)
+            if model not in SUPPORTED_MODELS:
+                raise ValueError(f"第{line_no}行使用了不支持的模型: {model}")
+            mode = job.get("mode", "rows")
+            if mode not in GENERATION_MODES:
+                raise ValueError(f"第{line_no}行使用了不支持的生成模式: {mode}")
+
+            jobs.append({
+                "id": str(job.get("id") or f"job-{line_no:04d}"),
+                "columns": job["columns"],
+                "prompt": job["prompt"],
+                "rows": int(job["rows"]),
+                "model": model,
+                "mode": mode
+            })
+    return jobs
+
+def _output_path(out_dir: Path, job_id: str, fmt: str) -> Path:
+    """生成结果文件路径，任务ID中的特殊字符替换为下划线"""
+    safe_id = re.sub(r'[^\w\-.]', '_', job_id)
+    return out_dir / f"{safe_id}.{fmt}"
+
+def _write_table(rows: List[Dict[str, str]], columns: List[str], path: Path, fmt: str):
+    """将完整结果写入CSV或Parquet文件"""
+    df = pd.DataFrame(rows, columns=columns)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError:
+            raise ImportError("导出Parquet需要安装pyarrow：pip install pyarrow")
+
+class BatchRunner:
+    """批量任务执行器：按模型复用生成器，限制同时执行的任务数"""
+
+    def __init__(
+        self,
+        out_dir: Path,
+        fmt: str = "csv",
+        concurrency: int = 4,
+        api_key: Optional[str] = None,
+        use_mock: bool = False,
+        use_cache: bool = True,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        diversity_threshold: Optional[float] = None,
+        regenerate_similar: bool = False,
+        verbose: bool = False
+    ):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.concurrency = concurrency
+        self.api_key = api_key
+        self.use_mock = use_mock
+        self.use_cache = use_cache
+        self.output_format = output_format
+        # 设置阈值时统计每个任务的多样性得分
+        self.diversity_threshold = diversity_threshold
+        self.regenerate_similar = regenerate_similar
+        self.verbose = verbose
+        self._generators: Dict[str, SKUGenerator] = {}
+
+    def _get_generator(self, model: str) -> SKUGenerator:
+        """每个模型只创建一个生成器，所有生成器共享进程级连接池"""
+        if model not in self._generators:
+            generator = SKUGenerator(model=model)
+            if self.api_key:
+                generator.update_api_key(self.api_key)
+            generator.deepseek_client.use_mock = self.use_mock
+            generator.update_output_format(self.output_format)
+            self._generators[model] = generator
+        return self._generators[model]
+
+    async def run_job(self, job: Dict) -> Dict:
+        """执行单个任务，jsonl格式边生成边写入，其余格式完成后写入"""
+        generator = self._get_generator(job["model"])
+        path = _output_path(self.out_dir, job["id"], self.fmt)
+        progress_callback = None
+        if self.verbose:
+            progress_callback = lambda message: print(f"[{job['id']}] {message}")
+
+        diversity = None
+        if self.diversity_threshold is not None and job["mode"] != "combinatorial":
+            diversity = NearDuplicateDetector(
+                threshold=self.diversity_threshold, reject=self.regenerate_similar
+            )
+
+        start_time = time.perf_counter()
+        rows = []
+        stream = generator.stream_sku_data(
+            job["columns"],
+            job["prompt"],
+            job["rows"],
+            progress_callback=progress_callback,
+            use_cache=self.use_cache,
+            mode=job["mode"],
+            diversity=diversity
+        )
+        if self.fmt == "jsonl":
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    async for row in stream:
+                        rows.append(row)
+                        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            except Exception:
+                # 一行都没有生成时不留下空文件，已生成的部分结果保留
+                if not rows:
+                    path.unlink(missing_ok=True)
+                raise
+        else:
+            async for row in stream:
+                rows.append(row)
+            await asyncio.to_thread(_write_table, rows, job["columns"], path, self.fmt)
+
+        result = {
+            "id": job["id"],
+            "rows": len(rows),
+            "seconds": time.perf_counter() - start_time,
+            "path": str(path)
+        }
+        if diversity is not None:
+            result["diversity"] = diversity.get_stats()
+        return result
+
+    async def run(self, jobs: List[Dict]) -> List[Dict]:
+        """并发执行所有任务，每完成一个就输出一行结果"""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_limited(job: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    return await self.run_job(job)
+                except Exception as e:
+                    return {"id": job["id"], "rows": 0, "error": str(e)}
+
+        results = []
+        for finished in asyncio.as_completed([run_limited(job) for job in jobs]):
+            result = await finished
+            results.append(result)
+            if "error" in result:
+                print(f"❌ {result['id']}: {result['error']}")
+            else:
+                diversity = ""
+                if "diversity" in result:
+                    diversity = f"，多样性得分 {result['diversity']['diversity_score']:.0%}"
+                print(
+                    f"✅ {result['id']}: {result['rows']} 条，"
+                    f"用时 {result['seconds']:.1f} 秒{diversity} -> {result['path']}"
+                )
+        return results
+
+    def completion_tokens(self) -> int:
+        """所有生成器累计的输出token数"""
+        return sum(
+            generator.deepseek_client.get_usage_stats()["completion_tokens"]
+            for generator in self._generators.values()
+        )
+
+async def main_async(args) -> int:
+    jobs = load_jobs(Path(args.jobs))
+    api_key = args.api_key or os.getenv("DEEPSEEK_API_KEY")
+    use_mock = args.mock or not api_key
+    if use_mock:
+        print("⚠️ 未设置DeepSeek API密钥或指定了 --mock，使用模拟数据模式")
+
+    runner = BatchRunner(
+        out_dir=Path(args.out),
+        fmt=args.format,
+        concurrency=args.concurrency,
+        api_key=api_key,
+        use_mock=use_mock,
+        use_cache=not args.no_cache,
+        output_format=args.output_format,
+        diversity_threshold=args.diversity_threshold,
+        regenerate_similar=args.regenerate_similar,
+        verbose=args.verbose
+    )
+
+    print(f"🚀 共 {len(jobs)} 个任务，并发数 {args.concurrency}")
+    start_time = time.perf_counter()
+    try:
+        results = await runner.run(jobs)
+    finally:
+        await close_shared_session()
+    elapsed = time.perf_counter() - start_time
+
+    total_rows = sum(result["rows"] for result in results)
+    failed = [result for result in results if "error" in result]
+    connection_stats = get_shared_session_manager().get_stats()
+    print(
+        f"🎉 完成 {len(results) - len(failed)}/{len(results)} 个任务，共 {total_rows} 条数据\n"
+        f"总用时：{elapsed:.1f} 秒\n"
+        f"吞吐：{total_rows / elapsed:.1f} 条/秒，{runner.completion_tokens() / elapsed:.1f} token/秒\n"
+        f"连接复用：{connection_stats['connections_reused']} 次复用 / "
+        f"{connection_stats['connections_created']} 次新建"
+    )
+    return 1 if failed else 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="DataSprite 批量SKU生成")
+    parser.add_argument("jobs", help="JSONL任务文件路径")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时执行的任务数")
+    parser.add_argument("--out", default="results", help="结果输出目录")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="结果文件格式")
+    parser.add_argument("--api-key", help="DeepSeek API密钥，默认读取环境变量 DEEPSEEK_API_KEY")
+    parser.add_argument("--mock", action="store_true", help="使用模拟数据，不调用API")
+    parser.add_argument("--no-cache", action="store_true", help="不使用结果缓存")
+    parser.add_argument(
+        "--output-format",
+        choices=list(MODEL_OUTPUT_FORMATS),
+        default=DEFAULT_OUTPUT_FORMAT,
+        help="模型输出数据的格式，tsv 输出token更少"
+    )
+    parser.add_argument(
+        "--diversity-threshold",
+        type=float,
+        help="检测近似重复的相似度阈值（0到1），设置后输出每个任务的多样性得分"
+    )
+    parser.add_argument(
+        "--regenerate-similar",
+        action="store_true",
+        help="拒绝近似重复的行并重新生成，需要同时设置 --diversity-threshold"
+    )
+    parser.add_argument("--verbose", action="store_true", help="输出每个任务的详细进度")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency 必须大于0")
+    if args.diversity_threshold is not None and not 0 < args.diversity_threshold <= 1:
+        parser.error("--diversity-threshold 必须在0到1之间")
+    if args.regenerate_similar and args.diversity_threshold is None:
+        parser.error("--regenerate-similar 需要同时设置 --diversity-threshold")
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
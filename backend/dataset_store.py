@@ -0,0 +1,148 @@
+"""会话中的数据存储：新数据按块追加，读取整表时才合并，重复度高的属性列保存为分类类型"""
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from backend.ingest import category_columns, compact_frame
+from config import STORE_COMPACT_ROWS
+
+class DatasetStore:
+    """只追加的会话数据存储
+
+    追加时只保存新的数据块，耗时与新增行数成正比，不复制已有数据；
+    读取整表时才把待合并的数据块并入主数据，合并后重复度高的列转为分类类型。
+    待合并的行数超过 compact_rows 且不少于主数据行数时提前合并，避免数据块过多，
+    每行被复制的次数与总行数的对数成正比。
+    """
+
+    def __init__(self, columns: List[str], compact_rows: int = STORE_COMPACT_ROWS):
+        self.columns = [str(col) for col in columns]
+        self.compact_rows = compact_rows
+        self._base = pd.DataFrame(columns=self.columns, dtype=object)
+        self._pending: List[pd.DataFrame] = []
+        self._pending_rows = 0
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, compact_rows: int = STORE_COMPACT_ROWS) -> "DatasetStore":
+        """用已有数据创建存储"""
+        store = cls(list(df.columns), compact_rows)
+        store.replace(df)
+        return store
+
+    def __len__(self) -> int:
+        return len(self._base) + self._pending_rows
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def append(self, data: Union[pd.DataFrame, List[Dict[str, str]]]) -> int:
+        """追加新数据，缺少的列填空值、多余的列忽略，返回追加的行数"""
+        if isinstance(data, pd.DataFrame):
+            frame = data.rename(columns=str).reindex(columns=self.columns).reset_index(drop=True)
+        else:
+            frame = pd.DataFrame(data, columns=self.columns)
+        if frame.empty:
+            return 0
+        self._pending.append(frame)
+        self._pending_rows += len(frame)
+        if self._pending_rows >= max(self.compact_rows, len(self._base)):
+            self.compact()
+        return len(frame)
+
+    def replace(self, df: pd.DataFrame):
+        """用编辑后的数据替换全部内容"""
+        df = df.rename(columns=str).reset_index(drop=True)
+        self.columns = list(df.columns)
+        self._base = compact_frame(df, category_columns(df))
+        self._pending = []
+        self._pending_rows = 0
+
+    def compact(self):
+        """把待合并的数据块并入主数据"""
+        if not self._pending:
+            return
+        pending = pd.concat(self._pending, ignore_index=True)
+        if self._base.empty:
+            merged = pending
+        else:
+            columns = {}
+            for col in self.columns:
+                base, new = self._base[col], pending[col]
+                if isinstance(base.dtype, pd.CategoricalDtype):
+                    # 分类列只追加新出现的类别，已有数据的编码不变
+                    added = pd.Index(new.dropna().unique()).difference(base.cat.categories)
+                    if len(added):
+                        base = base.cat.add_categories(added)
+                    new = new.astype(base.dtype)
+                columns[col] = pd.concat([base, new], ignore_index=True)
+            merged = pd.DataFrame(columns)
+        self._base = compact_frame(merged, category_columns(merged))
+        self._pending = []
+        self._pending_rows = 0
+
+    def splice(self, start: int, stop: int, rows: pd.DataFrame):
+        """用编辑后的数据替换第 start 到 stop 行（不含 stop）；行数不变时只改写这些行，不复制整表"""
+        self.compact()
+        rows = rows.rename(columns=str).reindex(columns=self.columns).reset_index(drop=True)
+        stop = min(stop, len(self._base))
+        in_place = len(rows) == stop - start
+        columns = {}
+        for col in self.columns:
+            base, new = self._base[col], rows[col]
+            if isinstance(base.dtype, pd.CategoricalDtype):
+                # 编辑出的新取值先加入类别
+                added = pd.Index(new.dropna().unique()).difference(base.cat.categories)
+                if len(added):
+                    base = base.cat.add_categories(added)
+                    if in_place:
+                        self._base[col] = base
+                new = new.astype(base.dtype)
+            if in_place:
+                self._base.iloc[start:stop, self._base.columns.get_loc(col)] = new.to_numpy()
+            else:
+                # 增删了行，需要重新拼接这一列
+                columns[col] = pd.concat([base.iloc[:start], new, base.iloc[stop:]], ignore_index=True)
+        if not in_place:
+            self._base = pd.DataFrame(columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """返回完整数据，调用方不应直接修改返回的表"""
+        self.compact()
+        return self._base
+
+    def page(self, start: int, stop: int) -> pd.DataFrame:
+        """第 start 到 stop 行（不含 stop），行号与完整数据一致"""
+        return self.to_frame().iloc[start:stop]
+
+    def head(self, n: int) -> pd.DataFrame:
+        """前 n 行，不需要合并数据块"""
+        if n <= len(self._base) or not self._pending:
+            return self._base.head(n)
+        return self.to_frame().head(n)
+
+    def tail(self, n: int) -> pd.DataFrame:
+        """最后 n 行，只合并用到的数据块，行号与完整数据一致"""
+        parts = []
+        count = 0
+        for frame in reversed([self._base] + self._pending):
+            if count >= n:
+                break
+            part = frame.tail(n - count)
+            parts.append(part)
+            count += len(part)
+        if not parts:
+            return self._base.head(0)
+        result = pd.concat(parts[::-1], ignore_index=True)
+        result.index = pd.RangeIndex(len(self) - len(result), len(self))
+        return result
+
+    def last_row(self) -> Dict[str, str]:
+        """最后一行"""
+        return self.tail(1).iloc[0].to_dict()
+
+    def memory_bytes(self) -> int:
+        """数据占用的内存"""
+        return int(sum(
+            frame.memory_usage(deep=True).sum() for frame in [self._base] + self._pending
+        ))
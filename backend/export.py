@@ -0,0 +1,141 @@
+"""导出文件的生成与缓存：只在请求下载时生成，按数据内容的哈希缓存，数据不变时直接复用"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from config import EXPORT_CACHE_MAX_ENTRIES, EXPORT_CACHE_MAX_BYTES
+
+# 支持的导出格式
+EXPORT_FORMATS = {
+    "csv": "CSV",
+    "xlsx": "Excel",
+    "parquet": "Parquet",
+    "jsonl": "JSON Lines"
+}
+
+# 各格式的 MIME 类型
+EXPORT_MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+    "jsonl": "application/jsonl"
+}
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """按列名和每行取值计算数据内容的哈希，分类列与同样取值的文本列结果相同"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\x1f".join(str(col) for col in df.columns).encode("utf-8"))
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _write_xlsx(df: pd.DataFrame) -> bytes:
+    """用 openpyxl 的只写模式逐行写入，不在内存中保留单元格对象"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError("导出Excel需要安装openpyxl：pip install openpyxl")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(col) for col in df.columns])
+    values = df.astype(object)
+    for row in values.where(values.notna(), None).itertuples(index=False, name=None):
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def build_export(df: pd.DataFrame, fmt: str) -> bytes:
+    """把数据转为指定格式的文件内容"""
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    if fmt == "xlsx":
+        return _write_xlsx(df)
+    if fmt == "parquet":
+        buffer = BytesIO()
+        try:
+            df.to_parquet(buffer, index=False)
+        except ImportError:
+            raise ImportError("导出Parquet需要安装pyarrow：pip install pyarrow")
+        return buffer.getvalue()
+    if fmt == "jsonl":
+        if df.empty:
+            return b""
+        return df.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+    raise ValueError(f"不支持的导出格式: {fmt}")
+
+class ExportCache:
+    """导出文件的内存缓存
+
+    以 (数据哈希, 格式) 为键，超出条数或总大小上限时淘汰最久未使用的文件。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = EXPORT_CACHE_MAX_ENTRIES,
+        max_bytes: int = EXPORT_CACHE_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, digest: str, fmt: str) -> Optional[bytes]:
+        """读取已生成的文件，没有时返回 None"""
+        with self._lock:
+            data = self._entries.get((digest, fmt))
+            if data is not None:
+                self._entries.move_to_end((digest, fmt))
+            return data
+
+    def put(self, digest: str, fmt: str, data: bytes):
+        """保存生成的文件，超过上限时淘汰最久未使用的文件"""
+        with self._lock:
+            old = self._entries.pop((digest, fmt), None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[(digest, fmt)] = data
+            self._size += len(data)
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._size > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def get_or_build(self, df: pd.DataFrame, fmt: str, digest: Optional[str] = None) -> bytes:
+        """返回数据的导出文件，内容相同且已生成过时直接使用缓存"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        digest = digest or frame_digest(df)
+        data = self.get(digest, fmt)
+        with self._lock:
+            self._stats["hits" if data is not None else "misses"] += 1
+        if data is None:
+            data = build_export(df, fmt)
+            self.put(digest, fmt, data)
+        return data
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计"""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._size}
+
+# 进程级共享的导出缓存
+_shared_cache: Optional[ExportCache] = None
+_shared_lock = threading.Lock()
+
+def get_shared_export_cache() -> ExportCache:
+    """获取进程级共享的导出缓存"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ExportCache()
+        return _shared_cache
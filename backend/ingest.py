@@ -0,0 +1,246 @@
+"""上传文件的读取：按块读取CSV/XLSX，所有列按文本读入，重复度高的属性列转为分类类型以节省内存"""
+import datetime
+import io
+import os
+import time
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from config import INGEST_CHUNK_ROWS, INGEST_CATEGORY_RATIO
+
+FileSource = Union[str, os.PathLike, BinaryIO]
+
+class IngestResult:
+    """读取结果：数据及读取耗时、内存占用等统计"""
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        seconds: float,
+        file_bytes: Optional[int],
+        engine: str,
+        category_columns: List[str]
+    ):
+        self.data = data
+        self.seconds = seconds
+        self.file_bytes = file_bytes
+        self.engine = engine
+        self.category_columns = category_columns
+
+    @property
+    def memory_bytes(self) -> int:
+        return int(self.data.memory_usage(deep=True).sum())
+
+    def summary(self) -> str:
+        """读取统计摘要"""
+        size = f"，文件 {format_bytes(self.file_bytes)}" if self.file_bytes is not None else ""
+        return (
+            f"📥 读取 {len(self.data)} 行 × {len(self.data.columns)} 列{size}，"
+            f"用时 {self.seconds:.2f} 秒（{self.engine}），内存占用 {format_bytes(self.memory_bytes)}"
+        )
+
+def format_bytes(size: int) -> str:
+    """把字节数格式化为便于阅读的单位"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def _file_size(source: FileSource) -> Optional[int]:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, "size", None)
+    if size is not None:
+        return size
+    try:
+        position = source.tell()
+        source.seek(0, io.SEEK_END)
+        size = source.tell()
+        source.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+def _rewind(source: FileSource):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+def category_columns(df: pd.DataFrame, ratio: float = INGEST_CATEGORY_RATIO) -> List[str]:
+    """不同取值占行数比例不超过 ratio 的文本列，转为分类类型更省内存"""
+    if df.empty:
+        return []
+    return [
+        col for col in df.columns
+        if pd.api.types.is_string_dtype(df[col].dtype) and df[col].nunique(dropna=False) <= len(df) * ratio
+    ]
+
+def compact_frame(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """把指定的列转为分类类型"""
+    if columns:
+        df = df.astype({col: "category" for col in columns if col in df.columns})
+    return df
+
+def _concat_chunks(chunks: List[pd.DataFrame], categories: List[str]) -> pd.DataFrame:
+    """合并分块，分类列合并各块的类别，避免退化为文本列"""
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for col in chunks[0].columns:
+        parts = [chunk[col] for chunk in chunks]
+        if col in categories:
+            columns[col] = pd.Series(pd.api.types.union_categoricals(parts, ignore_order=True))
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def _read_chunks(
+    chunks: Iterator[pd.DataFrame],
+    progress_callback: Optional[Callable[[str], None]] = None
+) -> Tuple[pd.DataFrame, List[str]]:
+    """逐块读取：按第一块判断哪些列转为分类类型，之后每块读入后立即压缩"""
+    parts = []
+    categories = None
+    total = 0
+    for chunk in chunks:
+        if categories is None:
+            categories = category_columns(chunk)
+        parts.append(compact_frame(chunk, categories))
+        total += len(chunk)
+        if progress_callback:
+            progress_callback(f"📥 已读取 {total} 行...")
+    categories = categories or []
+    return _concat_chunks(parts, categories), categories
+
+def _excel_value(value) -> str:
+    """把单元格的值转为文本，整数值的小数不保留 .0"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return str(value)
+
+def _iter_excel_chunks(source: FileSource, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """用 openpyxl 只读模式逐行读取第一个工作表"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("读取Excel需要安装openpyxl：pip install openpyxl")
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # 去掉表头末尾的空列
+        while header and header[-1] is None:
+            header = header[:-1]
+        columns = [_excel_value(value) or f"列{i + 1}" for i, value in enumerate(header)]
+        batch = []
+        yielded = False
+        for row in rows:
+            values = [_excel_value(value) for value in row[:len(columns)]]
+            if not any(values):
+                continue
+            values += [""] * (len(columns) - len(values))
+            batch.append(values)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, dtype=object)
+                yielded = True
+                batch = []
+        # 没有数据行时也产出一个空块，保留列名
+        if batch or not yielded:
+            yield pd.DataFrame(batch, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+def _iter_arrow_chunks(source: FileSource) -> Iterator[pd.DataFrame]:
+    """用 pyarrow 多线程流式解析UTF-8编码的CSV，每次产出一个数据块"""
+    from pyarrow import csv as pa_csv
+    import pyarrow as pa
+
+    # 先读表头取得列名，再把所有列声明为文本，避免类型推断去掉前导零或各块推断出不同类型
+    header_reader = pa_csv.open_csv(source)
+    columns = header_reader.schema.names
+    header_reader.close()
+    _rewind(source)
+    reader = pa_csv.open_csv(
+        source,
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in columns},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False
+        )
+    )
+    try:
+        yielded = False
+        for batch in reader:
+            yield batch.to_pandas()
+            yielded = True
+        # 没有数据行时也产出一个空块，保留列名
+        if not yielded:
+            yield pd.DataFrame({col: pd.Series(dtype=object) for col in columns})
+    finally:
+        reader.close()
+
+def _read_csv(
+    source: FileSource,
+    chunk_size: int,
+    progress_callback: Optional[Callable[[str], None]] = None
+) -> Tuple[pd.DataFrame, List[str], str]:
+    """按块读取CSV：已安装 pyarrow 时用它流式解析，不是UTF-8编码或解析失败时改用默认引擎分块读取"""
+    try:
+        from pyarrow import ArrowInvalid
+    except ImportError:
+        pass
+    else:
+        try:
+            df, categories = _read_chunks(_iter_arrow_chunks(source), progress_callback)
+            return df, categories, "pyarrow流式读取"
+        except (ArrowInvalid, UnicodeDecodeError):
+            _rewind(source)
+
+    try:
+        reader = pd.read_csv(
+            source, dtype=str, keep_default_na=False, chunksize=chunk_size, encoding="utf-8-sig"
+        )
+        df, categories = _read_chunks(reader, progress_callback)
+    except UnicodeDecodeError:
+        # Excel 导出的中文CSV常用GBK编码
+        _rewind(source)
+        reader = pd.read_csv(
+            source, dtype=str, keep_default_na=False, chunksize=chunk_size, encoding="gb18030"
+        )
+        df, categories = _read_chunks(reader, progress_callback)
+    return df, categories, "分块读取"
+
+def read_table(
+    source: FileSource,
+    filename: Optional[str] = None,
+    chunk_size: int = INGEST_CHUNK_ROWS,
+    progress_callback: Optional[Callable[[str], None]] = None
+) -> IngestResult:
+    """读取上传的CSV或XLSX文件，所有列按文本读入，不做类型推断"""
+    if filename is None:
+        filename = getattr(source, "name", None) or str(source)
+    start_time = time.perf_counter()
+    file_bytes = _file_size(source)
+
+    if filename.lower().endswith(".csv"):
+        df, categories, engine = _read_csv(source, chunk_size, progress_callback)
+    elif filename.lower().endswith((".xlsx", ".xlsm")):
+        df, categories = _read_chunks(_iter_excel_chunks(source, chunk_size), progress_callback)
+        engine = "openpyxl只读模式"
+    else:
+        raise ValueError("只支持CSV和XLSX文件")
+
+    if df.empty and len(df.columns) == 0:
+        raise ValueError("文件中没有数据")
+    df.columns = [str(col) for col in df.columns]
+    return IngestResult(df, time.perf_counter() - start_time, file_bytes, engine, categories)
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+from backend.api.sku_generator import SKUGenerator
+from config import DEFAULT_MODEL, JOB_WORKERS, JOB_QUEUE_MAX_SIZE, JOB_HISTORY_LIMIT
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+class Job:
+    """一个生成任务及其逐步产出的结果"""
+
+    def __init__(
+        self,
+        columns: List[str],
+        prompt: str,
+        num_rows: int,
+        model: str = DEFAULT_MODEL,
+        use_cache: bool = True,
+        mode: str = "rows"
+    ):
+        self.id = uuid.uuid4().hex
+        self.columns = columns
+        self.prompt = prompt
+        self.num_rows = num_rows
+        self.model = model
+        self.use_cache = use_cache
+        self.mode = mode
+        self.status = QUEUED
+        self.rows: List[Dict[str, str]] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # 每产出一行或状态变化时通知流式订阅者
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def add_row(self, row: Dict[str, str]):
+        self.rows.append(row)
+        await self._notify()
+
+    async def set_status(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        if status == RUNNING:
+            self.started_at = time.time()
+        elif status in FINISHED_STATUSES:
+            self.finished_at = time.time()
+        await self._notify()
+
+    async def stream_rows(self) -> AsyncIterator[Dict[str, str]]:
+        """先回放已产出的行，再随生成进度产出新行，任务结束时返回"""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.rows) > sent or self.finished)
+                new_rows = self.rows[sent:]
+                finished = self.finished
+            for row in new_rows:
+                yield row
+            sent += len(new_rows)
+            if finished and sent >= len(self.rows):
+                return
+
+    def to_dict(self) -> Dict:
+        """任务状态摘要（不含结果数据）"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "model": self.model,
+            "mode": self.mode,
+            "columns": self.columns,
+            "num_rows": self.num_rows,
+            "rows_generated": len(self.rows),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+class JobQueue:
+    """进程内的异步任务队列：固定数量的worker并发执行生成任务，支持取消"""
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_size: int = JOB_QUEUE_MAX_SIZE,
+        history_limit: int = JOB_HISTORY_LIMIT,
+        api_key: Optional[str] = None,
+        use_mock: Optional[bool] = None
+    ):
+        self.workers = workers
+        self.history_limit = history_limit
+        self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+        self.use_mock = use_mock if use_mock is not None else not self.api_key
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._generators: Dict[str, SKUGenerator] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """启动worker"""
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """停止worker并取消正在执行的任务"""
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def _get_generator(self, model: str) -> SKUGenerator:
+        """每个模型只创建一个生成器，所有生成器共享进程级连接池"""
+        if model not in self._generators:
+            generator = SKUGenerator(model=model)
+            if self.api_key:
+                generator.update_api_key(self.api_key)
+            generator.deepseek_client.use_mock = self.use_mock
+            self._generators[model] = generator
+        return self._generators[model]
+
+    def submit(self, job: Job) -> Job:
+        """提交任务，队列已满时抛出 QueueFullError"""
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError("任务队列已满，请稍后重试")
+        self._jobs[job.id] = job
+        self._prune_history()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """取消任务：排队中的任务直接标记取消，执行中的任务中断其生成"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+        else:
+            await job.set_status(CANCELLED)
+        return job
+
+    def _prune_history(self):
+        """只保留最近的已结束任务"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_limit)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue
+                job.task = asyncio.create_task(self._run_job(job))
+                # 用 wait 而不是直接 await，任务被取消时 worker 继续处理下一个
+                await asyncio.wait([job.task])
+                if not job.finished:
+                    # 任务在开始执行前就被取消
+                    await job.set_status(CANCELLED)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Job):
+        """执行单个任务"""
+        await job.set_status(RUNNING)
+        generator = self._get_generator(job.model)
+        try:
+            async for row in generator.stream_sku_data(
+                job.columns,
+                job.prompt,
+                job.num_rows,
+                use_cache=job.use_cache,
+                mode=job.mode
+            ):
+                await job.add_row(row)
+        except asyncio.CancelledError:
+            await job.set_status(CANCELLED)
+            raise
+        except Exception as e:
+            await job.set_status(FAILED, str(e))
+        else:
+            await job.set_status(SUCCEEDED)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取队列统计"""
+        stats = {status: 0 for status in (QUEUED, RUNNING) + FINISHED_STATUSES}
+        for job in self._jobs.values():
+            stats[job.status] += 1
+        stats["workers"] = self.workers
+        stats["queue_size"] = self._queue.qsize()
+        return stats
@@ -0,0 +1,148 @@
+"""生成任务REST服务
+
+启动：
+    uvicorn backend.server:app --host 0.0.0.0 --port 8000
+或：
+    python -m backend.server --port 8000
+
+接口：
+    POST   /jobs              提交任务，返回任务ID
+    GET    /jobs/{id}         查询任务状态
+    GET    /jobs/{id}/result  获取完整结果（任务结束后）
+    GET    /jobs/{id}/stream  以NDJSON流式获取结果，每生成一行推送一行
+    DELETE /jobs/{id}         取消任务
+    GET    /stats             队列、连接池、限流、模型延迟与缓存统计
+"""
+import argparse
+import json
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from backend.api.http_session import close_shared_session, get_shared_session_manager
+from backend.api.response_cache import get_shared_cache
+from backend.api.rate_limiter import get_shared_rate_limiter, get_shared_governor
+from backend.api.model_metrics import get_shared_model_metrics
+from backend.api.hedging import get_shared_hedge_budget
+from backend.api.sku_generator import GENERATION_MODES
+from backend.job_queue import Job, JobQueue, QueueFullError
+from config import DEFAULT_MODEL, MIN_ROWS, MAX_ROWS, COMBINATORIAL_MAX_ROWS, SUPPORTED_MODELS
+
+class JobRequest(BaseModel):
+    columns: List[str] = Field(..., min_length=1, description="SKU属性列名")
+    prompt: str = Field(..., min_length=1, description="产品描述或关键词")
+    rows: int = Field(
+        ...,
+        ge=MIN_ROWS,
+        le=COMBINATORIAL_MAX_ROWS,
+        description=f"生成行数，逐行生成最多{MAX_ROWS}行"
+    )
+    model: str = Field(DEFAULT_MODEL, description="模型名称，见 config.SUPPORTED_MODELS")
+    use_cache: bool = Field(True, description="是否优先使用缓存结果")
+    mode: str = Field("rows", description="生成模式：rows（逐行生成）、combinatorial（属性组合扩展）或 columnwise（按列分组生成）")
+
+job_queue = JobQueue()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        await close_shared_session()
+
+app = FastAPI(title="DataSprite", description="智能SKU生成任务服务", lifespan=lifespan)
+
+def _get_job(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """提交生成任务"""
+    if request.model not in SUPPORTED_MODELS:
+        raise HTTPException(status_code=400, detail=f"不支持的模型: {request.model}")
+    if request.mode not in GENERATION_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的生成模式: {request.mode}")
+    if request.mode != "combinatorial" and request.rows > MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"逐行生成最多{MAX_ROWS}行")
+    job = Job(
+        columns=request.columns,
+        prompt=request.prompt,
+        num_rows=request.rows,
+        model=request.model,
+        use_cache=request.use_cache,
+        mode=request.mode
+    )
+    try:
+        job_queue.submit(job)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询任务状态"""
+    return _get_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """获取任务的完整结果"""
+    job = _get_job(job_id)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"任务尚未结束（当前状态：{job.status}）")
+    return {**job.to_dict(), "data": job.rows}
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    """以NDJSON流式推送结果：每行一个 {"type": "row"} 事件，最后一个 {"type": "end"} 事件"""
+    job = _get_job(job_id)
+
+    async def events():
+        async for row in job.stream_rows():
+            yield json.dumps({"type": "row", "data": row}, ensure_ascii=False) + "\n"
+        yield json.dumps(
+            {"type": "end", "status": job.status, "error": job.error},
+            ensure_ascii=False
+        ) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消任务"""
+    _get_job(job_id)
+    job = await job_queue.cancel(job_id)
+    return job.to_dict()
+
+@app.get("/stats")
+async def get_stats():
+    """队列、连接池、限流、模型延迟与缓存统计"""
+    cache = get_shared_cache()
+    return {
+        "jobs": job_queue.get_stats(),
+        "connections": get_shared_session_manager().get_stats(),
+        "rate_limit": get_shared_rate_limiter().get_stats(),
+        "concurrency": get_shared_governor().get_stats(),
+        "models": get_shared_model_metrics().get_stats(),
+        "hedging": get_shared_hedge_budget().get_stats(),
+        "cache": cache.get_stats() if cache is not None else None
+    }
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="DataSprite 生成任务服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -33,9 +33,123 @@ MAX_RETRIES = 3  # API调用最大重试次数
 MIN_ROWS = 1     # 最小生成行数
 MAX_ROWS = 500    # 最大生成行数
 
+# HTTP连接池配置
+HTTP_POOL_LIMIT = 100          # 连接池总连接数上限
+HTTP_POOL_LIMIT_PER_HOST = 20  # 单个主机的连接数上限
+HTTP_KEEPALIVE_TIMEOUT = 60    # 空闲连接保活时间（秒）
+HTTP_DNS_CACHE_TTL = 300       # DNS缓存时间（秒）
+
+# 分片生成配置
+SHARD_SIZE = 50                # 单个请求最多生成的行数，超过时拆分为多个分片
+MAX_CONCURRENT_SHARDS = 4      # 同时进行的分片请求数上限
+MAX_SHARD_TOPUP_ROUNDS = 3     # 去重后补齐缺口的最大轮数
+
+# 补充生成配置
+MAX_TOPUP_ROUNDS = 3           # 返回行数不足时最多补充生成的次数
+TOPUP_SAMPLE_ROWS = 2          # 补充生成时附带的示例行数
+TOPUP_FINGERPRINT_CHARS = 800  # 补充生成时已用取值指纹的字符上限
+
+# 补全缺失值配置
+FILL_BATCH_ROWS = 50             # 补全缺失值时单次请求最多包含的行数
+FILL_MAX_COLUMNS = 5             # 单次请求最多补全的列数，缺失的列更多时拆分为多个请求
+FILL_CONTEXT_CHARS = 200         # 每行附带的已有取值的字符总数上限
+
+# 按列分组生成配置
+COLUMNWISE_KEY_COLUMNS = 2       # 按列分组生成时先逐行生成的关键列数（模板的前几列）
+
+# 与已有数据去重配置
+DEDUP_MAX_REPLACEMENT_ROUNDS = 3  # 与已有数据重复时最多请求替换的轮数
+DEDUP_SAMPLE_ROWS = 5            # 请求替换时附带的重复示例行数
+
+# 上传文件读取配置
+INGEST_CHUNK_ROWS = 50000        # 分块读取时每块的行数
+INGEST_CATEGORY_RATIO = 0.5      # 不同取值占行数比例不超过该值的列转为分类类型
+INGEST_PREVIEW_ROWS = 1000       # 上传数据预览最多显示的行数
+
+# 会话数据存储配置
+STORE_COMPACT_ROWS = 5000        # 追加的新数据累计超过该行数时合并到主数据
+EDITOR_PAGE_ROWS = 500           # 数据编辑器每页显示的行数
+
+# 导出文件缓存配置
+EXPORT_CACHE_MAX_ENTRIES = 8     # 内存中最多缓存的导出文件数
+EXPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 导出文件缓存的总大小上限（字节）
+
+# 生成过程中的实时预览配置
+PREVIEW_UPDATE_ROWS = 10         # 每累计多少行刷新一次预览
+PREVIEW_UPDATE_INTERVAL = 0.2    # 两次刷新预览的最长间隔（秒）
+
+# 近似重复检测配置
+DIVERSITY_THRESHOLD = 0.7        # 估计相似度达到该值视为近似重复
+DIVERSITY_SHINGLE_SIZE = 3       # 字符 n-gram 的长度
+DIVERSITY_NUM_PERM = 128         # MinHash 签名长度
+DIVERSITY_BANDS = 32             # LSH 分段数，每段 4 个签名值，相似度0.7的行几乎都能成为候选
+
+# 单次请求行数配置
+ROW_TOKENS_PATH = ROOT_DIR / ".cache" / "row_tokens.json"  # 每行输出token数的历史记录
+ROW_TOKENS_SMOOTHING = 0.3     # 新观测值的平滑权重
+ROW_TOKENS_MAX_ENTRIES = 1000  # 最多保留的模型与列结构组合数
+ROW_TOKENS_FLUSH_INTERVAL = 5  # 观测值合并写入文件的间隔（秒）
+ROW_TOKENS_SAFETY_RATIO = 0.8  # 单次请求预计输出不超过 max_tokens 的该比例
+RESPONSE_OVERHEAD_TOKENS = 50  # 数据之外的说明文字、代码块标记等预留的token数
+
+# 请求超时与退避配置
+CONNECT_TIMEOUT = 10           # 建立连接的超时时间（秒）
+FIRST_BYTE_TIMEOUT = 60        # 发出请求后等待首个数据块的超时时间（秒）
+STREAM_IDLE_TIMEOUT = 30       # 流式响应中两个数据块之间的最大间隔（秒）
+BACKOFF_BASE_DELAY = 1         # 指数退避的初始等待时间（秒）
+BACKOFF_MAX_DELAY = 30         # 单次退避等待时间上限（秒）
+
+# 结果缓存配置
+CACHE_ENABLED = os.getenv("DATASPRITE_CACHE", "1") != "0"  # 设置 DATASPRITE_CACHE=0 可关闭缓存
+CACHE_PATH = ROOT_DIR / ".cache" / "responses.sqlite3"
+CACHE_TTL = 7 * 24 * 3600           # 缓存有效期（秒）
+CACHE_MAX_ENTRIES = 1000            # 最多缓存的请求数
+CACHE_MAX_BYTES = 100 * 1024 * 1024 # 缓存总容量上限（字节）
+
+# 限流配置：按模型ID设置每分钟请求数(rpm)和token数(tpm)，未列出的模型使用 default
+# 同一进程内的所有客户端共享这些配额，请按账号在 siliconflow 的实际额度调整
+RATE_LIMITS = {
+    "default": {"rpm": 1000, "tpm": 50000},
+}
+MAX_CONCURRENT_REQUESTS = 16        # 进程内同时进行的上游请求数上限
+
+# 模型路由配置
+MODEL_METRICS_WINDOW = 50           # 每个模型保留的最近请求样本数
+ROUTER_FALLBACK_MODELS = [          # 自动切换时依次尝试的备选模型
+    "DeepSeek-V3",
+    "Qwen2.5-72B-Instruct",
+    "DeepSeek-V2.5",
+]
+ROUTER_MAX_ERROR_RATE = 0.5         # 最近错误率超过该值的模型视为不可用
+ROUTER_MAX_TTFT = 20                # 最近 p95 首字节延迟超过该值（秒）的模型视为过慢
+ROUTER_MIN_SAMPLES = 3              # 样本数少于该值时不判断模型健康状况
+ROUTER_FIRST_ROW_TIMEOUT = 45       # 超过该时间（秒）仍未返回第一行时切换到下一个模型
+
+# 对冲请求配置
+HEDGE_MAX_ROWS = 10                 # 只对不超过该行数的小批量生成发起对冲请求
+HEDGE_PERCENTILE = 90               # 首行耗时超过最近该百分位数时发起对冲请求
+HEDGE_DEFAULT_DELAY = 10            # 还没有首行耗时样本时的对冲等待时间（秒）
+HEDGE_BUDGET_RATIO = 0.1            # 对冲请求数不超过可对冲请求数的该比例
+
+# 组合扩展配置
+COMBINATORIAL_MAX_ROWS = 10000      # 组合扩展模式最多生成的行数
+COMBINATORIAL_MIN_POOL_SIZE = 3     # 每列取值池的最小建议大小
+COMBINATORIAL_MAX_POOL_SIZE = 30    # 每列取值池的最大建议大小
+COMBINATORIAL_OVERFETCH = 4         # 跳过重复组合时每轮按缺口的倍数展开候选
+COMBINATORIAL_DEDUP_ROUNDS = 5      # 重复组合过多时最多补充展开的轮数
+
+# 请求合并配置
+COALESCE_REQUESTS = True            # 相同的生成请求同时进行时共享同一次上游调用
+
+# 任务队列服务配置
+JOB_WORKERS = 4                     # 同时执行的生成任务数
+JOB_QUEUE_MAX_SIZE = 100            # 排队任务数上限，超过时拒绝提交
+JOB_HISTORY_LIMIT = 500             # 保留的已结束任务数
+
 # 模型配置
 DEFAULT_TEMPERATURE = 0.7
-DEFAULT_MAX_TOKENS = 2000
+DEFAULT_MAX_TOKENS = 4000  # 单次请求的输出token上限，行数较多时按每行token数拆分为多次请求
+DEFAULT_OUTPUT_FORMAT = "json"  # 模型输出数据的格式：json 或 tsv（表格格式输出token更少）
 
 # 支持的模型配置
 SUPPORTED_MODELS = {
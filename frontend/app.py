@@ -1,23 +1,53 @@
 import streamlit as st
 import pandas as pd
-import asyncio
 import sys
+import time
 from pathlib import Path
-from io import BytesIO
 import json
+import re
 
 # 添加项目根目录到Python路径
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
 
-from backend.api.sku_generator import SKUGenerator
-from config import SUPPORTED_MODELS, DEFAULT_MODEL
+from backend.api.sku_generator import SKUGenerator, GENERATION_MODES
+from backend.api.deepseek_client import OUTPUT_FORMATS
+from backend.api.http_session import get_shared_session_manager
+from backend.api.response_cache import get_shared_cache
+from backend.api.singleflight import get_shared_singleflight
+from backend.api.rate_limiter import get_shared_rate_limiter
+from backend.api.model_metrics import get_shared_model_metrics
+from backend.api.model_router import ModelRouter, ROUTING_POLICIES
+from backend.api.hedging import get_shared_hedge_budget
+from backend.api.background_loop import BackgroundEventLoop
+from backend.api.validation import DataValidator
+from backend.api.dedup import RowHashIndex, default_key_columns
+from backend.api.diversity import NearDuplicateDetector
+from backend.api.cell_filler import ROW_ID, find_missing_cells, count_missing_cells, apply_fills
+from backend.ingest import read_table, format_bytes
+from backend.dataset_store import DatasetStore
+from backend.export import EXPORT_FORMATS, EXPORT_MIME_TYPES, frame_digest, get_shared_export_cache
+from config import (
+    SUPPORTED_MODELS,
+    DEFAULT_MODEL,
+    DEFAULT_OUTPUT_FORMAT,
+    MAX_ROWS,
+    SHARD_SIZE,
+    ROUTER_FALLBACK_MODELS,
+    HEDGE_MAX_ROWS,
+    COMBINATORIAL_MAX_ROWS,
+    DIVERSITY_THRESHOLD,
+    PREVIEW_UPDATE_ROWS,
+    INGEST_PREVIEW_ROWS,
+    EDITOR_PAGE_ROWS,
+    PREVIEW_UPDATE_INTERVAL
+)
 
 def init_session_state():
     if 'sku_columns' not in st.session_state:
         st.session_state.sku_columns = []
-    if 'sku_data' not in st.session_state:
-        st.session_state.sku_data = None
+    if 'dataset' not in st.session_state:
+        st.session_state.dataset = None
 
 async def generate_sku_data(generator, columns, prompt, num_rows, progress_callback=None):
     """异步生成SKU数据"""
@@ -36,7 +66,7 @@ def show_error_details(error: Exception):
 def show_help():
     """显示帮助信息"""
     with st.sidebar.expander("使用帮助 ❓"):
-        st.markdown("""
+        st.markdown(f"""
         ### 如何使用
         1. 在左侧输入SKU属性（每行一个）
         2. 点击"创建SKU模板"
@@ -47,7 +77,7 @@ def show_help():
         ### 注意事项
         - SKU属性不能重复
         - 每个属性必须有值
-        - 生成行数限制在1-50行之间
+        - 生成行数限制在1-{MAX_ROWS}行之间，超过{SHARD_SIZE}行时自动分片并发生成
         """)
 
 def show_api_settings():
@@ -62,6 +92,80 @@ def show_api_settings():
         )
         st.session_state.model = model
         
+        st.session_state.output_format = st.selectbox(
+            "模型输出格式",
+            options=list(OUTPUT_FORMATS.keys()),
+            index=list(OUTPUT_FORMATS.keys()).index(DEFAULT_OUTPUT_FORMAT),
+            format_func=lambda x: OUTPUT_FORMATS[x],
+            help="制表符分隔表格只输出一次表头，不在每行重复列名，输出token更少"
+        )
+        
+        # 模型路由设置
+        auto_switch = st.checkbox(
+            "失败或过慢时自动切换模型",
+            value=False,
+            help="当前模型出错或迟迟没有返回数据时，自动改用备选模型继续生成"
+        )
+        if auto_switch:
+            policy = st.radio(
+                "切换策略",
+                options=list(ROUTING_POLICIES.keys()),
+                format_func=lambda x: ROUTING_POLICIES[x],
+                horizontal=True
+            )
+            fallback_models = st.multiselect(
+                "备选模型",
+                options=[name for name in SUPPORTED_MODELS if name != model],
+                default=[name for name in ROUTER_FALLBACK_MODELS if name != model]
+            )
+            st.session_state.routing = {"models": [model] + fallback_models, "policy": policy}
+        else:
+            st.session_state.routing = None
+        
+        st.session_state.hedge = st.checkbox(
+            "小批量生成启用对冲请求",
+            value=False,
+            help=f"生成不超过{HEDGE_MAX_ROWS}行时，如果迟迟没有返回第一行，"
+                 "会再发起一个请求并采用先返回的结果（对冲请求数有预算上限）"
+        )
+        
+        model_stats = get_shared_model_metrics().get_model_stats(model)
+        if model_stats["ttft_p95"] is not None:
+            st.caption(
+                f"当前模型：p95首字节 {model_stats['ttft_p95']:.1f} 秒，"
+                f"错误率 {model_stats['error_rate']:.0%}"
+            )
+        
+        # 连接池复用统计
+        stats = get_shared_session_manager().get_stats()
+        st.caption(
+            f"连接复用：{stats['connections_reused']} 次复用 / "
+            f"{stats['connections_created']} 次新建"
+        )
+        cache = get_shared_cache()
+        if cache is not None:
+            cache_stats = cache.get_stats()
+            st.caption(
+                f"结果缓存：命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}，"
+                f"淘汰 {cache_stats['evictions']}，共 {cache_stats['entries']} 条"
+            )
+        flight_stats = get_shared_singleflight().get_stats()
+        st.caption(
+            f"请求合并：上游调用 {flight_stats['upstream_calls']} 次，"
+            f"合并 {flight_stats['coalesced']} 次"
+        )
+        limiter_stats = get_shared_rate_limiter().get_stats()
+        st.caption(
+            f"限流：{limiter_stats['throttled']}/{limiter_stats['requests']} 次请求需要等待，"
+            f"累计等待 {limiter_stats['wait_seconds']:.1f} 秒"
+        )
+        hedge_stats = get_shared_hedge_budget().get_stats()
+        if hedge_stats["hedges"]:
+            st.caption(
+                f"对冲请求：{hedge_stats['hedges']}/{hedge_stats['requests']} 次，"
+                f"其中 {hedge_stats['hedge_wins']} 次更快"
+            )
+        
         # API密钥设置
         api_key = st.text_input(
             "DeepSeek API密钥",
@@ -73,22 +177,121 @@ def show_api_settings():
             st.session_state.api_key = api_key
             if st.button("更新API密钥"):
                 try:
-                    generator = SKUGenerator(model=model)
-                    generator.update_api_key(api_key)
+                    get_generator()
                     st.success("✅ API密钥更新成功！")
                 except Exception as e:
                     st.error("❌ API密钥更新失败")
                     show_error_details(e)
 
-def show_progress(total_rows: int):
-    """显示生成进度"""
-    progress_bar = st.progress(0)
-    progress_text = st.empty()
+@st.cache_resource(show_spinner=False)
+def get_event_loop() -> BackgroundEventLoop:
+    """所有会话共享的后台事件循环，生成任务都在这个循环上执行，连接可以跨点击复用"""
+    return BackgroundEventLoop()
+
+@st.cache_resource(show_spinner=False)
+def _cached_generator(
+    model: str,
+    api_key: str,
+    output_format: str,
+    routing_policy: str,
+    routing_models: tuple,
+    hedge: bool
+) -> SKUGenerator:
+    """按模型、API密钥和生成设置缓存的生成器，设置相同的会话共用同一个实例"""
+    router = None
+    if routing_models:
+        router = ModelRouter(list(routing_models), policy=routing_policy)
+    generator = SKUGenerator(model=model, router=router, hedge=hedge)
+    generator.update_output_format(output_format)
+    # 有API密钥时使用API模式，否则使用模拟模式
+    if api_key:
+        generator.update_api_key(api_key)
+        generator.deepseek_client.use_mock = False
+    else:
+        generator.deepseek_client.use_mock = True
+    return generator
+
+def get_generator() -> SKUGenerator:
+    """获取与当前会话设置对应的共享生成器"""
+    routing = st.session_state.get('routing') or {}
+    return _cached_generator(
+        st.session_state.model,
+        st.session_state.get('api_key') or "",
+        st.session_state.get('output_format', DEFAULT_OUTPUT_FORMAT),
+        routing.get("policy"),
+        tuple(routing.get("models", ())),
+        st.session_state.get('hedge', False)
+    )
+
+class StreamingPreview:
+    """生成过程中的实时预览：按已解析的行数更新进度条，并把新行分批追加到预览表格
+
+    每累计 PREVIEW_UPDATE_ROWS 行或距上次刷新超过 PREVIEW_UPDATE_INTERVAL 秒才刷新一次界面，
+    第一行到达时立即显示；提示信息同样限频，只显示最新的一条。
+    生成在后台事件循环线程中进行，message 只记录提示信息，界面统一在脚本线程中刷新。
+    """
+    
+    def __init__(self, total_rows: int, columns: list):
+        self.total_rows = total_rows
+        self.columns = list(columns)
+        self.rows = []
+        self._pending = []
+        self._message = None
+        self._last_update = time.perf_counter()
+        self._last_message = 0.0
+        self.progress_bar = st.progress(0.0, text=f"已生成 0/{total_rows} 条")
+        self.status = st.empty()
+        self.table = st.dataframe(
+            pd.DataFrame(columns=self.columns),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    def message(self, message: str):
+        """记录生成过程中的提示信息，可以在任意线程调用"""
+        self._message = message
+    
+    def poll(self):
+        """等待新数据期间刷新提示信息"""
+        if time.perf_counter() - self._last_message >= PREVIEW_UPDATE_INTERVAL:
+            self._show_message()
     
-    def update_progress(message: str):
-        progress_text.text(message)
+    def _show_message(self):
+        if self._message is not None:
+            self.status.text(self._message)
+            self._message = None
+        self._last_message = time.perf_counter()
     
-    return update_progress
+    def add(self, row: dict):
+        """加入一行新数据，达到刷新条件时更新界面"""
+        self.rows.append(row)
+        self._pending.append(row)
+        self.poll()
+        if (
+            len(self.rows) == 1
+            or len(self._pending) >= PREVIEW_UPDATE_ROWS
+            or time.perf_counter() - self._last_update >= PREVIEW_UPDATE_INTERVAL
+        ):
+            self.flush()
+    
+    def flush(self):
+        """把尚未显示的行追加到表格并更新进度条"""
+        if self._pending:
+            self.table.add_rows(pd.DataFrame(self._pending, columns=self.columns))
+            self._pending = []
+        done = len(self.rows)
+        self.progress_bar.progress(
+            min(done / self.total_rows, 1.0),
+            text=f"已生成 {done}/{self.total_rows} 条"
+        )
+        self._show_message()
+        self._last_update = time.perf_counter()
+    
+    def clear(self):
+        """生成结束后移除预览"""
+        self.progress_bar.empty()
+        self.status.empty()
+        self.table.empty()
 
 def add_file_uploader():
     """添加文件上传功能"""
@@ -99,40 +302,74 @@ def add_file_uploader():
     )
     
     if uploaded_file is not None:
+        # 同一个文件只在首次上传时读取，之后使用会话中已追加新数据的版本
+        upload_id = f"{uploaded_file.name}:{uploaded_file.size}"
+        if st.session_state.get('upload_id') == upload_id and st.session_state.dataset is not None:
+            return st.session_state.dataset
         try:
-            # 根据文件类型读取
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            # 按块读取，所有列按文本读入，重复度高的列转为分类类型
+            status = st.empty()
+            with st.spinner("正在读取文件..."):
+                result = read_table(uploaded_file, uploaded_file.name, progress_callback=status.text)
+            status.empty()
+            
+            # 校验并规范化价格、库存等列，有问题的值保留原样并给出提示
+            report = DataValidator.for_columns(list(result.data.columns)).validate(
+                result.data, on_error="keep"
+            )
+            store = DatasetStore.from_dataframe(report.data)
             
-            # 更新session state
-            st.session_state.sku_columns = list(df.columns)
-            st.session_state.sku_data = df
+            # 更新session state，新文件需要重新建立去重索引
+            st.session_state.upload_id = upload_id
+            st.session_state.upload_summary = result.summary()
+            st.session_state.upload_warning = None if report.is_valid else report.summary()
+            st.session_state.sku_columns = store.columns
+            st.session_state.dataset = store
+            st.session_state.dedup_index = None
+            st.session_state.missing_counts = None
             
-            return df
+            return store
         except Exception as e:
             st.error(f"读取文件失败: {str(e)}")
             return None
     return None
 
-async def continue_generation(df: pd.DataFrame, num_new_rows: int):
-    """从已有数据继续生成"""
-    if df is None or df.empty:
+def show_table_preview(store: DatasetStore, title: str, tail: bool = False):
+    """显示数据预览；行数较多时只显示开头（或末尾）的一部分，不把整个表格传给前端"""
+    memory = format_bytes(store.memory_bytes())
+    if len(store) <= INGEST_PREVIEW_ROWS:
+        st.write(f"{title}（{len(store)} 行，内存占用 {memory}）：")
+        st.dataframe(store.to_frame(), use_container_width=True)
+        return
+    part = "末尾" if tail else "前"
+    st.write(f"{title}（共 {len(store)} 行，内存占用 {memory}，显示{part} {INGEST_PREVIEW_ROWS} 行）：")
+    st.dataframe(
+        store.tail(INGEST_PREVIEW_ROWS) if tail else store.head(INGEST_PREVIEW_ROWS),
+        use_container_width=True
+    )
+
+def get_dedup_index(store: DatasetStore, key_columns: list) -> RowHashIndex:
+    """获取当前数据的去重索引，去重依据列变化时重新建立"""
+    index = st.session_state.get('dedup_index')
+    if index is None or index.key_columns != list(key_columns):
+        with st.spinner(f"正在为 {len(store)} 行已有数据建立去重索引..."):
+            index = RowHashIndex.from_dataframe(store.to_frame(), key_columns)
+        st.session_state.dedup_index = index
+    return index
+
+def continue_generation(store: DatasetStore, num_new_rows: int, key_columns: list = None) -> int:
+    """从已有数据继续生成并追加到存储中，拒绝与已有数据重复的行，返回新增的行数"""
+    if store is None or store.empty:
         st.error("没有可用的数据")
-        return None
+        return 0
     
-    generator = SKUGenerator(model=st.session_state.model)
-    # 如果有API密钥，使用API模式
-    if 'api_key' in st.session_state and st.session_state.api_key:
-        generator.update_api_key(st.session_state.api_key)
-        generator.deepseek_client.use_mock = False
-    else:
-        generator.deepseek_client.use_mock = True
+    dedup_index = get_dedup_index(store, key_columns or default_key_columns(store.columns))
+    
+    generator = get_generator()
     
     # 获取现有数据的特征
-    columns = list(df.columns)
-    last_row = df.iloc[-1].to_dict()
+    columns = store.columns
+    last_row = store.last_row()
     
     # 构建更好的prompt
     prompt = (
@@ -147,44 +384,83 @@ async def continue_generation(df: pd.DataFrame, num_new_rows: int):
         f"5. 确保生成{num_new_rows}条不同的数据"
     )
     
-    # 创建一个固定的进度显示区域
-    progress_placeholder = st.empty()
-    progress_bar = st.progress(0)
-    
-    def progress_callback(message: str):
-        # 更新进度显示
-        if "正在生成第" in message:
-            try:
-                current = int(message.split('/')[0].split('第')[-1])
-                progress_bar.progress(current / num_new_rows)
-            except:
-                pass
-        progress_placeholder.text(message)
+    # 边生成边预览
+    preview = StreamingPreview(num_new_rows, columns)
     
     try:
         with st.spinner("正在生成新数据..."):
-            new_data = await generator.generate_sku_data(
-                columns=columns,
-                prompt=prompt,
-                num_rows=num_new_rows,
-                progress_callback=progress_callback
+            stream = generator.stream_sku_data(
+                columns,
+                prompt,
+                num_new_rows,
+                progress_callback=preview.message,
+                exclude=dedup_index
             )
+            for row in get_event_loop().iterate(
+                stream, idle_callback=preview.poll, idle_interval=PREVIEW_UPDATE_INTERVAL
+            ):
+                preview.add(row)
+            preview.flush()
+            new_data = preview.rows
             
             if new_data:
-                progress_placeholder.empty()  # 清除进度显示
-                progress_bar.empty()         # 清除进度条
-                # 转换为DataFrame并合并
-                new_df = pd.DataFrame(new_data)
-                result_df = pd.concat([df, new_df], ignore_index=True)
-                st.success(f"成功生成{num_new_rows}条新数据！")
-                return result_df
+                preview.clear()
+                # 规范化新数据，删除无法修复的行
+                report = generator.normalize_generated_data(new_data, columns)
+                if not report.is_valid:
+                    st.warning(report.summary())
+                added = store.append(report.data)
+                # 只有校验后保存的行才加入去重索引，被删除的行之后仍可以生成
+                dedup_index.add_dataframe(report.data)
+                st.success(f"成功生成{added}条新数据！")
+                return added
             
             st.error("未能生成新数据")
-            return None
+            return 0
             
     except Exception as e:
         st.error(f"生成失败: {str(e)}")
-        return None
+        return 0
+
+def fill_missing_values(store: DatasetStore, prompt: str, columns: list, new_columns: list = None) -> int:
+    """只为缺失的单元格生成取值并写回存储，可同时新增空列再补全，返回补全的单元格数"""
+    df = store.to_frame()
+    new_columns = [col for col in dict.fromkeys(new_columns or []) if col not in df.columns]
+    if new_columns:
+        df = df.assign(**{col: None for col in new_columns})
+        columns = list(columns) + new_columns
+    if not columns:
+        st.error("请选择要补全的列")
+        return 0
+    
+    total_rows = sum(len(positions) for positions in find_missing_cells(df, columns).values())
+    if not total_rows:
+        st.info("所选的列没有缺失值")
+        return 0
+    
+    generator = get_generator()
+    preview = StreamingPreview(total_rows, [ROW_ID] + list(columns))
+    try:
+        with st.spinner("正在补全缺失值..."):
+            stream = generator.stream_cell_fills(df, prompt, columns, progress_callback=preview.message)
+            for row in get_event_loop().iterate(
+                stream, idle_callback=preview.poll, idle_interval=PREVIEW_UPDATE_INTERVAL
+            ):
+                preview.add(row)
+            preview.flush()
+    except Exception as e:
+        st.error(f"补全失败: {str(e)}")
+        return 0
+    
+    fills = preview.rows
+    preview.clear()
+    store.replace(apply_fills(df, fills))
+    st.session_state.sku_columns = store.columns
+    st.session_state.dedup_index = None
+    st.session_state.missing_counts = None
+    filled_cells = sum(len(row) - 1 for row in fills)
+    st.success(f"成功补全{filled_cells}个单元格！")
+    return filled_cells
 
 def show_file_upload_page():
     """显示文件上传页面"""
@@ -195,31 +471,61 @@ def show_file_upload_page():
     show_api_settings()
     
     # 文件上传部分
-    df = add_file_uploader()
-    if df is not None:
-        st.write("当前数据预览：")
-        # 直接显示数据框
-        st.dataframe(df)
+    store = add_file_uploader()
+    if store is not None:
+        if st.session_state.get('upload_summary'):
+            st.caption(st.session_state.upload_summary)
+        if st.session_state.get('upload_warning'):
+            st.warning(st.session_state.upload_warning)
+        show_table_preview(store, "当前数据预览")
         
         # 继续生成选项
         with st.form("continue_generation"):
             num_new_rows = st.number_input(
                 "要生成的新数据行数",
                 min_value=1,
-                max_value=50,
+                max_value=MAX_ROWS,
                 value=5
             )
+            key_columns = st.multiselect(
+                "去重依据列",
+                options=store.columns,
+                default=default_key_columns(store.columns),
+                help="新数据在这些列上与已有数据完全相同时视为重复，会被拒绝并重新生成；默认不含价格、库存、编码等列"
+            )
             
             if st.form_submit_button("继续生成"):
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    updated_df = loop.run_until_complete(continue_generation(df, num_new_rows))
-                    if updated_df is not None:
-                        st.session_state.sku_data = updated_df
-                        st.dataframe(updated_df)  # 直接显示更新后的数据
-                finally:
-                    loop.close()
+                if continue_generation(store, num_new_rows, key_columns):
+                    show_table_preview(store, "更新后的数据", tail=True)
+        
+        # 补全缺失值选项：只请求缺失的单元格，不生成整行
+        if st.session_state.get('missing_counts') is None:
+            st.session_state.missing_counts = count_missing_cells(store.to_frame())
+        missing_counts = st.session_state.missing_counts
+        with st.form("fill_missing"):
+            if missing_counts:
+                st.write("缺失值：" + "，".join(f"{col} {count} 处" for col, count in missing_counts.items()))
+            else:
+                st.write("当前数据没有缺失值，可以新增列后补全")
+            fill_prompt = st.text_input(
+                "产品描述（可选）",
+                help="补全时附带的说明，例如商品类目；每行已有的取值会自动作为参考"
+            )
+            fill_columns = st.multiselect(
+                "要补全的列",
+                options=store.columns,
+                default=list(missing_counts)
+            )
+            new_columns_input = st.text_input(
+                "新增列（可选）",
+                placeholder="例如：材质，适用季节",
+                help="多个列名用逗号分隔，新增的列会为每一行补全"
+            )
+            
+            if st.form_submit_button("补全缺失值"):
+                new_columns = [col.strip() for col in re.split(r'[,，]', new_columns_input) if col.strip()]
+                if fill_missing_values(store, fill_prompt, fill_columns, new_columns):
+                    show_table_preview(store, "补全后的数据")
 
 def create_new_file():
     """创建新文件的功能"""
@@ -243,11 +549,10 @@ def create_new_file():
                 if not columns_input:
                     raise ValueError("请输入SKU属性")
                 
-                generator = SKUGenerator()
-                columns = generator.validate_columns(columns_input.split('\n'))
+                columns = get_generator().validate_columns(columns_input.split('\n'))
                 
                 st.session_state.sku_columns = columns
-                st.session_state.sku_data = pd.DataFrame(columns=columns)
+                st.session_state.dataset = DatasetStore(columns)
                 st.success("✅ SKU模板创建成功！")
             except Exception as e:
                 st.error("❌ 创建模板失败")
@@ -269,71 +574,157 @@ def show_data_editor():
                 help="详细的描述可以帮助生成更准确的数据"
             )
             
+            mode = st.radio(
+                "生成模式",
+                options=list(GENERATION_MODES.keys()),
+                format_func=lambda x: GENERATION_MODES[x],
+                horizontal=True,
+                help="属性组合扩展：模型只生成各属性的可选取值，本地组合出所有SKU，"
+                     "价格、库存、编码等列按规则计算，适合颜色×尺寸×材质这类大批量规格；\n"
+                     "按列分组生成：先生成前两列，再把其余各列分组并发生成，适合列数很多的模板"
+            )
+            max_rows = COMBINATORIAL_MAX_ROWS if mode == "combinatorial" else MAX_ROWS
+            
             num_rows = st.number_input(
                 "生成行数",
                 min_value=1,
-                max_value=50,
+                max_value=max_rows,
                 value=5,
-                help="一次最多生成50行数据"
+                help=f"一次最多生成{max_rows}行数据"
+            )
+            
+            use_cache = st.checkbox(
+                "优先使用缓存结果",
+                value=True,
+                help="相同的模型、属性、描述和行数直接返回上次的生成结果；取消勾选则重新生成"
             )
             
+            diversity_threshold = None
+            regenerate_similar = False
+            if mode != "combinatorial" and st.checkbox(
+                "检测近似重复",
+                value=False,
+                help="按字符片段估算各行之间的相似度，统计只差一两个词的近似重复行并给出多样性得分"
+            ):
+                diversity_threshold = st.slider(
+                    "相似度阈值",
+                    min_value=0.5,
+                    max_value=0.95,
+                    value=DIVERSITY_THRESHOLD,
+                    step=0.05,
+                    help="与已生成的某一行相似度达到该值即视为近似重复"
+                )
+                regenerate_similar = st.checkbox("自动重新生成近似重复的行", value=True)
+            
             if st.button("生成SKU数据", type="primary"):
-                # 使用事件循环运行异步函数
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(generate_data(prompt, num_rows))
-                    # 刷新数据预览
-                    st.rerun()
-                finally:
-                    loop.close()
+                generate_data(
+                    prompt, num_rows, use_cache, mode,
+                    diversity_threshold=diversity_threshold,
+                    regenerate_similar=regenerate_similar
+                )
+                # 刷新数据预览
+                st.rerun()
         
         with col2:
             st.subheader("数据预览")
-            if st.session_state.sku_data is not None:
+            if st.session_state.get('diversity_summary'):
+                st.caption(st.session_state.diversity_summary)
+            if st.session_state.dataset is not None:
                 show_data_preview()
 
 def show_data_preview():
     """显示数据预览和导出功能"""
+    store = st.session_state.dataset
+    
+    # 编辑器每次只显示一页，不把整个表格复制后传给前端
+    num_pages = max(1, -(-len(store) // EDITOR_PAGE_ROWS))
+    page = 1
+    if num_pages > 1:
+        # 删除行后页数可能变少
+        if st.session_state.get('editor_page', 1) > num_pages:
+            st.session_state.editor_page = num_pages
+        page = st.number_input(
+            f"页码（共 {num_pages} 页，每页 {EDITOR_PAGE_ROWS} 行，共 {len(store)} 行）",
+            min_value=1,
+            max_value=num_pages,
+            value=1,
+            key='editor_page'
+        )
+    start = (page - 1) * EDITOR_PAGE_ROWS
+    stop = min(start + EDITOR_PAGE_ROWS, len(store))
+    df = store.page(start, stop)
+    # 分类列转为普通文本后再编辑，否则编辑器只允许从已有取值中选择
+    df = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    
     # 添加编辑功能
     edited_df = st.data_editor(
-        st.session_state.sku_data,
+        df,
         use_container_width=True,
         hide_index=True,
         num_rows="dynamic"
     )
     
-    # 更新编辑后的数据
-    st.session_state.sku_data = edited_df
+    # 只有修改过这一页时才写回这一页的行
+    if not edited_df.equals(df):
+        store.splice(start, stop, edited_df)
     
     # 导出功能
-    if not edited_df.empty:
-        col1, col2 = st.columns(2)
-        with col1:
-            csv = edited_df.to_csv(index=False)
-            st.download_button(
-                "下载CSV文件",
-                csv,
-                "sku_data.csv",
-                "text/csv",
-                key='download-csv',
-                use_container_width=True
-            )
-        with col2:
-            excel_buffer = BytesIO()
-            edited_df.to_excel(excel_buffer, index=False)
-            excel_data = excel_buffer.getvalue()
-            st.download_button(
-                "下载Excel文件",
-                excel_data,
-                "sku_data.xlsx",
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key='download-excel',
-                use_container_width=True
-            )
+    if not store.empty:
+        show_export_options(store.to_frame())
+
+def show_export_options(df: pd.DataFrame):
+    """导出文件只在点击“准备下载”后生成，内容未变化时复用已生成的文件"""
+    col1, col2 = st.columns(2)
+    with col1:
+        fmt = st.selectbox(
+            "导出格式",
+            options=list(EXPORT_FORMATS),
+            format_func=lambda x: EXPORT_FORMATS[x],
+            key='export_format',
+            label_visibility="collapsed"
+        )
+    with col2:
+        prepare = st.button("准备下载文件", key='prepare-export', use_container_width=True)
+    
+    # 没有请求过导出时不计算哈希，也不生成文件
+    if not prepare and st.session_state.get('export_format_prepared') != fmt:
+        return
+    
+    try:
+        digest = frame_digest(df)
+        cache = get_shared_export_cache()
+        if prepare:
+            with st.spinner(f"正在生成{EXPORT_FORMATS[fmt]}文件..."):
+                data = cache.get_or_build(df, fmt, digest)
+            st.session_state.export_format_prepared = fmt
+        else:
+            # 数据修改后需要重新点击生成
+            data = cache.get(digest, fmt)
+            if data is None:
+                st.caption("数据已修改，请重新点击“准备下载文件”")
+                return
+        st.download_button(
+            f"下载{EXPORT_FORMATS[fmt]}文件（{format_bytes(len(data))}）",
+            data,
+            f"sku_data.{fmt}",
+            EXPORT_MIME_TYPES[fmt],
+            key=f'download-{fmt}',
+            use_container_width=True
+        )
+    except ImportError as e:
+        st.error(str(e))
+    except Exception as e:
+        st.error(f"导出失败: {str(e)}")
 
-async def generate_data(prompt: str, num_rows: int):
-    """生成SKU数据"""
+def generate_data(
+    prompt: str,
+    num_rows: int,
+    use_cache: bool = True,
+    mode: str = "rows",
+    diversity_threshold: float = None,
+    regenerate_similar: bool = False
+):
+    """生成SKU数据，设置 diversity_threshold 时检测近似重复的行"""
     if not st.session_state.sku_columns:
         st.error("请先创建SKU模板")
         return
@@ -343,38 +734,46 @@ async def generate_data(prompt: str, num_rows: int):
         return
     
     try:
-        generator = SKUGenerator(model=st.session_state.model)
+        generator = get_generator()
         
-        # 设置API密钥和模式
-        if 'api_key' in st.session_state and st.session_state.api_key:
-            generator.update_api_key(st.session_state.api_key)
-            generator.deepseek_client.use_mock = False  # 使用API模式
-        else:
-            generator.deepseek_client.use_mock = True  # 使用模拟模式
+        # 边生成边预览
+        preview = StreamingPreview(num_rows, st.session_state.sku_columns)
         
-        # 显示进度
-        progress_callback = show_progress(num_rows)
+        diversity = None
+        if diversity_threshold is not None:
+            diversity = NearDuplicateDetector(threshold=diversity_threshold, reject=regenerate_similar)
         
         # 生成数据
         with st.spinner("正在生成数据..."):
-            result = await generator.generate_sku_data(
+            stream = generator.stream_sku_data(
                 st.session_state.sku_columns,
                 prompt,
                 num_rows,
-                progress_callback=progress_callback
+                progress_callback=preview.message,
+                use_cache=use_cache,
+                mode=mode,
+                diversity=diversity
             )
+            for row in get_event_loop().iterate(
+                stream, idle_callback=preview.poll, idle_interval=PREVIEW_UPDATE_INTERVAL
+            ):
+                preview.add(row)
+            preview.flush()
+            result = preview.rows
+            st.session_state.diversity_summary = diversity.summary() if diversity else None
             
-            # 更新数据
-            new_df = pd.DataFrame(result)
-            if st.session_state.sku_data is None:
-                st.session_state.sku_data = new_df
-            else:
-                st.session_state.sku_data = pd.concat(
-                    [st.session_state.sku_data, new_df],
-                    ignore_index=True
-                )
+            # 规范化生成的数据，删除无法修复的行
+            report = generator.normalize_generated_data(result, st.session_state.sku_columns)
+            if not report.is_valid:
+                st.warning(report.summary())
+            new_df = report.data
+            
+            # 追加到会话数据，不复制已有数据
+            if st.session_state.dataset is None:
+                st.session_state.dataset = DatasetStore(st.session_state.sku_columns)
+            st.session_state.dataset.append(new_df)
             
-            st.success(f"✨ 成功生成{num_rows}条数据！")
+            st.success(f"✨ 成功生成{len(new_df)}条数据！")
             
     except Exception as e:
         st.error("❌ 生成失败")
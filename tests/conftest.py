@@ -0,0 +1,4 @@
+import os
+
+# 测试不读写磁盘上的响应缓存
+os.environ.setdefault("DATASPRITE_CACHE", "0")
@@ -0,0 +1,90 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from backend.api.background_loop import BackgroundEventLoop
+
+
+@pytest.fixture
+def background():
+    loop = BackgroundEventLoop(name="test-loop")
+    yield loop
+    loop.close()
+
+
+def test_runs_every_coroutine_on_the_same_loop(background):
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert background.run(current_loop()) is background.loop
+    assert background.run(current_loop()) is background.loop
+
+
+def test_timeout_cancels_background_coroutine(background):
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        background.run(slow(), timeout=0.05)
+    assert cancelled.wait(1)
+
+
+def test_iterate_yields_items_and_calls_idle_callback(background):
+    idle = []
+
+    async def stream():
+        yield 1
+        await asyncio.sleep(0.1)
+        yield 2
+
+    items = list(background.iterate(stream(), idle_callback=lambda: idle.append(1), idle_interval=0.02))
+    assert items == [1, 2]
+    assert idle
+
+
+def test_iterate_propagates_errors(background):
+    async def stream():
+        yield 1
+        raise ValueError("生成失败")
+
+    with pytest.raises(ValueError, match="生成失败"):
+        list(background.iterate(stream()))
+
+
+def test_stopping_iteration_cancels_background_stream(background):
+    closed = threading.Event()
+
+    async def stream():
+        try:
+            for i in range(1000):
+                yield i
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    for item in background.iterate(stream()):
+        if item == 2:
+            break
+    assert closed.wait(1)
+
+
+def test_submit_after_close_raises():
+    background = BackgroundEventLoop(name="test-loop")
+    background.close()
+    background.close()
+
+    async def noop():
+        pass
+
+    coro = noop()
+    with pytest.raises(RuntimeError):
+        background.submit(coro)
+    coro.close()
@@ -0,0 +1,42 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from backend.api.cell_filler import ROW_ID, apply_fills, context_row, find_missing_cells
+from backend.api.sku_generator import SKUGenerator
+
+
+def make_frame():
+    return pd.DataFrame({
+        "id": ["A100", "A101", "A102"],
+        "名称": ["手机", None, "耳机"],
+        "颜色": [None, "红", "  "],
+    })
+
+
+def test_find_missing_cells_groups_rows_by_missing_columns():
+    assert find_missing_cells(make_frame()) == {("颜色",): [0, 2], ("名称",): [1]}
+
+
+def test_context_row_keeps_position_when_table_has_id_column():
+    row = context_row(make_frame(), 1, ["名称"])
+    assert row == {ROW_ID: 1, "id": "A101", "颜色": "红"}
+
+
+def test_apply_fills_rejects_invalid_positions():
+    df = make_frame()
+    with pytest.raises(ValueError):
+        apply_fills(df, [{ROW_ID: "A100", "颜色": "黑"}])
+    with pytest.raises(ValueError):
+        apply_fills(df, [{ROW_ID: 3, "颜色": "黑"}])
+
+
+def test_fill_missing_cells_with_id_column():
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    result = asyncio.run(generator.fill_missing_cells(make_frame()))
+
+    assert result["id"].tolist() == ["A100", "A101", "A102"]
+    assert result["名称"].tolist()[0::2] == ["手机", "耳机"]
+    assert not find_missing_cells(result)
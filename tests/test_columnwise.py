@@ -0,0 +1,56 @@
+import asyncio
+
+from backend.api.cell_filler import ROW_ID
+from backend.api.sku_generator import SKUGenerator
+
+COLUMNS = ["商品名称", "id", "颜色", "材质", "产地"]
+
+
+def make_generator(fills):
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    calls = []
+
+    async def fake_rows(columns, prompt, num_rows, progress_callback=None, use_cache=True):
+        calls.append(("rows", list(columns)))
+        for i in range(num_rows):
+            yield {"商品名称": f"T恤{i}", "id": f"SKU{i}"}
+
+    async def fake_fills(df, prompt="", columns=None, progress_callback=None, max_columns=None):
+        calls.append(("fills", df.columns.tolist(), list(columns)))
+        for fill in fills:
+            yield fill
+
+    generator._stream_content = fake_rows
+    generator.stream_cell_fills = fake_fills
+    return generator, calls
+
+
+def test_columnwise_joins_fills_by_row_position():
+    fills = [
+        {ROW_ID: 2, "颜色": "蓝", "材质": "棉"},
+        {ROW_ID: 0, "颜色": "红", "材质": "麻"},
+        {ROW_ID: 2, "产地": "广州"},
+        {ROW_ID: 1, "颜色": "白", "材质": "涤纶"},
+        {ROW_ID: 0, "产地": "杭州"},
+    ]
+    generator, calls = make_generator(fills)
+    rows = asyncio.run(generator.generate_sku_data(COLUMNS, "T恤", 3, mode="columnwise"))
+
+    assert calls == [
+        ("rows", ["商品名称", "id"]),
+        ("fills", COLUMNS, ["颜色", "材质", "产地"]),
+    ]
+    # 各列都补全的行按完成顺序产出，第 1 行缺少产地被丢弃
+    assert rows == [
+        {"商品名称": "T恤2", "id": "SKU2", "颜色": "蓝", "材质": "棉", "产地": "广州"},
+        {"商品名称": "T恤0", "id": "SKU0", "颜色": "红", "材质": "麻", "产地": "杭州"},
+    ]
+
+
+def test_columnwise_with_id_column_in_mock_mode():
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    rows = asyncio.run(generator.generate_sku_data(COLUMNS, "T恤", 5, mode="columnwise", use_cache=False))
+    assert len(rows) == 5
+    assert all(list(row) == COLUMNS and all(row.values()) for row in rows)
@@ -0,0 +1,80 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from backend.api.combinatorial import CombinatorialExpander, derived_kind, split_columns
+from backend.api.dedup import RowHashIndex
+from backend.api.diversity import text_columns
+from backend.api.sku_generator import SKUGenerator
+from config import COMBINATORIAL_OVERFETCH
+
+
+def test_derived_kind_matches_column_suffix():
+    assert derived_kind("价格") == "price"
+    assert derived_kind("零售价") == "price"
+    assert derived_kind("价格（元）") == "price"
+    assert derived_kind("库存量") == "stock"
+    assert derived_kind("商品sku") == "code"
+
+
+def test_derived_kind_ignores_keyword_inside_text_columns():
+    for column in ["用户评价", "性价比", "评价内容", "SKU描述"]:
+        assert derived_kind(column) is None
+
+
+def test_text_columns_keep_review_columns():
+    columns = ["商品名称", "用户评价", "SKU描述", "价格", "SKU"]
+    assert split_columns(columns) == (["商品名称", "用户评价", "SKU描述"], ["价格", "SKU"])
+    assert text_columns(columns) == ["商品名称", "用户评价", "SKU描述"]
+
+
+def run_combinatorial(exclude, monkeypatch, columns=("颜色", "尺码", "价格"), num_rows=5):
+    limits = []
+    expand = CombinatorialExpander.expand
+
+    def spy(self, limit, start=0):
+        limits.append(limit)
+        return expand(self, limit, start)
+
+    monkeypatch.setattr(CombinatorialExpander, "expand", spy)
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    rows = asyncio.run(generator.generate_sku_data(
+        list(columns), "T恤", num_rows, mode="combinatorial", use_cache=False, exclude=exclude
+    ))
+    return rows, limits
+
+
+def test_exclude_skips_existing_combinations_by_pool_columns(monkeypatch):
+    existing = pd.DataFrame({
+        "颜色": ["颜色_1"] * 4,
+        "尺码": [f"尺码_{i}" for i in range(1, 5)],
+        "价格": ["1元", "2元", "3元", "4元"],
+    })
+    exclude = RowHashIndex.from_dataframe(existing)
+    assert exclude.key_columns == ["颜色", "尺码"]
+
+    rows, _ = run_combinatorial(exclude, monkeypatch)
+    assert len(rows) == 5
+    assert all(row["颜色"] != "颜色_1" for row in rows)
+    assert len({(row["颜色"], row["尺码"]) for row in rows}) == 5
+
+
+def test_large_catalogue_does_not_inflate_candidates(monkeypatch):
+    # 五个属性列组成 3^5 种组合，远多于需要的行数
+    columns = ["颜色", "尺码", "材质", "款式", "产地", "价格"]
+    existing = pd.DataFrame({col: [f"旧{col}{i}" for i in range(20000)] for col in columns})
+    rows, limits = run_combinatorial(RowHashIndex.from_dataframe(existing), monkeypatch, columns)
+    assert len(rows) == 5
+    assert max(limits) <= 5 * COMBINATORIAL_OVERFETCH
+
+
+def test_exclude_on_derived_columns_is_rejected():
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    exclude = RowHashIndex(["颜色", "价格"], key_columns=["颜色", "价格"])
+    with pytest.raises(ValueError):
+        asyncio.run(generator.generate_sku_data(
+            ["颜色", "价格"], "T恤", 5, mode="combinatorial", use_cache=False, exclude=exclude
+        ))
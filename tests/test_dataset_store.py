@@ -0,0 +1,65 @@
+import pandas as pd
+
+from backend.dataset_store import DatasetStore
+
+
+def make_rows(start, count):
+    return [{"名称": f"商品{i}", "颜色": ["红", "蓝"][i % 2]} for i in range(start, start + count)]
+
+
+def test_append_compacts_geometrically():
+    store = DatasetStore(["名称", "颜色"], compact_rows=10)
+    compactions = 0
+    compact = store.compact
+
+    def counting_compact():
+        nonlocal compactions
+        if store._pending:
+            compactions += 1
+        compact()
+
+    store.compact = counting_compact
+    for start in range(0, 1000, 5):
+        store.append(make_rows(start, 5))
+
+    assert len(store) == 1000
+    # 待合并的行数不少于主数据时才合并，合并次数与总行数的对数成正比
+    assert compactions <= 8
+    assert store.to_frame()["名称"].tolist() == [f"商品{i}" for i in range(1000)]
+
+
+def test_tail_reads_pending_chunks_without_compacting():
+    store = DatasetStore.from_dataframe(pd.DataFrame(make_rows(0, 20)), compact_rows=100)
+    store.append(make_rows(20, 3))
+    tail = store.tail(5)
+    assert tail.index.tolist() == [18, 19, 20, 21, 22]
+    assert tail["名称"].tolist() == [f"商品{i}" for i in range(18, 23)]
+    assert len(store._pending) == 1
+
+
+def test_compact_keeps_categories_and_adds_new_values():
+    store = DatasetStore.from_dataframe(pd.DataFrame(make_rows(0, 20)), compact_rows=1)
+    assert isinstance(store.to_frame()["颜色"].dtype, pd.CategoricalDtype)
+    store.append([{"名称": "新商品", "颜色": "绿"}])
+    frame = store.to_frame()
+    assert isinstance(frame["颜色"].dtype, pd.CategoricalDtype)
+    assert frame["颜色"].iloc[-1] == "绿"
+
+
+def test_splice_rewrites_only_the_edited_page():
+    store = DatasetStore.from_dataframe(pd.DataFrame(make_rows(0, 20)))
+    page = store.page(10, 13).astype(object)
+    page.iloc[0, 1] = "黑"
+    page.iloc[2, 0] = "改名"
+    store.splice(10, 13, page)
+    frame = store.to_frame()
+    assert len(frame) == 20
+    assert frame.iloc[10].tolist() == ["商品10", "黑"]
+    assert frame.iloc[12].tolist() == ["改名", "红"]
+    assert frame.iloc[13].tolist() == ["商品13", "蓝"]
+
+
+def test_splice_with_added_and_deleted_rows():
+    store = DatasetStore.from_dataframe(pd.DataFrame(make_rows(0, 10)))
+    store.splice(2, 5, pd.DataFrame([{"名称": "新", "颜色": "白"}]))
+    assert store.to_frame()["名称"].tolist() == ["商品0", "商品1", "新"] + [f"商品{i}" for i in range(5, 10)]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pandas as pd
+
+from backend.api.dedup import RowHashIndex, default_key_columns
+from backend.api.sku_generator import SKUGenerator
+from backend.api.validation import DataValidator, infer_column_specs
+
+COLUMNS = ["商品名称", "价格", "库存", "身高"]
+VALUES = {
+    "商品名称": ["手机", " 手机 ", "ＡＢＣ", ""],
+    "价格": ["1299", "1,299元", "￥1299.50", "12.345", "面议", "-5", "100块", ""],
+    "库存": ["100", "100件", "1.5", "-3", "很多", ""],
+    "身高": ["170", "1.7m", "1700mm", "170 厘米", "3-6岁", "170kg", ""],
+}
+
+
+def test_spec_normalize_matches_validator():
+    for spec in infer_column_specs(COLUMNS):
+        values = VALUES[spec.name]
+        report = DataValidator([spec]).validate(pd.DataFrame({spec.name: values}), on_error="keep")
+        expected = report.data[spec.name].fillna("").tolist()
+        assert [spec.normalize(value) for value in values] == expected
+
+
+def test_formatting_only_duplicates_are_detected():
+    existing = pd.DataFrame([{"商品名称": "手机", "价格": "1299元", "库存": "100", "身高": "170cm"}])
+    index = RowHashIndex.from_dataframe(existing, key_columns=COLUMNS)
+    assert index.contains({"商品名称": "手机 ", "价格": "1,299", "库存": "100件", "身高": "1.7米"})
+    assert not index.contains({"商品名称": "手机", "价格": "1399", "库存": "100", "身高": "170"})
+
+    assert index.add({"商品名称": "耳机", "价格": "199", "库存": "5", "身高": "1m"})
+    assert not index.add({"商品名称": "耳机", "价格": "199元", "库存": "5", "身高": "100cm"})
+
+
+def test_default_key_skips_derived_columns():
+    assert default_key_columns(["商品名称", "颜色", "价格", "库存", "SKU编码"]) == ["商品名称", "颜色"]
+    assert default_key_columns(["价格", "库存"]) == ["价格", "库存"]
+    index = RowHashIndex(["商品名称", "价格", "SKU编码"])
+    assert index.add({"商品名称": "手机", "价格": "1299元", "SKU编码": "SKU-00001-AAAAAA"})
+    assert not index.add({"商品名称": "手机", "价格": "1399元", "SKU编码": "SKU-00002-BBBBBB"})
+
+
+def test_filtered_generation_leaves_index_to_the_caller():
+    rounds = [
+        [{"商品名称": "手机"}, {"商品名称": "耳机"}, {"商品名称": "耳机 "}, {"商品名称": "平板"}],
+        [{"商品名称": "手表"}],
+    ]
+    prompts = []
+
+    async def fake_rows(columns, prompt, num_rows, progress_callback=None, use_cache=True):
+        prompts.append(prompt)
+        for row in rounds[len(prompts) - 1]:
+            yield row
+
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    generator._stream_content = fake_rows
+    exclude = RowHashIndex.from_dataframe(pd.DataFrame({"商品名称": ["手机"]}))
+    rows = asyncio.run(generator.generate_sku_data(["商品名称"], "数码", 3, exclude=exclude))
+
+    # 与已有数据重复和本次互相重复的行都被拒绝并请求替换
+    assert [row["商品名称"] for row in rows] == ["耳机", "平板", "手表"]
+    assert len(prompts) == 2
+    # 生成过程不修改索引，由调用方在校验保存后加入
+    assert len(exclude) == 1
@@ -0,0 +1,131 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from backend.api import deepseek_client as client_module
+from backend.api.deepseek_client import DeepSeekClient, RetryableAPIError, _parse_retry_after
+from config import BACKOFF_MAX_DELAY, MAX_RETRIES, TOPUP_FINGERPRINT_CHARS, TOPUP_SAMPLE_ROWS
+
+COLUMNS = ["商品名称", "颜色"]
+
+
+def make_client(monkeypatch, attempts):
+    """按顺序执行 attempts 中的每次请求：产出给定的行后抛出给定的异常"""
+    client = DeepSeekClient("test-key", use_mock=False)
+    client.cache = None
+    prompts = []
+    sleeps = []
+
+    async def fake_once(columns, prompt, num_rows, progress_callback=None, is_topup=False, usage_callback=None):
+        rows, error = attempts[len(prompts)]
+        prompts.append(prompt)
+        for row in rows[:num_rows]:
+            yield row
+        if error is not None:
+            raise error
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(client, "_stream_rows_once", fake_once)
+    monkeypatch.setattr(client_module.asyncio, "sleep", fake_sleep)
+    return client, prompts, sleeps
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+def test_parse_retry_after_clamps_seconds():
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("abc") is None
+    assert _parse_retry_after("5") == 5
+    assert _parse_retry_after("-3") == 0
+    assert _parse_retry_after("3600") == BACKOFF_MAX_DELAY
+
+
+def test_parse_retry_after_http_date():
+    soon = datetime.now(timezone.utc) + timedelta(seconds=10)
+    assert 0 < _parse_retry_after(format_datetime(soon, usegmt=True)) <= 10
+    later = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert _parse_retry_after(format_datetime(later, usegmt=True)) == BACKOFF_MAX_DELAY
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert _parse_retry_after(format_datetime(past, usegmt=True)) == 0
+
+
+def test_retry_resumes_with_kept_rows_and_honours_retry_after(monkeypatch):
+    rows = [{"商品名称": f"T恤{i}", "颜色": "红"} for i in range(4)]
+    client, prompts, sleeps = make_client(monkeypatch, [
+        (rows[:2], RetryableAPIError("限流", 429, retry_after=7)),
+        (rows[2:], None),
+    ])
+
+    result = asyncio.run(collect(client._stream_rows(COLUMNS, "T恤", 4)))
+
+    assert result == rows
+    assert sleeps == [7]
+    # 重试只请求剩余的行，并附带已生成数据的指纹
+    assert prompts[0] == "T恤"
+    assert "请继续生成2行新数据" in prompts[1]
+    assert "T恤1" in prompts[1]
+
+
+def test_retry_uses_backoff_without_retry_after(monkeypatch):
+    client, prompts, sleeps = make_client(monkeypatch, [
+        ([], asyncio.TimeoutError()),
+        ([], RetryableAPIError("服务端错误", 503)),
+        ([{"商品名称": "T恤", "颜色": "红"}], None),
+    ])
+
+    result = asyncio.run(collect(client._stream_rows(COLUMNS, "T恤", 1)))
+
+    assert len(result) == 1
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= BACKOFF_MAX_DELAY for delay in sleeps)
+
+
+def test_retry_gives_up_after_max_retries(monkeypatch):
+    error = RetryableAPIError("限流", 429, retry_after=1)
+    client, prompts, sleeps = make_client(monkeypatch, [([], error)] * (MAX_RETRIES + 1))
+
+    with pytest.raises(RetryableAPIError):
+        asyncio.run(collect(client._stream_rows(COLUMNS, "T恤", 1)))
+    assert len(prompts) == MAX_RETRIES + 1
+    assert sleeps == [1] * MAX_RETRIES
+
+
+def test_topup_prompt_uses_compact_fingerprint():
+    client = DeepSeekClient("test-key", use_mock=False)
+    rows = [{"商品名称": f"纯棉圆领T恤款式{i:04d}", "颜色": "红"} for i in range(500)]
+
+    prompt = client._build_topup_prompt("T恤", COLUMNS, rows, 20)
+
+    assert prompt.startswith("T恤\n\n请继续生成20行新数据")
+    # 取值最分散的列作为指纹，优先列出最近生成的取值
+    assert "「商品名称」" in prompt
+    assert "纯棉圆领T恤款式0499" in prompt
+    assert "纯棉圆领T恤款式0000" not in prompt
+    assert "未列出" in prompt
+    fingerprint = prompt.rsplit("新数据不要重复：", 1)[1].split(" 等", 1)[0]
+    assert len(fingerprint) <= TOPUP_FINGERPRINT_CHARS
+    # 只附带少量示例行
+    assert json.dumps(rows[-TOPUP_SAMPLE_ROWS:], ensure_ascii=False) in prompt
+    assert len(prompt) < len(str(rows)) // 5
+
+
+def test_short_generation_is_topped_up(monkeypatch):
+    rows = [{"商品名称": f"T恤{i}", "颜色": "红"} for i in range(5)]
+    client, prompts, sleeps = make_client(monkeypatch, [
+        (rows[:3], None),
+        (rows[3:], None),
+    ])
+
+    result = asyncio.run(collect(client._generate_rows(COLUMNS, "T恤", 5)))
+
+    assert result == rows
+    assert sleeps == []
+    assert "请继续生成2行新数据" in prompts[1]
+    assert "T恤2" in prompts[1]
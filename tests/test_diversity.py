@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from backend.api.diversity import NearDuplicateDetector, text_columns
+from backend.api.sku_generator import SKUGenerator
+
+DESCRIPTION = "轻薄透气的夏季纯棉圆领短袖T恤，宽松版型，适合日常通勤和运动"
+
+
+def row(name, description=DESCRIPTION, price="99元"):
+    return {"商品名称": name, "商品描述": description, "价格": price}
+
+
+def test_rejects_invalid_parameters():
+    with pytest.raises(ValueError):
+        NearDuplicateDetector(threshold=0)
+    with pytest.raises(ValueError):
+        NearDuplicateDetector(num_perm=100, bands=32)
+
+
+def test_text_columns_skip_derived_columns():
+    assert text_columns(["商品名称", "商品描述", "价格", "库存"]) == ["商品名称", "商品描述"]
+    assert text_columns(["价格", "库存"]) == ["价格", "库存"]
+
+
+def test_detects_near_duplicates_but_not_distinct_rows():
+    detector = NearDuplicateDetector()
+    assert detector.add(row("纯棉短袖T恤 白色"))
+    # 只有价格不同或个别字不同的行视为近似重复
+    assert detector.add(row("纯棉短袖T恤 白色", price="129元"))
+    assert detector.add(row("纯棉短袖T恤 白色款"))
+    assert detector.add(row("无线蓝牙降噪耳机", "主动降噪，续航三十小时，支持快充和多设备切换"))
+
+    assert detector.near_duplicates == 2
+    assert detector.diversity_score() == 0.5
+    assert "2 条与其他行相似度超过 70%" in detector.summary()
+
+
+def test_reject_mode_keeps_duplicates_out_of_the_index():
+    detector = NearDuplicateDetector(reject=True)
+    assert detector.add(row("纯棉短袖T恤 白色"))
+    assert not detector.add(row("纯棉短袖T恤 白色", price="129元"))
+    assert detector.add(row("无线蓝牙降噪耳机", "主动降噪，续航三十小时，支持快充和多设备切换"))
+    assert len(detector._signatures) == 2
+
+
+def test_generation_requests_replacements_for_near_duplicates():
+    rounds = [
+        [row("纯棉短袖T恤 白色"), row("纯棉短袖T恤 白色", price="129元")],
+        [row("无线蓝牙降噪耳机", "主动降噪，续航三十小时，支持快充和多设备切换")],
+    ]
+    prompts = []
+
+    async def fake_rows(columns, prompt, num_rows, progress_callback=None, use_cache=True):
+        prompts.append(prompt)
+        for item in rounds[len(prompts) - 1]:
+            yield item
+
+    generator = SKUGenerator()
+    generator.deepseek_client.use_mock = True
+    generator._stream_content = fake_rows
+    detector = NearDuplicateDetector(reject=True)
+    rows = asyncio.run(generator.generate_sku_data(
+        ["商品名称", "商品描述", "价格"], "服饰数码", 2, diversity=detector
+    ))
+
+    assert [item["商品名称"] for item in rows] == ["纯棉短袖T恤 白色", "无线蓝牙降噪耳机"]
+    assert len(prompts) == 2
+    assert detector.get_stats()["near_duplicates"] == 1
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from backend.export import ExportCache, build_export, frame_digest
+
+
+def make_frame():
+    return pd.DataFrame({"商品名称": ["T恤", "卫衣"], "颜色": ["红", "蓝"]})
+
+
+def test_digest_tracks_content_not_dtype():
+    df = make_frame()
+    assert frame_digest(df) == frame_digest(df.astype({"颜色": "category"}))
+
+    edited = df.copy()
+    edited.loc[1, "颜色"] = "白"
+    assert frame_digest(edited) != frame_digest(df)
+    assert frame_digest(df.rename(columns={"颜色": "色系"})) != frame_digest(df)
+    assert frame_digest(pd.concat([df, df.head(1)], ignore_index=True)) != frame_digest(df)
+
+
+def test_rebuilds_only_when_data_changes(monkeypatch):
+    cache = ExportCache()
+    builds = []
+
+    def counting_build(df, fmt):
+        builds.append(fmt)
+        return build_export(df, fmt)
+
+    monkeypatch.setattr("backend.export.build_export", counting_build)
+    df = make_frame()
+
+    first = cache.get_or_build(df, "csv")
+    assert cache.get_or_build(df.copy(), "csv") is first
+    assert builds == ["csv"]
+
+    # 编辑后的数据内容不同，重新生成
+    edited = df.copy()
+    edited.loc[0, "商品名称"] = "衬衫"
+    assert "衬衫" in cache.get_or_build(edited, "csv").decode("utf-8")
+    cache.get_or_build(df, "jsonl")
+    assert builds == ["csv", "csv", "jsonl"]
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 3
+
+
+def test_evicts_least_recently_used_files():
+    cache = ExportCache(max_entries=2, max_bytes=10)
+    cache.put("a", "csv", b"12345")
+    cache.put("b", "csv", b"12345")
+    assert cache.get("a", "csv") == b"12345"
+    cache.put("c", "csv", b"12345")
+    assert cache.get("b", "csv") is None
+    assert cache.get("a", "csv") is not None
+
+    # 单个文件超过容量上限时仍然保留最新的一个
+    cache.put("d", "csv", b"x" * 100)
+    assert cache.get_stats()["entries"] == 1
+    assert cache.get("d", "csv") is not None
+
+
+def test_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        ExportCache().get_or_build(make_frame(), "pdf")
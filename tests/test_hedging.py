@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from backend.api.hedging import HedgeBudget, hedged_stream
+
+
+def make_stream(name, items, delay=0.0, events=None, error=None):
+    async def stream():
+        try:
+            await asyncio.sleep(delay)
+            for item in items:
+                yield item
+            if error is not None:
+                raise error
+        except asyncio.CancelledError:
+            events.append(f"{name} cancelled")
+            raise
+        finally:
+            events.append(f"{name} closed")
+    return stream()
+
+
+def run(primary, hedge_factory, budget, delay=0.05):
+    async def main():
+        hedges = []
+        stream = hedged_stream(
+            primary, hedge_factory, delay, budget,
+            on_hedge=lambda: hedges.append("hedge"),
+            on_hedge_win=lambda: hedges.append("win")
+        )
+        return [item async for item in stream], hedges
+    return asyncio.run(main())
+
+
+def test_budget_limits_hedge_ratio():
+    budget = HedgeBudget(ratio=0.5)
+    budget.record_request()
+    assert not budget.try_acquire()
+    budget.record_request()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    assert budget.get_stats() == {"requests": 2, "hedges": 1, "hedge_wins": 0, "hedge_ratio": 0.5}
+
+
+def test_fast_primary_is_not_hedged():
+    events = []
+    budget = HedgeBudget(ratio=1)
+    items, hedges = run(
+        make_stream("primary", [1, 2], events=events),
+        lambda: pytest.fail("不应发起对冲请求"),
+        budget
+    )
+    assert items == [1, 2]
+    assert hedges == []
+    assert budget.get_stats()["hedges"] == 0
+
+
+def test_hedge_wins_and_slow_primary_is_cancelled():
+    events = []
+    budget = HedgeBudget(ratio=1)
+    items, hedges = run(
+        make_stream("primary", ["慢"], delay=10, events=events),
+        lambda: make_stream("hedge", ["快1", "快2"], events=events),
+        budget
+    )
+    assert items == ["快1", "快2"]
+    assert hedges == ["hedge", "win"]
+    assert events.index("primary cancelled") < events.index("hedge closed")
+    assert "primary closed" in events
+    assert budget.get_stats()["hedge_wins"] == 1
+
+
+def test_exhausted_budget_waits_for_primary():
+    events = []
+    budget = HedgeBudget(ratio=0)
+    items, hedges = run(
+        make_stream("primary", ["慢"], delay=0.1, events=events),
+        lambda: pytest.fail("预算用尽时不应发起对冲请求"),
+        budget
+    )
+    assert items == ["慢"]
+    assert hedges == []
+
+
+def test_failed_hedge_falls_back_to_primary():
+    events = []
+    items, hedges = run(
+        make_stream("primary", ["主"], delay=0.1, events=events),
+        lambda: make_stream("hedge", [], events=events, error=RuntimeError("对冲失败")),
+        HedgeBudget(ratio=1)
+    )
+    assert items == ["主"]
+    assert hedges == ["hedge"]
+
+
+def test_both_failing_raises_first_error():
+    events = []
+    with pytest.raises(RuntimeError, match="对冲失败"):
+        run(
+            make_stream("primary", [], delay=0.1, events=events, error=RuntimeError("主请求失败")),
+            lambda: make_stream("hedge", [], events=events, error=RuntimeError("对冲失败")),
+            HedgeBudget(ratio=1)
+        )
+
+
+def test_closing_consumer_closes_both_streams():
+    events = []
+
+    async def main():
+        stream = hedged_stream(
+            make_stream("primary", ["慢"], delay=10, events=events),
+            lambda: make_stream("hedge", ["快1", "快2"], events=events),
+            0.05,
+            HedgeBudget(ratio=1)
+        )
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(main()) == "快1"
+    assert {"primary closed", "hedge closed"} <= set(events)
@@ -0,0 +1,23 @@
+import io
+
+from backend.ingest import read_table
+
+CSV_TEXT = "编码,名称,颜色,备注\n" + "".join(
+    f"{i:05d},手机{i % 3},{'红' if i % 2 else '蓝'},\n" for i in range(500)
+)
+
+
+def test_read_csv_keeps_text_values():
+    result = read_table(io.BytesIO(CSV_TEXT.encode("utf-8-sig")), "商品.csv", chunk_size=100)
+    assert list(result.data.columns) == ["编码", "名称", "颜色", "备注"]
+    assert len(result.data) == 500
+    assert result.data["编码"].iloc[7] == "00007"
+    assert result.data["备注"].iloc[0] == ""
+
+
+def test_read_csv_falls_back_to_gbk():
+    # 只有末尾的行含有无法按UTF-8解码的字节
+    text = "编码,名称\n" + "".join(f"{i},a\n" for i in range(300000)) + "999,中文\n"
+    result = read_table(io.BytesIO(text.encode("gbk")), "商品.csv")
+    assert len(result.data) == 300001
+    assert result.data["名称"].iloc[-1] == "中文"
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from backend.api.model_metrics import ModelMetrics
+from backend.api.model_router import ModelRouter
+from backend.api.sku_generator import SKUGenerator
+
+MODELS = ["DeepSeek-V3", "DeepSeek-V2.5", "DeepSeek-R1"]
+COLUMNS = ["商品名称", "颜色"]
+
+
+def record(metrics, model, ttft, failures=0, samples=3):
+    for _ in range(samples - failures):
+        metrics.record_success(model, ttft, None)
+    for _ in range(failures):
+        metrics.record_failure(model)
+
+
+def test_rejects_invalid_configuration():
+    with pytest.raises(ValueError):
+        ModelRouter([])
+    with pytest.raises(ValueError):
+        ModelRouter(["不存在的模型"])
+    with pytest.raises(ValueError):
+        ModelRouter(MODELS, policy="random")
+
+
+def test_fallback_keeps_order_and_demotes_unhealthy_models():
+    metrics = ModelMetrics()
+    router = ModelRouter(MODELS + ["DeepSeek-V3"], metrics=metrics, max_ttft=10)
+    assert router.candidates() == MODELS
+
+    record(metrics, "DeepSeek-V3", 1, failures=2)
+    record(metrics, "DeepSeek-V2.5", 30)
+    record(metrics, "DeepSeek-R1", 5, failures=1)
+    assert router.candidates() == ["DeepSeek-R1", "DeepSeek-V3", "DeepSeek-V2.5"]
+
+
+def test_fastest_orders_by_latency():
+    metrics = ModelMetrics()
+    router = ModelRouter(MODELS, policy="fastest", metrics=metrics)
+    record(metrics, "DeepSeek-V2.5", 8)
+    record(metrics, "DeepSeek-R1", 2)
+    # 还没有延迟数据的模型排在有数据的模型之后
+    assert router.candidates() == ["DeepSeek-R1", "DeepSeek-V2.5", "DeepSeek-V3"]
+
+
+def make_generator(behaviours, first_row_timeout=1):
+    metrics = ModelMetrics()
+    router = ModelRouter(MODELS, metrics=metrics, first_row_timeout=first_row_timeout)
+    generator = SKUGenerator(router=router)
+    generator.deepseek_client.use_mock = False
+    generator.deepseek_client.api_key = "test-key"
+    calls = []
+
+    def fake_open(model, hedge_model, columns, prompt, num_rows, progress_callback=None, use_cache=True):
+        calls.append((model, hedge_model, num_rows))
+        return behaviours[model](num_rows)
+
+    generator._open_stream = fake_open
+    return generator, calls, metrics
+
+
+def rows(*names):
+    return [{"商品名称": name, "颜色": "红"} for name in names]
+
+
+async def collect(stream):
+    return [row async for row in stream]
+
+
+def test_falls_back_and_requests_only_remaining_rows():
+    async def broken(num_rows):
+        for row in rows("T恤0", "T恤1"):
+            yield row
+        raise RuntimeError("连接中断")
+
+    async def healthy(num_rows):
+        # 切换后的模型可能重复生成已有的行
+        for row in rows("T恤1", "T恤2", "T恤3")[:num_rows]:
+            yield row
+
+    generator, calls, _ = make_generator({"DeepSeek-V3": broken, "DeepSeek-V2.5": healthy})
+    messages = []
+    result = asyncio.run(collect(generator._stream_content(COLUMNS, "T恤", 4, messages.append)))
+
+    assert result == rows("T恤0", "T恤1", "T恤2")
+    # 对冲请求优先发给下一个候选模型
+    assert calls == [("DeepSeek-V3", "DeepSeek-V2.5", 4), ("DeepSeek-V2.5", "DeepSeek-R1", 2)]
+    assert any("切换到模型 DeepSeek-V2.5" in message for message in messages)
+
+
+def test_slow_first_row_switches_model_and_records_failure():
+    async def slow(num_rows):
+        await asyncio.sleep(10)
+        yield rows("太慢")[0]
+
+    async def healthy(num_rows):
+        for row in rows("T恤0", "T恤1")[:num_rows]:
+            yield row
+
+    generator, calls, metrics = make_generator(
+        {"DeepSeek-V3": slow, "DeepSeek-V2.5": healthy}, first_row_timeout=0.05
+    )
+    result = asyncio.run(collect(generator._stream_content(COLUMNS, "T恤", 2)))
+
+    assert result == rows("T恤0", "T恤1")
+    assert [call[0] for call in calls] == ["DeepSeek-V3", "DeepSeek-V2.5"]
+    assert metrics.get_model_stats("DeepSeek-V3")["error_rate"] == 1.0
+
+
+def test_raises_last_error_when_every_model_fails():
+    async def broken(num_rows):
+        raise RuntimeError("服务不可用")
+        yield
+
+    generator, calls, _ = make_generator(dict.fromkeys(MODELS, broken))
+    with pytest.raises(RuntimeError, match="服务不可用"):
+        asyncio.run(collect(generator._stream_content(COLUMNS, "T恤", 2)))
+    assert [call[0] for call in calls] == MODELS
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from backend.api import rate_limiter as limiter_module
+from backend.api.rate_limiter import ConcurrencyGovernor, RateLimiter, TokenBucket
+
+LIMITS = {"default": {"rpm": 2, "tpm": 600}}
+
+
+def make_limiter(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(limiter_module.asyncio, "sleep", fake_sleep)
+    return RateLimiter(LIMITS), sleeps
+
+
+def test_token_bucket_reserves_ahead_and_refills():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60, now=bucket.updated) == 0
+    # 余额可以为负，等待时间按补充速度计算
+    assert bucket.reserve(3, now=bucket.updated) == pytest.approx(3)
+    assert bucket.reserve(1, now=bucket.updated + 10) == pytest.approx(0)
+    bucket.refund(1000, now=bucket.updated)
+    assert bucket.tokens == 60
+
+
+def test_rate_limiter_throttles_requests_per_model(monkeypatch):
+    limiter, sleeps = make_limiter(monkeypatch)
+
+    async def main():
+        waits = [await limiter.acquire("url", "deepseek-chat", 10) for _ in range(3)]
+        # 不同模型的配额互不影响
+        waits.append(await limiter.acquire("url", "deepseek-reasoner", 10))
+        return waits
+
+    waits = asyncio.run(main())
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(30, abs=0.1)
+    assert waits[3] == 0
+    assert sleeps == [waits[2]]
+    assert limiter.get_stats()["throttled"] == 1
+
+
+def test_rate_limiter_caps_oversized_requests_and_refunds(monkeypatch):
+    limiter, sleeps = make_limiter(monkeypatch)
+
+    async def main():
+        # 超过整分钟配额的预估按配额上限预订，不会永远等待
+        assert await limiter.acquire("url", "deepseek-chat", 10_000) == 0
+        # 实际只用了 100 个token，归还多预订的部分后下一次请求无需等待
+        limiter.reconcile("url", "deepseek-chat", 10_000, 100)
+        return await limiter.acquire("url", "deepseek-chat", 400)
+
+    assert asyncio.run(main()) == 0
+    assert sleeps == []
+
+
+def test_governor_caps_concurrency_in_arrival_order():
+    async def main():
+        governor = ConcurrencyGovernor(limit=2)
+        order = []
+
+        async def worker(index):
+            async with governor.slot():
+                order.append(index)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(worker(i) for i in range(6)))
+        return governor.get_stats(), order
+
+    stats, order = asyncio.run(main())
+    assert stats == {"limit": 2, "active": 0, "waiting": 0, "max_active": 2}
+    assert order == list(range(6))
+
+
+def test_cancel_after_grant_returns_slot():
+    async def main():
+        governor = ConcurrencyGovernor(limit=1)
+        await governor.acquire()
+        waiter = asyncio.create_task(governor.acquire())
+        await asyncio.sleep(0)
+        assert governor.get_stats()["waiting"] == 1
+
+        # 放行后等待者还没恢复执行时取消
+        governor.release()
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        assert governor.get_stats()["active"] == 0
+        await asyncio.wait_for(governor.acquire(), timeout=1)
+        governor.release()
+
+    asyncio.run(main())
+
+
+def test_cancel_before_grant_passes_slot_on():
+    async def main():
+        governor = ConcurrencyGovernor(limit=1)
+        await governor.acquire()
+        cancelled = asyncio.create_task(governor.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        governor.release()
+        assert governor.get_stats() == {"limit": 1, "active": 0, "waiting": 0, "max_active": 1}
+        await asyncio.wait_for(governor.acquire(), timeout=1)
+        governor.release()
+
+    asyncio.run(main())
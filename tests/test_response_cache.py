@@ -0,0 +1,91 @@
+import asyncio
+
+from backend.api.deepseek_client import DeepSeekClient
+from backend.api.response_cache import ResponseCache
+
+COLUMNS = ["商品名称", "颜色"]
+ROWS = [{"商品名称": f"T恤{i}", "颜色": "红"} for i in range(3)]
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    key = ResponseCache.make_key("deepseek-chat", COLUMNS, "T恤", 3, 0.7)
+
+    assert cache.get(key) is None
+    cache.put(key, ROWS)
+    assert cache.get(key) == ROWS
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_key_covers_request_content():
+    key = ResponseCache.make_key("deepseek-chat", COLUMNS, "T恤", 3, 0.7)
+    assert key == ResponseCache.make_key("deepseek-chat", list(COLUMNS), "T恤", 3, 0.7)
+    assert key != ResponseCache.make_key("deepseek-reasoner", COLUMNS, "T恤", 3, 0.7)
+    assert key != ResponseCache.make_key("deepseek-chat", COLUMNS[::-1], "T恤", 3, 0.7)
+    assert key != ResponseCache.make_key("deepseek-chat", COLUMNS, "T恤", 4, 0.7)
+    assert key != ResponseCache.make_key("deepseek-chat", COLUMNS, "T恤", 3, 1.0)
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl=-1)
+    cache.put("key", ROWS)
+    assert cache.get("key") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_entries=2)
+    cache.put("a", ROWS)
+    cache.put("b", ROWS)
+    assert cache.get("a") == ROWS
+    cache.put("c", ROWS)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ROWS
+    assert cache.get("c") == ROWS
+
+
+def test_client_replays_complete_results_from_cache(tmp_path, monkeypatch):
+    client = DeepSeekClient("test-key", use_mock=False, cache=ResponseCache(tmp_path / "cache.sqlite3"))
+    client.singleflight = None
+    calls = []
+
+    async def fake_once(columns, prompt, num_rows, progress_callback=None, is_topup=False, usage_callback=None):
+        calls.append(num_rows)
+        # 上游最多只能生成 3 行，补充生成不返回数据
+        if is_topup:
+            return
+        for row in ROWS[:num_rows]:
+            yield row
+
+    monkeypatch.setattr(client, "_stream_rows_once", fake_once)
+
+    async def generate(num_rows, use_cache=True):
+        messages = []
+        rows = await client.generate_sku_content(
+            COLUMNS, "T恤", num_rows, messages.append, use_cache=use_cache
+        )
+        return rows, messages
+
+    rows, messages = asyncio.run(generate(3))
+    assert rows == ROWS and calls == [3]
+
+    rows, messages = asyncio.run(generate(3))
+    assert rows == ROWS and calls == [3]
+    assert "⚡ 命中缓存，直接返回 3 条数据" in messages
+
+    # 关闭缓存时总是调用上游
+    asyncio.run(generate(3, use_cache=False))
+    assert calls == [3, 3]
+
+    # 行数不足的结果不写入缓存
+    before = len(calls)
+    rows, messages = asyncio.run(generate(5))
+    assert rows == ROWS and len(calls) > before
+    before = len(calls)
+    rows, messages = asyncio.run(generate(5))
+    assert rows == ROWS and len(calls) > before
+    assert not any("命中缓存" in message for message in messages)
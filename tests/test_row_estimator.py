@@ -0,0 +1,30 @@
+import json
+
+from backend.api.row_estimator import RowTokenEstimator
+
+
+def test_observe_defers_writes_until_flush(tmp_path):
+    path = tmp_path / "row_tokens.json"
+    estimator = RowTokenEstimator(path=path, flush_interval=60)
+    for tokens in (40, 60, 50):
+        estimator.observe("model", ["名称", "价格"], "json", tokens)
+    assert not path.exists()
+    assert estimator.get_samples("model", ["名称", "价格"], "json") == 3
+
+    estimator.flush()
+    entries = json.loads(path.read_text(encoding="utf-8"))
+    assert [entry["samples"] for entry in entries.values()] == [3]
+
+    reloaded = RowTokenEstimator(path=path)
+    assert reloaded.estimate("model", ["名称", "价格"], "json") == estimator.estimate(
+        "model", ["名称", "价格"], "json"
+    )
+
+
+def test_timer_flushes_in_background(tmp_path):
+    path = tmp_path / "row_tokens.json"
+    estimator = RowTokenEstimator(path=path, flush_interval=0.05)
+    estimator.observe("model", ["名称"], "tsv", 12)
+    timer = estimator._timer
+    timer.join(timeout=1)
+    assert json.loads(path.read_text(encoding="utf-8"))
@@ -0,0 +1,68 @@
+import asyncio
+import re
+
+from backend.api.sku_generator import SKUGenerator
+
+COLUMNS = ["商品名称", "颜色"]
+
+
+def make_generator(fake):
+    generator = SKUGenerator(shard_size=10, max_concurrency=2)
+    generator.deepseek_client.use_mock = False
+    generator.deepseek_client.api_key = "test-key"
+    generator._stream_content = fake
+    return generator
+
+
+def seed_of(prompt):
+    return int(re.search(r"批次编号(\d+)", prompt).group(1))
+
+
+def test_shards_run_concurrently_up_to_limit():
+    state = {"active": 0, "peak": 0}
+    prompts = []
+
+    async def fake(columns, prompt, num_rows, progress_callback=None, use_cache=True):
+        prompts.append(prompt)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            seed = seed_of(prompt)
+            for i in range(num_rows):
+                await asyncio.sleep(0)
+                yield {"商品名称": f"T恤{seed}-{i}", "颜色": "红"}
+        finally:
+            state["active"] -= 1
+
+    generator = make_generator(fake)
+    rows = asyncio.run(generator.generate_sku_data(COLUMNS, "T恤", 35))
+
+    assert len(rows) == 35
+    assert len({row["商品名称"] for row in rows}) == 35
+    assert len(prompts) == 4
+    assert len({seed_of(prompt) for prompt in prompts}) == 4
+    assert state["peak"] == 2
+
+
+def test_duplicates_and_failed_shards_are_topped_up():
+    messages = []
+    seeds = []
+
+    async def fake(columns, prompt, num_rows, progress_callback=None, use_cache=True):
+        seed = seed_of(prompt)
+        seeds.append(seed)
+        if seed == 1:
+            raise RuntimeError("上游超时")
+        for i in range(num_rows):
+            # 第一轮的分片 2 与分片 0 生成相同的数据
+            name = f"T恤0-{i}" if seed == 2 else f"T恤{seed}-{i}"
+            yield {"商品名称": name, "颜色": "红"}
+
+    generator = make_generator(fake)
+    rows = asyncio.run(generator.generate_sku_data(COLUMNS, "T恤", 30, progress_callback=messages.append))
+
+    assert len(rows) == 30
+    assert len({row["商品名称"] for row in rows}) == 30
+    # 第一轮只得到 10 条不重复数据，第二轮补充剩余 20 条
+    assert sorted(seeds) == [0, 1, 2, 1000, 1001]
+    assert any("第 1 轮补充生成" in message for message in messages)
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+from backend.api.deepseek_client import DeepSeekClient
+from backend.api.singleflight import SingleFlight
+
+
+def test_concurrent_subscribers_share_one_upstream_call():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def upstream(publish):
+            calls.append(1)
+            yield "a"
+            await release.wait()
+            yield "b"
+
+        async def consume():
+            return [row async for row in flight.stream("key", upstream)]
+
+        first = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await first == await second == ["a", "b"]
+        assert len(calls) == 1
+        assert flight.get_stats() == {"upstream_calls": 1, "coalesced": 1, "in_flight": 0}
+
+    asyncio.run(main())
+
+
+def test_events_reach_every_subscriber_and_usage_is_replayed():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def upstream(publish):
+            publish(("usage", 10), replay=True)
+            publish(("progress", "早期进度"))
+            yield "a"
+            await release.wait()
+            publish(("progress", "后续进度"))
+            yield "b"
+
+        events = {"first": [], "second": []}
+
+        async def consume(name):
+            return [row async for row in flight.stream("key", upstream, on_event=events[name].append)]
+
+        first = asyncio.create_task(consume("first"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(consume("second"))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(first, second)
+
+        assert events["first"] == [("usage", 10), ("progress", "早期进度"), ("progress", "后续进度")]
+        # 后加入的订阅者收到回放的用量，不回放过去的进度
+        assert events["second"] == [("usage", 10), ("progress", "后续进度")]
+
+    asyncio.run(main())
+
+
+def test_cancelled_when_all_subscribers_leave():
+    async def main():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def upstream(publish):
+            try:
+                yield "a"
+                await asyncio.sleep(10)
+                yield "b"
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        rows = flight.stream("key", upstream)
+        assert await rows.__anext__() == "a"
+        await rows.aclose()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert flight.get_stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def make_client(calls):
+    client = DeepSeekClient("test-key", use_mock=False)
+    client.cache = None
+    client.singleflight = SingleFlight()
+
+    async def fake_once(columns, prompt, num_rows, progress_callback=None, is_topup=False, usage_callback=None):
+        calls.append(threading.get_ident())
+        if progress_callback:
+            progress_callback("📊 开始生成数据结构...")
+        for i in range(num_rows):
+            await asyncio.sleep(0.02)
+            yield {"名称": f"商品{i}"}
+        usage_callback(is_topup, 100, 50)
+
+    client._stream_rows_once = fake_once
+    return client
+
+
+def test_coalesced_client_gets_its_own_progress_and_usage():
+    calls = []
+    leader = make_client(calls)
+    follower = make_client(calls)
+    follower.singleflight = leader.singleflight
+    messages = {"leader": [], "follower": []}
+
+    async def main():
+        async def run(client, name):
+            return [
+                row async for row in client.stream_sku_content(
+                    ["名称"], "测试", 3, progress_callback=messages[name].append
+                )
+            ]
+
+        first = asyncio.create_task(run(leader, "leader"))
+        await asyncio.sleep(0.01)
+        return await asyncio.gather(first, run(follower, "follower"))
+
+    leader_rows, follower_rows = asyncio.run(main())
+    assert leader_rows == follower_rows and len(leader_rows) == 3
+    assert len(calls) == 1
+    for client in (leader, follower):
+        assert client.get_usage_stats()["requests"] == 1
+        assert client.get_usage_stats()["completion_tokens"] == 50
+    assert "📊 开始生成数据结构..." in messages["leader"]
+    assert "🤝 已有相同的生成任务正在进行，直接共享其结果..." in messages["follower"]
+    assert messages["follower"][-1].startswith("🎉 生成完成")
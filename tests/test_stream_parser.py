@@ -0,0 +1,80 @@
+import csv
+import json
+
+from backend.api.stream_parser import JSONRowParser, TabularRowParser
+
+COLUMNS = ["名称", "尺寸", "价格"]
+
+
+def parse(text, chunk_size=None):
+    parser = TabularRowParser(COLUMNS)
+    chunk_size = chunk_size or len(text)
+    rows = []
+    for start in range(0, len(text), chunk_size):
+        rows += parser.feed(text[start:start + chunk_size])
+    return rows + parser.flush(), parser
+
+
+def test_unquoted_inch_mark_does_not_merge_records():
+    text = '名称\t尺寸\t价格\n电视A\t55"\t3999\n电视B\t65寸\t4999\n电视C\t75"\t6999\n'
+    for chunk_size in (None, 1, 7):
+        rows, parser = parse(text, chunk_size)
+        assert [row["尺寸"] for row in rows] == ['55"', "65寸", '75"']
+        assert parser.invalid_rows == 0
+
+
+def test_quoted_fields_with_newlines_and_escaped_quotes():
+    text = '名称\t尺寸\t价格\n"电视\nA"\t"55""英寸"\t3999\n电视B\t"""65"""\t4999\n'
+    for chunk_size in (None, 1, 5):
+        rows, parser = parse(text, chunk_size)
+        assert rows == [
+            {"名称": "电视\nA", "尺寸": '55"英寸', "价格": "3999"},
+            {"名称": "电视B", "尺寸": '"65"', "价格": "4999"},
+        ]
+
+
+def test_unparsable_record_counts_as_invalid():
+    # 超过 csv 字段长度上限的记录会让 csv.reader 抛出异常
+    long_field = "长" * (csv.field_size_limit() + 1)
+    rows, parser = parse(f'名称\t尺寸\t价格\n电视A\t{long_field}\t3999\n电视B\t65寸\t4999\n')
+    assert rows == [{"名称": "电视B", "尺寸": "65寸", "价格": "4999"}]
+    assert parser.invalid_rows == 1
+
+
+JSON_TEXT = (
+    "好的，以下是生成的数据：\n```json\n"
+    '[{"名称": "手机{旗舰}", "描述": "支持\\"快充\\"，含反斜杠\\\\"},\n'
+    ' {"名称": "耳机", "参数": {"续航": "30h", "颜色": ["黑", "白"]}},\n'
+    ' {"名称": "平板]", "价格": "2999元"}]\n```'
+)
+
+
+def parse_json(text, chunk_size):
+    parser = JSONRowParser()
+    rows = []
+    for start in range(0, len(text), chunk_size):
+        rows += parser.feed(text[start:start + chunk_size])
+    return rows + parser.flush(), parser
+
+
+def test_json_rows_are_identical_for_every_chunk_size():
+    expected = json.loads(JSON_TEXT[JSON_TEXT.index("["):JSON_TEXT.rindex("]") + 1])
+    for chunk_size in range(1, len(JSON_TEXT) + 1):
+        rows, parser = parse_json(JSON_TEXT, chunk_size)
+        assert rows == expected, chunk_size
+        assert parser.rows_parsed == 3
+        assert not parser.in_object
+
+
+def test_json_rows_are_yielded_as_soon_as_each_object_closes():
+    parser = JSONRowParser()
+    assert parser.feed('[{"名称": "手机"}, {"名称": "耳') == [{"名称": "手机"}]
+    assert parser.started and parser.in_object
+    assert parser.feed('机"}') == [{"名称": "耳机"}]
+    assert not parser.in_object
+
+
+def test_invalid_json_object_is_counted_and_skipped():
+    rows, parser = parse_json('[{"名称": "手机",}, {"名称": "耳机"}]', 4)
+    assert rows == [{"名称": "耳机"}]
+    assert parser.invalid_objects == 1
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from backend.api.validation import DataValidator, infer_column_specs
+
+
+def test_infer_column_specs_matches_column_suffix():
+    specs = {
+        spec.name: spec.column_type
+        for spec in infer_column_specs(["价格（元）", "用户评价", "性价比", "评价内容", "身高体重说明", "库存", "颜色"])
+    }
+    assert specs == {
+        "价格（元）": "price",
+        "用户评价": "text",
+        "性价比": "text",
+        "评价内容": "text",
+        "身高体重说明": "text",
+        "库存": "integer",
+        "颜色": "text",
+    }
+
+
+def test_review_columns_do_not_drop_rows():
+    rows = [
+        {"商品名称": "手机", "用户评价": "很好用", "性价比": "高", "价格": "1,299元"},
+        {"商品名称": "耳机", "用户评价": "音质不错", "性价比": "一般", "价格": "￥199"},
+    ]
+    report = DataValidator.for_columns(list(rows[0])).validate(pd.DataFrame(rows))
+    assert report.is_valid
+    assert report.dropped_rows == 0
+    assert report.data["价格"].tolist() == ["1299元", "199元"]
+
+
+def test_inferred_type_mismatches_are_counted_not_dropped():
+    rows = [
+        {"名称": "A", "价格": "面议", "适用年龄": "3-6岁"},
+        {"名称": "B", "价格": "99", "适用年龄": "5岁"},
+        {"名称": "C", "价格": "", "适用年龄": "8"},
+    ]
+    report = DataValidator.for_columns(list(rows[0])).validate(pd.DataFrame(rows))
+    assert report.mismatched_cells == {"价格": 1, "适用年龄": 1}
+    # 只有空值删除整行，类型不符的值按原样保留
+    assert report.dropped_rows == 1
+    assert report.data.to_dict("records") == [
+        {"名称": "A", "价格": "面议", "适用年龄": "3-6岁"},
+        {"名称": "B", "价格": "99元", "适用年龄": "5岁"},
+    ]
+    assert "与推断的类型不符" in report.summary()